@@ -0,0 +1,386 @@
+"""
+File: PythonSVGBatch.py
+
+This file contains a command line renderer for ranges of seeds, so a run
+of mandalas no longer means editing the TEST_ flags of PythonSVGWrapperXML
+and passing one seed at a time.
+
+    python PythonSVGBatch.py circles 1-100 -o renders -j 8
+    python PythonSVGBatch.py lotus 1-20,40 --format png --size 512
+    python PythonSVGBatch.py palette 1-500 --set rows=10 --set columns=10 --resume
+
+Each seed is drawn to its own file in the output directory by a pool of
+processes, which are handed the seeds chunksize at a time. The manifest in
+the output directory records the settings of the run and, for each seed,
+its file, its size, the time taken to build and to encode it and the
+process that drew it. With --resume the seeds already in the manifest
+whose files are written are skipped, so an interrupted run carries on
+where it stopped.
+
+renderBytes draws one document to bytes, it is shared with
+PythonSVGServer.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import PythonSVGWrapperXML as svg
+
+BATCH_MANIFEST = "manifest.json"
+BATCH_OUTPUT   = "renders"
+
+FORMATS = ("svg", "svgz", "png")
+
+CONTENT_TYPES = {
+                 "svg"  : "image/svg+xml",
+                 "svgz" : "image/svg+xml",
+                 "png"  : "image/png"
+                }
+
+"""
+the parameters of each kind of render and their defaults, the lotus
+defaults are those of MandalaLotusTest
+"""
+PARAMETERS = {
+              "circles" : {
+                           "colour" : True
+                          },
+              "lotus"   : {
+                           "colour"      : True,
+                           "lobes"       : 21,
+                           "rings"       : 1000,
+                           "maxSize"     : 500,
+                           "minDistance" : 0.5
+                          },
+              "palette" : {
+                           "rows"    : 20,
+                           "columns" : 20
+                          }
+             }
+
+def mandalaDocument(model):
+    return svg.SVGWrap({
+                        "width"  : svg.MANDALA_CANVAS_SIZE,
+                        "height" : svg.MANDALA_CANVAS_SIZE,
+                       }, model)
+
+def circlesDocument(seed, params, model = svg.NODE_MODEL):
+    svgOut = mandalaDocument(model)
+
+    svg.Mandala(seed = seed).circles(colourOn = params["colour"], svgDoc = svgOut, parent = svgOut.root)
+
+    return svgOut
+
+def lotusDocument(seed, params, model = svg.NODE_MODEL):
+    svgOut = mandalaDocument(model)
+
+    svg.Mandala(seed = seed).lotus(colourOn    = params["colour"],
+                                   svgDoc      = svgOut,
+                                   parent      = svgOut.root,
+                                   radius      = 1,
+                                   numLobes    = params["lobes"],
+                                   numRings    = params["rings"],
+                                   maxSize     = params["maxSize"],
+                                   minDistance = params["minDistance"],
+                                   attr        = {"stroke"       : "black",
+                                                  "stroke-width" : 1.0,
+                                                  "fill"         : "None",
+                                                  "transform"    : "rotate(15, 500, 500)"
+                                                 })
+
+    return svgOut
+
+#a grid of palette colours as in PaletteTest, the base colour comes from
+#the seed rather than random so each seed always draws the same palette
+def paletteDocument(seed, params, model = svg.NODE_MODEL):
+    rows    = params["rows"]
+    columns = params["columns"]
+
+    rowHeight = svg.MANDALA_CANVAS_SIZE / float(rows)
+    colWidth  = svg.MANDALA_CANVAS_SIZE / float(columns)
+
+    dna = svg.DNA(seed = seed, length = 5000)
+
+    svgOut = mandalaDocument(model)
+
+    group = svgOut.group(svgOut.root, {"id" : "palette"})
+
+    colour  = svg.Colour(dna.next(), dna.next(), dna.next())
+    palette = svg.Palette(dna, colour, (1.0 / 2.0) * math.pi, [0.02, 0.5, 0.0])
+
+    #each row skips one colour then takes a colour for each column
+    colours = palette.getCols(rows * (columns + 1)).hex()
+
+    for row in range(rows):
+        rowColours = colours[row * (columns + 1) + 1 : (row + 1) * (columns + 1)]
+
+        svgOut.rects(group,
+                     [row * rowHeight] * columns,
+                     [col * colWidth for col in range(columns)],
+                     [colWidth] * columns,
+                     [rowHeight] * columns,
+                     fill         = rowColours,
+                     stroke       = colour.hex(),
+                     stroke_width = 8)
+
+    return svgOut
+
+RENDERERS = {
+             "circles" : circlesDocument,
+             "lotus"   : lotusDocument,
+             "palette" : paletteDocument
+            }
+
+"""
+renderBytes(kind, seed, params, format, size, model, minify)
+
+draws one document and returns its bytes with the seconds taken to build
+and to encode it
+
+Attributes:
+    kind   - circles, lotus or palette
+    seed   - the seed of the Mandala or palette
+    params - the parameters of the kind, see PARAMETERS
+    format - svg, svgz or png, png needs PythonSVGRaster and NumPy
+    size   - width of png images in pixels
+    model  - the document model, ETREE_MODEL or NODE_MODEL
+    minify - hoist styles and minify the document before it is written
+"""
+def renderBytes(kind, seed, params, format = "svg", size = 256, model = svg.NODE_MODEL, minify = False):
+    assert (kind in RENDERERS), "unknown kind " + str(kind)
+    assert (format in FORMATS), "unknown format " + str(format)
+
+    start = time.perf_counter()
+
+    svgOut = RENDERERS[kind](seed, params, model)
+
+    if minify:
+        svgOut.hoistStyles()
+        svgOut.minify()
+
+    built = time.perf_counter()
+
+    out = io.BytesIO()
+
+    if format == "png":
+        import PythonSVGRaster
+
+        PythonSVGRaster.writePNG(out, PythonSVGRaster.render(svgOut, width = size))
+    else:
+        svgOut.writeDoc(out, compress = format == "svgz")
+
+    return out.getvalue(), {"build" : built - start, "encode" : time.perf_counter() - built}
+
+#writes bytes so that a file that exists is always complete, see
+#svg.atomicWrite
+def writeFile(filename, data):
+    svg.atomicWrite(filename, lambda f: f.write(data))
+
+def outputName(kind, seed, format):
+    return kind + "_" + str(seed) + "." + format
+
+#renders one seed in a worker process and returns its manifest record
+def renderJob(job):
+    kind, seed, params, settings = job
+
+    start = time.perf_counter()
+
+    data, timing = renderBytes(kind, seed, params, settings["format"], settings["size"],
+                               settings["model"], settings["minify"])
+
+    name = outputName(kind, seed, settings["format"])
+
+    writeFile(os.path.join(settings["output"], name), data)
+
+    return {
+            "seed"    : seed,
+            "file"    : name,
+            "bytes"   : len(data),
+            "build"   : timing["build"],
+            "encode"  : timing["encode"],
+            "seconds" : time.perf_counter() - start,
+            "pid"     : os.getpid()
+           }
+
+"""
+________________________________
+COMMAND LINE
+"""
+#seeds as 1-100,200,300-310, ranges include both ends
+def parseSeeds(text):
+    seeds = []
+
+    try:
+        for part in text.split(","):
+            first, _, last = part.partition("-")
+
+            seeds.extend(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError("seeds are numbers and ranges like 1-100,200")
+
+    if not seeds:
+        raise argparse.ArgumentTypeError("no seeds in " + text)
+
+    return sorted(set(seeds))
+
+#a parameter value of the same type as its default
+def parseValue(text, default):
+    if isinstance(default, bool):
+        if text.lower() in ("1", "true", "yes", "on"):
+            return True
+        if text.lower() in ("0", "false", "no", "off"):
+            return False
+
+        raise ValueError(text)
+
+    return type(default)(text)
+
+#the parameters of a kind with the key=value settings given
+def parameters(kind, settings, parser):
+    params = dict(PARAMETERS[kind])
+
+    for setting in settings:
+        key, _, value = setting.partition("=")
+
+        if key not in params:
+            parser.error(kind + " has no parameter " + key + ", it has " + ", ".join(sorted(params)))
+
+        try:
+            params[key] = parseValue(value, params[key])
+        except ValueError:
+            parser.error("bad value for " + key + ": " + value)
+
+    return params
+
+def buildParser():
+    parser = argparse.ArgumentParser(description = "Render ranges of seeds to files with a pool of processes.")
+
+    parser.add_argument("kind", choices = sorted(RENDERERS), help = "what to draw")
+    parser.add_argument("seeds", type = parseSeeds, help = "seeds to draw, like 1-100,200")
+
+    parser.add_argument("-o", "--output", default = BATCH_OUTPUT, help = "directory the files are written to")
+    parser.add_argument("-j", "--jobs", type = int, default = os.cpu_count() or 1, help = "worker processes, 1 draws in this process")
+    parser.add_argument("-c", "--chunksize", type = int, default = 0, help = "seeds handed to a worker at a time, 0 picks one")
+    parser.add_argument("-f", "--format", choices = FORMATS, default = "svg")
+    parser.add_argument("--size", type = int, default = 256, help = "width of png images")
+    parser.add_argument("--model", choices = (svg.ETREE_MODEL, svg.NODE_MODEL), default = svg.NODE_MODEL)
+    parser.add_argument("--minify", action = "store_true", help = "hoist styles and minify each document")
+    parser.add_argument("--set", action = "append", default = [], metavar = "KEY=VALUE", help = "set a parameter of the kind")
+    parser.add_argument("--resume", action = "store_true", help = "skip the seeds the manifest lists as written")
+
+    return parser
+
+def loadManifest(filename):
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def saveManifest(filename, manifest):
+    writeFile(filename, json.dumps(manifest, indent = 1).encode('utf-8'))
+
+def main(argv = None):
+    parser = buildParser()
+    args   = parser.parse_args(argv)
+
+    if args.jobs < 1 or args.chunksize < 0:
+        parser.error("jobs must be at least 1 and chunksize at least 0")
+
+    params = parameters(args.kind, args.set, parser)
+
+    os.makedirs(args.output, exist_ok = True)
+
+    settings = {
+                "kind"   : args.kind,
+                "params" : params,
+                "format" : args.format,
+                "size"   : args.size,
+                "model"  : args.model,
+                "minify" : args.minify
+               }
+
+    filename = os.path.join(args.output, BATCH_MANIFEST)
+    records  = {}
+
+    if args.resume:
+        manifest = loadManifest(filename)
+
+        if manifest is not None:
+            if manifest["settings"] != settings:
+                parser.error("the manifest in " + args.output + " has other settings, resume with the same ones or use another directory")
+
+            for record in manifest["renders"]:
+                if os.path.exists(os.path.join(args.output, record["file"])):
+                    records[record["seed"]] = record
+
+    seeds = [seed for seed in args.seeds if seed not in records]
+
+    skipped   = len(args.seeds) - len(seeds)
+    chunksize = args.chunksize or max(1, int(math.ceil(len(seeds) / float(args.jobs * 4))))
+
+    jobs = [(args.kind, seed, params, dict(settings, output = args.output)) for seed in seeds]
+
+    manifest = {
+                "settings"  : settings,
+                "jobs"      : args.jobs,
+                "chunksize" : chunksize,
+                "renders"   : []
+               }
+
+    def save(elapsed):
+        manifest["elapsed"]          = elapsed
+        manifest["rendersPerMinute"] = (len(records) - skipped) * 60.0 / max(elapsed, 1e-9)
+        manifest["renders"]          = [records[seed] for seed in sorted(records)]
+
+        saveManifest(filename, manifest)
+
+    print("rendering " + str(len(seeds)) + " " + args.kind + ", " + str(skipped) + " already written, " +
+          str(args.jobs) + " jobs, chunks of " + str(chunksize))
+
+    start       = time.perf_counter()
+    executor    = None
+    interrupted = False
+
+    try:
+        if args.jobs == 1:
+            results = map(renderJob, jobs)
+        else:
+            executor = ProcessPoolExecutor(max_workers = args.jobs)
+            results  = executor.map(renderJob, jobs, chunksize = chunksize)
+
+        #the manifest is saved after each chunk so an interrupted run can resume
+        for count, record in enumerate(results, 1):
+            records[record["seed"]] = record
+
+            if count % chunksize == 0:
+                save(time.perf_counter() - start)
+
+            print("\r" + str(count) + " / " + str(len(jobs)), end = "", flush = True)
+    except KeyboardInterrupt:
+        #renders finished but not yet collected are redone on --resume
+        interrupted = True
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures = True)
+
+        elapsed = time.perf_counter() - start
+
+        save(elapsed)
+
+        print("\n" + str(len(records) - skipped) + " rendered in " + "{0:.2f}".format(elapsed) + " s, " +
+              "{0:.0f}".format(manifest["rendersPerMinute"]) + " per minute, manifest " + filename)
+
+    if interrupted:
+        print("interrupted, run again with --resume to finish")
+        return 130
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
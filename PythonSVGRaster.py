@@ -0,0 +1,1107 @@
+"""
+File: PythonSVGRaster.py
+
+This file contains a rasterizer for the svg documents built by
+PythonSVGWrapperXML, so previews and thumbnails can be made without a
+browser. It needs NumPy.
+
+render(svgDoc) returns a document as an RGBA image, writePNG writes an
+image as a PNG file and thumbnail does both at a small size. renderFile
+draws an svg file.
+
+The svg drawn is the subset SVGWrap builds, circle, rect, ellipse, line,
+polyline, polygon and path, in groups and use tags, with transforms,
+fill, stroke, opacity, the inherited presentation attributes, style
+attributes and the classes written by hoistStyles. Text, clipping, masks
+and dashes are not drawn, a gradient fill uses the colour of its first
+stop. Group opacity is applied to each shape in the group rather than to
+the group as a whole, and joins are always round.
+"""
+import math
+import re
+import struct
+import time
+import zlib
+import functools
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from PythonSVGWrapperXML import PathData, ShapeBatch, parseTransform, unitCircle, isColumn, parseNumber, localName, areaScale
+
+#sub scanlines per pixel row, coverage along them is exact
+RASTER_SAMPLES = 4
+
+#largest number of sub scanline pixels rasterized in one pass
+RASTER_CHUNK = 1 << 22
+
+#furthest a flattened curve is from the true curve, in pixels
+CURVE_TOLERANCE = 0.25
+
+#masks with more pixels than this only paint their covered pixels when few are covered
+SPARSE_PIXELS = 1 << 14
+
+#the deepest use tags are followed
+USE_DEPTH = 16
+
+WHITE = (255, 255, 255, 255)
+
+#tags that are never drawn themselves
+SKIP_TAGS = ('defs', 'style', 'metadata', 'title', 'desc', 'symbol', 'clipPath', 'mask',
+             'linearGradient', 'radialGradient', 'pattern', 'marker', 'namedview', 'text')
+
+CONTAINER_TAGS = ('svg', 'g', 'a', 'switch')
+
+SHAPE_TAGS = ('rect', 'circle', 'ellipse', 'line', 'polyline', 'polygon', 'path')
+
+HREF_KEYS = ('href', 'xlink:href', '{http://www.w3.org/1999/xlink}href')
+
+NAMED_COLOURS = {
+                 "black"   : (0, 0, 0),
+                 "white"   : (255, 255, 255),
+                 "red"     : (255, 0, 0),
+                 "green"   : (0, 128, 0),
+                 "lime"    : (0, 255, 0),
+                 "blue"    : (0, 0, 255),
+                 "yellow"  : (255, 255, 0),
+                 "cyan"    : (0, 255, 255),
+                 "aqua"    : (0, 255, 255),
+                 "magenta" : (255, 0, 255),
+                 "fuchsia" : (255, 0, 255),
+                 "grey"    : (128, 128, 128),
+                 "gray"    : (128, 128, 128),
+                 "silver"  : (192, 192, 192),
+                 "maroon"  : (128, 0, 0),
+                 "navy"    : (0, 0, 128),
+                 "olive"   : (128, 128, 0),
+                 "purple"  : (128, 0, 128),
+                 "teal"    : (0, 128, 128),
+                 "orange"  : (255, 165, 0),
+                 "brown"   : (165, 42, 42),
+                 "pink"    : (255, 192, 203)
+                }
+
+#the style a document starts with
+DEFAULT_STYLE = {
+                 "fill"            : "black",
+                 "fill-opacity"    : "1",
+                 "fill-rule"       : "nonzero",
+                 "stroke"          : "none",
+                 "stroke-width"    : "1",
+                 "stroke-opacity"  : "1",
+                 "stroke-linecap"  : "butt",
+                 "opacity"         : 1.0
+                }
+
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+CSS_RULE = re.compile(r"\.([\w-]+)\s*\{([^}]*)\}")
+
+URL_REFERENCE = re.compile(r"url\(\s*#([^)\s]+)\s*\)")
+
+#returns the properties of a css declaration block or style attribute
+def parseDeclarations(text):
+    props = {}
+
+    for declaration in (text or "").split(";"):
+        if ":" in declaration:
+            key, value = declaration.split(":", 1)
+            props[key.strip()] = value.strip()
+
+    return props
+
+"""
+matrices are (a, b, c, d, e, f) tuples like the svg matrix transform,
+x' = a * x + c * y + e and y' = b * x + d * y + f
+"""
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+#returns the matrix applying n and then m
+def compose(m, n):
+    return (
+            m[0] * n[0] + m[2] * n[1],
+            m[1] * n[0] + m[3] * n[1],
+            m[0] * n[2] + m[2] * n[3],
+            m[1] * n[2] + m[3] * n[3],
+            m[0] * n[4] + m[2] * n[5] + m[4],
+            m[1] * n[4] + m[3] * n[5] + m[5]
+           )
+
+@functools.lru_cache(maxsize = 256)
+def transformMatrix(transform):
+    m = parseTransform(transform).matrix
+
+    return (m[0][0], m[1][0], m[0][1], m[1][1], m[0][2], m[1][2])
+
+#the (cos, sin) tables of unitCircle as arrays without the closing angle.
+#A polygon with its corners on the circle is smaller than the circle, the
+#tables are scaled so the polygon has the circle's area and small circles
+#do not lose coverage
+@functools.lru_cache(maxsize = 256)
+def circleTable(n):
+    cosTable, sinTable = unitCircle(n)
+
+    scale = math.sqrt(2.0 * math.pi / (n * math.sin(2.0 * math.pi / n)))
+
+    return np.array(cosTable[:n]) * scale, np.array(sinTable[:n]) * scale
+
+#segments for a circle of radius pixels within CURVE_TOLERANCE
+def circleSegments(radius, least = 8, most = 1024):
+    n = int(math.ceil(math.pi * math.sqrt(max(radius, 0.0) / (2.0 * CURVE_TOLERANCE))))
+
+    return min(max(n, least), most)
+
+"""
+GEOMETRY
+
+shapes become lists of subpaths, (points, closed), with points an N x 2
+array in user space
+"""
+def ellipsePoints(cx, cy, rx, ry, scale):
+    cosTable, sinTable = circleTable(circleSegments(max(rx, ry) * scale))
+
+    return np.column_stack((cx + rx * cosTable, cy + ry * sinTable))
+
+def pointsList(value):
+    if isColumn(value):
+        numbers = [float(v) for v in value]
+    else:
+        numbers = [float(v) for v in NUMBER.findall(value or "")]
+
+    return np.array(numbers[:len(numbers) // 2 * 2]).reshape(-1, 2)
+
+#a line as a cubic with its control points a third of the way along, so
+#it is flat and flattens to one segment
+def lineSegment(x0, y0, x1, y1):
+    dx = (x1 - x0) / 3.0
+    dy = (y1 - y0) / 3.0
+
+    return (x0, y0, x0 + dx, y0 + dy, x1 - dx, y1 - dy, x1, y1)
+
+"""
+flattenPath(data, tolerance)
+
+returns the subpaths of a PathData with its curves flattened to lines no
+further than tolerance from the curves. Lines and quadratics are written
+as cubics so every segment is flattened in one vectorised step, the number
+of points on each curve comes from its second differences.
+
+Chords between points on a curve cut inside it, so the points are moved
+out by two thirds of the bulge of their chords, the area the chords cut off
+then matches the area they take in, as circleTable does for circles.
+"""
+def flattenPath(data, tolerance):
+    segments = []
+    subpath  = []
+    starts   = []
+    closed   = []
+
+    cx = cy = sx = sy = 0.0
+    index    = 0
+    open     = False
+    coords   = data.coords
+
+    for code in data.commands:
+        command = chr(code)
+
+        if command == "M":
+            cx, cy = coords[index], coords[index + 1]
+            sx, sy = cx, cy
+            index += 2
+            open   = False
+            continue
+
+        if not open:
+            starts.append((cx, cy))
+            closed.append(False)
+            sx, sy = cx, cy
+            open   = True
+
+        if command == "L":
+            x, y = coords[index], coords[index + 1]
+            segments.append(lineSegment(cx, cy, x, y))
+            index += 2
+        elif command == "C":
+            segments.append((cx, cy) + tuple(coords[index : index + 6]))
+            x, y = coords[index + 4], coords[index + 5]
+            index += 6
+        elif command == "Q":
+            qx, qy, x, y = coords[index : index + 4]
+            segments.append((cx, cy,
+                             cx + 2.0 / 3.0 * (qx - cx), cy + 2.0 / 3.0 * (qy - cy),
+                             x + 2.0 / 3.0 * (qx - x), y + 2.0 / 3.0 * (qy - y),
+                             x, y))
+            index += 4
+        else:
+            x, y = sx, sy
+
+            segments.append(lineSegment(cx, cy, x, y))
+
+            closed[-1] = True
+            open       = False
+
+        subpath.append(len(starts) - 1)
+        cx, cy = x, y
+
+    if not segments:
+        return []
+
+    s = np.array(segments)
+
+    p0, p1, p2, p3 = s[:, 0:2], s[:, 2:4], s[:, 4:6], s[:, 6:8]
+
+    #points on each segment from its flatness
+    flat = np.maximum(np.hypot(*(p0 - 2 * p1 + p2).T), np.hypot(*(p1 - 2 * p2 + p3).T))
+    n    = np.maximum(1, np.ceil(np.sqrt(0.75 * flat / tolerance))).astype(np.int64)
+    n    = np.minimum(n, 256)
+
+    owner = np.repeat(np.arange(len(s)), n)
+    step  = np.arange(len(owner)) - np.repeat(np.cumsum(n) - n, n) + 1
+    t     = (step / n[owner])[:, None]
+    u     = 1.0 - t
+
+    points = (u * u * u * p0[owner] + 3 * u * u * t * p1[owner] +
+              3 * u * t * t * p2[owner] + t * t * t * p3[owner])
+
+    #a chord of a curve with second derivative b over a step of 1 / n bulges
+    #by b / (8 n n) across it, the part of b across the tangent moves the
+    #point out by b / (12 n n)
+    tangent = u * u * (p1 - p0)[owner] + 2 * u * t * (p2 - p1)[owner] + t * t * (p3 - p2)[owner]
+    bend    = 6.0 * (u * (p0 - 2 * p1 + p2)[owner] + t * (p1 - 2 * p2 + p3)[owner])
+    length  = np.maximum(np.sum(tangent * tangent, axis = 1), 1e-18)[:, None]
+    across  = bend - np.sum(bend * tangent, axis = 1)[:, None] * tangent / length
+
+    points -= across / (12.0 * n[owner] * n[owner])[:, None]
+
+    pathOf = np.array(subpath)[owner]
+    bounds = np.searchsorted(pathOf, np.arange(len(starts) + 1))
+
+    subpaths = []
+
+    for i in range(len(starts)):
+        pts = np.vstack((starts[i], points[bounds[i]:bounds[i + 1]]))
+
+        if closed[i] and len(pts) > 1:
+            pts = pts[:-1]
+
+        subpaths.append((pts, closed[i]))
+
+    return subpaths
+
+#paths of absolute polylines, as SVGWrap writes them, skip PathData
+POLYLINE_PATH = re.compile(r"^\s*(?:M[^A-DF-Za-df-z]*(?:L[^A-DF-Za-df-z]*)*(?:[Zz]\s*)?)+$")
+
+#returns the subpaths of a shape
+def shapeGeometry(tag, attrs, scale):
+    get = attrs.get
+
+    if tag == 'circle':
+        r = parseNumber(get('r'))
+
+        if r <= 0:
+            return []
+
+        return [(ellipsePoints(parseNumber(get('cx')), parseNumber(get('cy')), r, r, scale), True)]
+
+    if tag == 'ellipse':
+        rx = parseNumber(get('rx'))
+        ry = parseNumber(get('ry'))
+
+        if rx <= 0 or ry <= 0:
+            return []
+
+        return [(ellipsePoints(parseNumber(get('cx')), parseNumber(get('cy')), rx, ry, scale), True)]
+
+    if tag == 'rect':
+        x = parseNumber(get('x'))
+        y = parseNumber(get('y'))
+        w = parseNumber(get('width'))
+        h = parseNumber(get('height'))
+
+        if w <= 0 or h <= 0:
+            return []
+
+        rx = get('rx')
+        ry = get('ry')
+        rx = parseNumber(rx if rx is not None else ry)
+        ry = parseNumber(ry if ry is not None else get('rx'))
+        rx = min(rx, w / 2.0)
+        ry = min(ry, h / 2.0)
+
+        if rx > 0 and ry > 0:
+            d = ("M%r %rH%rA%r %r 0 0 1 %r %rV%rA%r %r 0 0 1 %r %rH%rA%r %r 0 0 1 %r %rV%rA%r %r 0 0 1 %r %rZ" %
+                 (x + rx, y, x + w - rx, rx, ry, x + w, y + ry, y + h - ry, rx, ry, x + w - rx, y + h,
+                  x + rx, rx, ry, x, y + h - ry, y + ry, rx, ry, x + rx, y))
+
+            return flattenPath(PathData(d), CURVE_TOLERANCE / scale)
+
+        return [(np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]]), True)]
+
+    if tag == 'line':
+        return [(np.array([[parseNumber(get('x1')), parseNumber(get('y1'))],
+                           [parseNumber(get('x2')), parseNumber(get('y2'))]]), False)]
+
+    if tag in ('polyline', 'polygon'):
+        pts = pointsList(get('points'))
+
+        return [(pts, tag == 'polygon')] if len(pts) else []
+
+    if tag == 'path':
+        d = get('d')
+
+        if not d:
+            return []
+
+        d = str(d)
+
+        if POLYLINE_PATH.match(d):
+            subpaths = []
+
+            for part in d.split("M")[1:]:
+                pts = np.array(NUMBER.findall(part), dtype = np.float64)
+
+                if len(pts) > 1:
+                    subpaths.append((pts[:len(pts) // 2 * 2].reshape(-1, 2), part.rstrip()[-1:] in ("Z", "z")))
+
+            return subpaths
+
+        return flattenPath(PathData(d), CURVE_TOLERANCE / scale)
+
+    return []
+
+"""
+strokeOutline(subpaths, width, cap, scale)
+
+returns the outline of a stroke as polygons, a quad along each segment and
+a circle at each join, and each end for round caps, all wound the same way
+so filling them with the nonzero rule gives their union. Joins where the
+stroke turns too little to leave a visible gap are left out.
+
+returns a list of M x k x 2 arrays of M polygons with k points
+"""
+def strokeOutline(subpaths, width, cap, scale):
+    h       = width / 2.0
+    quads   = []
+    centres = []
+
+    for pts, closed in subpaths:
+        if closed:
+            pts = np.vstack((pts, pts[:1]))
+
+        d      = np.diff(pts, axis = 0)
+        length = np.hypot(d[:, 0], d[:, 1])
+        keep   = length > 0
+
+        if not keep.any():
+            if cap == 'round':
+                centres.append(pts[:1])
+            continue
+
+        p0 = pts[:-1][keep].copy()
+        p1 = pts[1:][keep].copy()
+        u  = d[keep] / length[keep][:, None]
+
+        if cap == 'square' and not closed:
+            p0[0]  -= u[0] * h
+            p1[-1] += u[-1] * h
+
+        n = np.column_stack((-u[:, 1], u[:, 0])) * h
+
+        quads.append(np.stack((p0 + n, p1 + n, p1 - n, p0 - n), axis = 1))
+
+        #joins between segments that turn enough to leave a gap
+        turn = np.abs(u[:-1, 0] * u[1:, 1] - u[:-1, 1] * u[1:, 0]) + (np.sum(u[:-1] * u[1:], axis = 1) < 0)
+
+        joins = p0[1:][turn * h * scale > CURVE_TOLERANCE / 2.0]
+
+        if closed:
+            first = abs(u[-1, 0] * u[0, 1] - u[-1, 1] * u[0, 0]) + (np.dot(u[-1], u[0]) < 0)
+
+            if first * h * scale > CURVE_TOLERANCE / 2.0:
+                joins = np.vstack((joins, p0[:1]))
+
+        centres.append(joins)
+
+        if cap == 'round' and not closed:
+            centres.append(np.vstack((p0[:1], p1[-1:])))
+
+    polygons = quads
+
+    centres = [c for c in centres if len(c)]
+
+    if centres:
+        centres = np.vstack(centres)
+
+        cosTable, sinTable = circleTable(circleSegments(h * scale, 4, 64))
+
+        #reversed to wind the same way as the quads
+        ring = np.column_stack((cosTable, sinTable))[::-1] * h
+
+        polygons.append(centres[:, None, :] + ring[None, :, :])
+
+    return polygons
+
+#the stroke of a circle, the ring between two circles wound in opposite ways
+def circleStroke(attrs, width, scale):
+    cx = parseNumber(attrs.get('cx'))
+    cy = parseNumber(attrs.get('cy'))
+    r  = parseNumber(attrs.get('r'))
+    h  = width / 2.0
+
+    rings = [ellipsePoints(cx, cy, r + h, r + h, scale)]
+
+    if r > h:
+        rings.append(ellipsePoints(cx, cy, r - h, r - h, scale)[::-1])
+
+    return rings
+
+"""
+EDGES
+
+edges are four arrays, x0, y0, x1, y1, in pixels
+"""
+def transformPoints(points, m):
+    return (m[0] * points[..., 0] + m[2] * points[..., 1] + m[4],
+            m[1] * points[..., 0] + m[3] * points[..., 1] + m[5])
+
+#edges of closed polygons, a list of N x 2 arrays
+def polygonEdges(polygons, m):
+    starts = [p for p in polygons if len(p) > 1]
+
+    if not starts:
+        return None
+
+    start = np.vstack(starts)
+    end   = np.vstack([np.vstack((p[1:], p[:1])) for p in starts])
+
+    x0, y0 = transformPoints(start, m)
+    x1, y1 = transformPoints(end, m)
+
+    return (x0, y0, x1, y1)
+
+#edges of M x k x 2 arrays of polygons
+def batchEdges(batches, m):
+    x0 = []
+    y0 = []
+    x1 = []
+    y1 = []
+
+    for polygons in batches:
+        xs, ys = transformPoints(polygons, m)
+
+        after = np.r_[1:xs.shape[1], 0]
+
+        x0.append(xs.ravel())
+        y0.append(ys.ravel())
+        x1.append(xs[:, after].ravel())
+        y1.append(ys[:, after].ravel())
+
+    if not x0:
+        return None
+
+    return (np.concatenate(x0), np.concatenate(y0), np.concatenate(x1), np.concatenate(y1))
+
+"""
+class Rasterizer
+
+draws a document onto a premultiplied RGBA canvas. Shapes are turned into
+edges and queued as paint items, the items are rasterized together, up
+to RASTER_CHUNK sub scanline pixels at a time, and composited in document order.
+
+Coverage is found on samples sub scanlines per pixel row. Where an edge
+crosses a sub scanline it adds its winding direction to the pixel it
+crosses, split with the next pixel by where in the pixel it crosses, so a
+running sum along the sub scanline gives how much of each pixel is inside
+on that sub scanline, and the nonzero or evenodd rule is applied to it.
+The sub scanlines of a pixel row are averaged for its anti-aliased
+coverage.
+"""
+class Rasterizer:
+    def __init__(self, width, height, samples = RASTER_SAMPLES, background = WHITE):
+        self.width   = width
+        self.height  = height
+        self.samples = samples
+
+        self.canvas  = np.zeros((height, width, 4), dtype = np.float32)
+
+        if background is not None:
+            r, g, b, a = [v / 255.0 for v in background]
+
+            self.canvas[:] = (r * a, g * a, b * a, a)
+
+        self.pending = []
+        self.queued  = 0
+
+        self.ids       = {}
+        self.classes   = {}
+        self.gradients = {}
+
+    """
+    def drawDocument(root, matrix)
+
+    indexes the ids, style classes and gradients of a document and draws
+    it with the matrix from user space to pixels
+    """
+    def drawDocument(self, root, matrix):
+        for element in root.iter():
+            tag = localName(element.tag)
+            id  = element.get('id')
+
+            if id is not None:
+                self.ids[id] = element
+
+            if tag == 'style' and element.text:
+                for name, declarations in CSS_RULE.findall(element.text):
+                    self.classes.setdefault(name, {}).update(parseDeclarations(declarations))
+
+        for id, element in self.ids.items():
+            if localName(element.tag) in ('linearGradient', 'radialGradient'):
+                for stop in element:
+                    props = dict(stop.items())
+                    props.update(parseDeclarations(props.get('style')))
+
+                    self.gradients[id] = props.get('stop-color', "black")
+                    break
+
+        self.draw(root, matrix, DEFAULT_STYLE, 0)
+
+        self.flush()
+
+    #returns the style of an element from the style it inherits
+    def resolveStyle(self, attrs, inherited):
+        props = {}
+
+        for key in DEFAULT_STYLE:
+            if key in attrs:
+                props[key] = attrs[key]
+
+        classes = attrs.get('class')
+
+        if classes:
+            for name in str(classes).split():
+                props.update(self.classes.get(name, {}))
+
+        if 'style' in attrs:
+            props.update(parseDeclarations(attrs['style']))
+
+        if not props:
+            return inherited
+
+        style = dict(inherited)
+
+        for key, value in props.items():
+            if value == "inherit" or key not in DEFAULT_STYLE:
+                continue
+
+            if key == "opacity":
+                style[key] = inherited[key] * parseNumber(value, 1.0)
+            else:
+                style[key] = value
+
+        return style
+
+    #returns the (r, g, b) of a paint between 0 and 1, None for no paint
+    def parseColour(self, value):
+        value = str(value).strip()
+
+        reference = URL_REFERENCE.match(value)
+
+        if reference:
+            value = self.gradients.get(reference.group(1), "none")
+
+        lower = value.lower()
+
+        if lower in ("none", "transparent", ""):
+            return None
+
+        if lower.startswith("#"):
+            hex = lower[1:]
+
+            if len(hex) == 3:
+                hex = "".join([c + c for c in hex])
+
+            try:
+                return tuple([int(hex[i:i + 2], 16) / 255.0 for i in (0, 2, 4)])
+            except ValueError:
+                return None
+
+        if lower.startswith("rgb"):
+            numbers = NUMBER.findall(lower)[:3]
+
+            if "%" in lower:
+                return tuple([min(float(n), 100.0) / 100.0 for n in numbers])
+
+            return tuple([min(float(n), 255.0) / 255.0 for n in numbers])
+
+        if lower == "currentcolor":
+            return (0.0, 0.0, 0.0)
+
+        colour = NAMED_COLOURS.get(lower)
+
+        return None if colour is None else tuple([c / 255.0 for c in colour])
+
+    def draw(self, element, matrix, style, depth):
+        tag = localName(element.tag)
+
+        if tag in SKIP_TAGS:
+            return
+
+        if isinstance(element, ShapeBatch):
+            for attrs in element.rows():
+                self.drawShape(tag, attrs, matrix, style)
+            return
+
+        attrs = dict(element.items())
+
+        if attrs.get('display') == "none":
+            return
+
+        if tag in SHAPE_TAGS:
+            self.drawShape(tag, attrs, matrix, style)
+            return
+
+        transform = attrs.get('transform')
+
+        if transform:
+            matrix = compose(matrix, transformMatrix(str(transform)))
+
+        style = self.resolveStyle(attrs, style)
+
+        if tag in CONTAINER_TAGS:
+            for child in element:
+                self.draw(child, matrix, style, depth)
+        elif tag == 'use' and depth < USE_DEPTH:
+            href = None
+
+            for key in HREF_KEYS:
+                href = href or attrs.get(key)
+
+            target = self.ids.get(str(href or "")[1:])
+
+            if target is not None:
+                offset = (1.0, 0.0, 0.0, 1.0, parseNumber(attrs.get('x')), parseNumber(attrs.get('y')))
+
+                #a referenced definition is drawn even though it is in the defs
+                targetTag = localName(target.tag)
+
+                if targetTag == 'symbol':
+                    for child in target:
+                        self.draw(child, compose(matrix, offset), style, depth + 1)
+                else:
+                    self.draw(target, compose(matrix, offset), style, depth + 1)
+
+    def drawShape(self, tag, attrs, matrix, style):
+        transform = attrs.get('transform')
+
+        if transform:
+            matrix = compose(matrix, transformMatrix(str(transform)))
+
+        style = self.resolveStyle(attrs, style)
+        scale = areaScale(*matrix[:4])
+
+        fill   = self.parseColour(style["fill"]) if tag != 'line' else None
+        stroke = self.parseColour(style["stroke"])
+        width  = parseNumber(style["stroke-width"], 1.0)
+
+        if fill is None and (stroke is None or width <= 0):
+            return
+
+        subpaths = shapeGeometry(tag, attrs, scale)
+
+        if not subpaths:
+            return
+
+        opacity = style["opacity"]
+
+        if fill is not None:
+            edges = polygonEdges([pts for pts, closed in subpaths], matrix)
+
+            if edges is not None:
+                alpha = opacity * parseNumber(style["fill-opacity"], 1.0)
+
+                self.addItem(edges, style["fill-rule"] == "evenodd", fill, alpha)
+
+        if stroke is not None and width > 0:
+            if tag == 'circle':
+                edges = polygonEdges(circleStroke(attrs, width, scale), matrix)
+            else:
+                edges = batchEdges(strokeOutline(subpaths, width, style["stroke-linecap"], scale), matrix)
+
+            if edges is not None:
+                alpha = opacity * parseNumber(style["stroke-opacity"], 1.0)
+
+                self.addItem(edges, False, stroke, alpha)
+
+    """
+    def addItem(edges, evenOdd, colour, alpha)
+
+    queues a paint item, the pixels it covers are found from its edges and
+    clipped to the canvas, items too big for one pass are split into bands
+    of rows
+    """
+    def addItem(self, edges, evenOdd, colour, alpha):
+        if alpha <= 0:
+            return
+
+        x0, y0, x1, y1 = edges
+
+        left   = max(0, int(math.floor(min(x0.min(), x1.min()))))
+        right  = min(self.width, int(math.ceil(max(x0.max(), x1.max()))))
+        top    = max(0, int(math.floor(min(y0.min(), y1.min()))))
+        bottom = min(self.height, int(math.ceil(max(y0.max(), y1.max()))))
+
+        if right <= left or bottom <= top:
+            return
+
+        s    = self.samples
+        size = s * (right - left + 1)
+        band = max(1, RASTER_CHUNK // size)
+
+        for row in range(top, bottom, band):
+            rows = min(band, bottom - row)
+
+            if self.queued + rows * size > RASTER_CHUNK:
+                self.flush()
+
+            self.pending.append((edges, evenOdd, colour, alpha, left, row, right - left, rows))
+            self.queued += rows * size
+
+    #rasterizes and composites the queued items
+    def flush(self):
+        if not self.pending:
+            return
+
+        s     = self.samples
+        items = self.pending
+
+        self.pending = []
+        self.queued  = 0
+
+        #each item has a rows * s by width + 1 block, the last column takes
+        #crossings right of the item
+        sizes   = np.array([rows * s * (width + 1) for (e, r, c, a, left, top, width, rows) in items])
+        offsets = np.cumsum(sizes) - sizes
+
+        #edges of all the items, y in sub scanlines, with the item each belongs to
+        counts = [len(item[0][0]) for item in items]
+        owner  = np.repeat(np.arange(len(items)), counts)
+
+        X0 = np.concatenate([item[0][0] for item in items])
+        Y0 = np.concatenate([item[0][1] for item in items]) * s
+        X1 = np.concatenate([item[0][2] for item in items])
+        Y1 = np.concatenate([item[0][3] for item in items]) * s
+
+        rowStart = np.array([item[5] * s for item in items])[owner]
+        rowEnd   = rowStart + np.array([item[7] * s for item in items])[owner]
+        left     = np.array([item[4] for item in items], dtype = np.float64)[owner]
+        cols     = np.array([item[6] + 1 for item in items])[owner]
+
+        #sub scanlines k whose centre k + 0.5 is between the ends of an edge
+        low  = np.minimum(Y0, Y1)
+        high = np.maximum(Y0, Y1)
+
+        first = np.maximum(np.ceil(low - 0.5), rowStart).astype(np.int64)
+        last  = np.minimum(np.ceil(high - 0.5), rowEnd).astype(np.int64)
+
+        counts = np.where(Y0 != Y1, np.maximum(last - first, 0), 0)
+        total  = int(counts.sum())
+
+        acc = np.zeros(int(sizes.sum()), dtype = np.float32)
+
+        if total:
+            edge = np.repeat(np.arange(len(X0)), counts)
+            k    = np.repeat(first, counts) + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+
+            y0 = Y0[edge]
+            y1 = Y1[edge]
+
+            x = X0[edge] + (k + 0.5 - y0) * ((X1[edge] - X0[edge]) / (y1 - y0))
+            x = np.clip(x - left[edge], 0.0, cols[edge] - 1)
+
+            col      = np.floor(x)
+            fraction = x - col
+            col      = col.astype(np.int64)
+
+            index     = offsets[owner[edge]] + (k - rowStart[edge]) * cols[edge] + col
+            direction = np.where(y1 > y0, 1.0, -1.0)
+
+            #the part of the crossed pixel right of the crossing, the rest
+            #goes to the next pixel
+            acc = np.bincount(np.concatenate((index, np.minimum(index + 1, offsets[owner[edge]] + (k - rowStart[edge] + 1) * cols[edge] - 1))),
+                              weights = np.concatenate((direction * (1.0 - fraction), direction * fraction)),
+                              minlength = len(acc)).astype(np.float32)
+
+        for i, (edges, evenOdd, colour, alpha, left, top, width, rows) in enumerate(items):
+            block   = acc[offsets[i] : offsets[i] + sizes[i]].reshape(rows * s, width + 1)
+            winding = np.abs(np.cumsum(block[:, :-1], axis = 1))
+
+            if evenOdd:
+                winding = np.fmod(winding, 2.0)
+                inside  = np.minimum(winding, 2.0 - winding)
+            else:
+                inside  = np.minimum(winding, 1.0)
+
+            coverage = inside.reshape(rows, s, width).mean(axis = 1)
+
+            self.composite(coverage, colour, alpha, left, top)
+
+    #paints a colour over the canvas through a coverage mask, source over,
+    #only the covered pixels of a large mask are painted when they are few,
+    #as for strokes
+    def composite(self, coverage, colour, alpha, left, top):
+        rows, width = coverage.shape
+
+        paint = np.array(colour + (1.0,), dtype = np.float32)
+
+        if coverage.size > SPARSE_PIXELS:
+            covered = np.flatnonzero(coverage)
+
+            if len(covered) * 4 < coverage.size:
+                index  = (covered // width + top) * self.width + left + covered % width
+                pixels = self.canvas.reshape(-1, 4)
+
+                a = (coverage.ravel()[covered] * alpha)[:, None]
+
+                pixels[index] += a * (paint - pixels[index])
+                return
+
+        region = self.canvas[top : top + rows, left : left + width]
+
+        region += (coverage * alpha)[:, :, None] * (paint - region)
+
+    #returns the canvas as unpremultiplied 8 bit RGBA
+    def image(self):
+        alpha = self.canvas[:, :, 3:4]
+
+        #pixels that round to transparent are black, so transparent tiles
+        #compress well
+        rgb = np.where(alpha >= 0.5 / 255.0, self.canvas[:, :, :3] / np.maximum(alpha, 1e-6), 0.0)
+
+        out = np.concatenate((rgb, alpha), axis = 2)
+
+        return np.clip(np.rint(out * 255.0), 0, 255).astype(np.uint8)
+
+"""
+render(svgDoc, width, height, samples, background)
+
+draws a document, an SVGWrap, an ElementTree or the root svg element of
+either document model, and returns an height x width x 4 array of 8 bit
+RGBA. The size of the document comes from its width, height and viewBox,
+with width or height given the drawing is scaled to fit and centred.
+
+Attributes:
+    svgDoc     - the document
+    width      - width of the image, None for the document's width
+    height     - height of the image, None for the document's height
+    samples    - sub scanlines per pixel row
+    background - (r, g, b, a) from 0 to 255, None for transparent
+"""
+def render(svgDoc, width = None, height = None, samples = RASTER_SAMPLES, background = WHITE):
+    root = documentRoot(svgDoc)
+
+    viewBox = [parseNumber(v) for v in NUMBER.findall(str(root.get('viewBox') or ""))]
+
+    docWidth  = parseNumber(root.get('width'), 0.0)
+    docHeight = parseNumber(root.get('height'), 0.0)
+
+    if len(viewBox) == 4 and viewBox[2] > 0 and viewBox[3] > 0:
+        vx, vy, vw, vh = viewBox
+    else:
+        vx, vy, vw, vh = 0.0, 0.0, docWidth or 100.0, docHeight or 100.0
+
+    docWidth  = docWidth or vw
+    docHeight = docHeight or vh
+
+    if width is None and height is None:
+        width, height = docWidth, docHeight
+    elif width is None:
+        width = height * docWidth / docHeight
+    elif height is None:
+        height = width * docHeight / docWidth
+
+    width  = max(1, int(math.ceil(width)))
+    height = max(1, int(math.ceil(height)))
+
+    #fit the view box in the image, centred
+    scale  = min(width / vw, height / vh)
+    matrix = (scale, 0.0, 0.0, scale,
+              (width - vw * scale) / 2.0 - vx * scale,
+              (height - vh * scale) / 2.0 - vy * scale)
+
+    rasterizer = Rasterizer(width, height, samples, background)
+    rasterizer.drawDocument(root, matrix)
+
+    return rasterizer.image()
+
+#returns the root element of an SVGWrap, ElementTree or element
+def documentRoot(svgDoc):
+    if hasattr(svgDoc, 'getroot'):
+        return svgDoc.getroot()
+
+    if hasattr(svgDoc, 'root') and hasattr(svgDoc, 'tree'):
+        return svgDoc.root
+
+    return svgDoc
+
+"""
+writePNG(output, image, level)
+
+writes an 8 bit grey, RGB or RGBA image as a PNG to a filename or a binary
+file object, the rows are unfiltered and compressed with zlib at level
+
+returns the number of bytes written
+"""
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+PNG_COLOUR_TYPES = {1 : 0, 3 : 2, 4 : 6}
+
+def pngChunk(kind, body):
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body) & 0xffffffff)
+
+def writePNG(output, image, level = 6):
+    image = np.asarray(image, dtype = np.uint8)
+
+    if image.ndim == 2:
+        image = image[:, :, None]
+
+    height, width, channels = image.shape
+
+    assert (channels in PNG_COLOUR_TYPES), "image must have 1, 3 or 4 channels"
+
+    #each row starts with its filter type, 0 for none
+    rows = np.zeros((height, width * channels + 1), dtype = np.uint8)
+    rows[:, 1:] = image.reshape(height, width * channels)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, PNG_COLOUR_TYPES[channels], 0, 0, 0)
+
+    png = (PNG_SIGNATURE +
+           pngChunk(b"IHDR", header) +
+           pngChunk(b"IDAT", zlib.compress(rows.tobytes(), level)) +
+           pngChunk(b"IEND", b""))
+
+    if hasattr(output, 'write'):
+        output.write(png)
+    else:
+        with open(output, 'wb') as f:
+            f.write(png)
+
+    return len(png)
+
+"""
+thumbnail(svgDoc, output, size, samples, level)
+
+draws a document to fit in a size x size square and writes it as a PNG
+to output, a filename or binary file object
+
+returns the image
+"""
+THUMBNAIL_SIZE = 256
+
+def thumbnail(svgDoc, output, size = THUMBNAIL_SIZE, samples = RASTER_SAMPLES, level = 6):
+    root = documentRoot(svgDoc)
+
+    docWidth  = parseNumber(root.get('width'), size)
+    docHeight = parseNumber(root.get('height'), size)
+
+    if docWidth >= docHeight:
+        image = render(root, width = size, samples = samples)
+    else:
+        image = render(root, height = size, samples = samples)
+
+    writePNG(output, image, level)
+
+    return image
+
+#draws an svg file and writes it as a PNG, returns the image
+def renderFile(svgFile, pngFile, width = None, height = None, samples = RASTER_SAMPLES):
+    image = render(ET.parse(svgFile), width, height, samples)
+
+    writePNG(pngFile, image)
+
+    return image
+
+"""
+________________________________
+Testing
+"""
+TEST_PNG = r'SVGRasterTest.png'
+
+TEST_RASTER_MANDALA      = True
+TEST_THUMBNAIL_BENCHMARK = False
+TEST_RASTER_COVERAGE     = False
+
+def RasterMandalaTest():
+    import PythonSVGWrapperXML as svg
+
+    svgOut = svg.SVGWrap({
+                          "width"  : svg.MANDALA_CANVAS_SIZE,
+                          "height" : svg.MANDALA_CANVAS_SIZE,
+                         })
+
+    mandala = svg.Mandala(seed = 1)
+
+    mandala.circles(colourOn = True, svgDoc = svgOut, parent = svgOut.root)
+
+    image = render(svgOut)
+
+    assert (image.shape == (svg.MANDALA_CANVAS_SIZE, svg.MANDALA_CANVAS_SIZE, 4)), image.shape
+    assert ((image[:, :, :3] < 255).any()), "the mandala drew nothing"
+
+    writePNG(TEST_PNG, image)
+
+    return svgOut
+
+#the coverage of curved shapes drawn alone must be their area, whether the
+#curve is a circle, an ellipse, arcs of a path or the corners of a rect
+def RasterCoverageTest(tolerance = 0.01):
+    import PythonSVGWrapperXML as svg
+
+    for r in (3, 10, 40):
+        arcs = "M%r 50A%r %r 0 1 0 %r 50A%r %r 0 1 0 %r 50Z" % (50 + r, r, r, 50 - r, r, r, 50 + r)
+
+        shapes = [
+                  ('circle',  {"cx" : 50, "cy" : 50, "r" : r},                                 math.pi * r * r),
+                  ('ellipse', {"cx" : 50, "cy" : 50, "rx" : r, "ry" : r / 2.0},                math.pi * r * r / 2.0),
+                  ('path',    {"d" : arcs},                                                    math.pi * r * r),
+                  ('rect',    {"x" : 10, "y" : 10, "width" : 80, "height" : 80, "rx" : r},     6400 - (4 - math.pi) * r * r)
+                 ]
+
+        for tag, attr, area in shapes:
+            svgOut = svg.SVGWrap({"width" : 100, "height" : 100}, svg.NODE_MODEL)
+
+            svg.subElement(svgOut.root, tag, attr)
+
+            image    = render(svgOut)
+            coverage = ((255 - image[:, :, 0].astype(np.float64)) / 255.0).sum()
+
+            assert (abs(coverage / area - 1.0) < tolerance), tag + " of radius " + str(r) + " covers " + str(coverage) + " of " + str(area)
+
+            print(tag + " of radius " + str(r) + " covers " + "{0:.4f}".format(coverage / area) + " of its area")
+
+def ThumbnailBenchmark(count = 100):
+    import PythonSVGWrapperXML as svg
+
+    start = time.perf_counter()
+
+    for seed in range(count):
+        svgOut = svg.SVGWrap({
+                              "width"  : svg.MANDALA_CANVAS_SIZE,
+                              "height" : svg.MANDALA_CANVAS_SIZE,
+                             }, svg.NODE_MODEL)
+
+        svg.Mandala(seed = seed).circles(colourOn = True, svgDoc = svgOut, parent = svgOut.root)
+
+        thumbnail(svgOut, "thumb_" + str(seed) + ".png", 128)
+
+    elapsed = time.perf_counter() - start
+
+    print(str(count) + " thumbnails in " + "{0:.2f}".format(elapsed) + " s, " +
+          "{0:.0f}".format(count * 60.0 / elapsed) + " per minute")
+
+if __name__ == "__main__":
+    if TEST_RASTER_MANDALA:
+        RasterMandalaTest()
+    elif TEST_THUMBNAIL_BENCHMARK:
+        ThumbnailBenchmark()
+    elif TEST_RASTER_COVERAGE:
+        RasterCoverageTest()
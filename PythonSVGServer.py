@@ -0,0 +1,739 @@
+"""
+File: PythonSVGServer.py
+
+This file contains a small HTTP service that draws mandalas on demand, so
+a page or a script can ask for a seed instead of waiting on a batch run.
+
+    python PythonSVGServer.py --port 8080 -j 4
+    curl http://127.0.0.1:8080/circles/7.svg
+    curl http://127.0.0.1:8080/lotus/3.png?size=512&lobes=13
+    curl http://127.0.0.1:8080/stats
+
+A path is /kind/seed.format, the kinds, their parameters and the formats
+are those of PythonSVGBatch, and the query sets size, model, minify and
+the parameters of the kind, each number within PARAMETER_RANGES. Drawing
+is done by renderBytes in a pool of processes so the event loop only
+parses requests and writes responses.
+
+    identical requests that arrive while a render is running wait on that
+    render rather than starting their own
+    finished renders are kept in a cache bounded by bytes, least recently
+    used first out, and are served with an ETag so a client that sends it
+    back in If-None-Match gets 304 Not Modified
+    at most jobs renders run at once and at most queue more wait for a
+    process, past that a request for a render that is not cached or
+    running is answered 503 with Retry-After
+
+It listens on 127.0.0.1 by default and has no authentication, it is meant
+for local use. python PythonSVGServer.py --test starts it on a free port
+and checks the above against it.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import PythonSVGWrapperXML as svg
+import PythonSVGBatch as batch
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8080
+
+CACHE_BYTES = 64 << 20
+QUEUE_SIZE  = 16
+
+MAX_LINE           = 8192
+MAX_HEADERS        = 100
+MAX_BODY           = 1024
+KEEP_ALIVE_TIMEOUT = 15.0
+RETRY_AFTER        = 1
+
+MIN_SIZE = 16
+MAX_SIZE = 4096
+
+MIN_SEED = 0
+MAX_SEED = (1 << 32) - 1
+
+"""
+the least and most each number parameter may be, a request outside them
+is answered 400. They keep one render to a few times the work of the
+defaults, the lotus draws about 2 pi maxSize / minDistance points on its
+outer rings and more lobes make more rings before it reaches maxSize
+"""
+PARAMETER_RANGES = {
+                    "lotus"   : {
+                                 "lobes"       : (1, 32),
+                                 "rings"       : (1, 1000),
+                                 "maxSize"     : (1, 500),
+                                 "minDistance" : (0.25, 100.0)
+                                },
+                    "palette" : {
+                                 "rows"    : (1, 100),
+                                 "columns" : (1, 100)
+                                }
+                   }
+
+CACHE_CONTROL = "public, max-age=3600"
+
+REASONS = {
+           200 : "OK",
+           304 : "Not Modified",
+           400 : "Bad Request",
+           404 : "Not Found",
+           405 : "Method Not Allowed",
+           413 : "Payload Too Large",
+           431 : "Request Header Fields Too Large",
+           500 : "Internal Server Error",
+           503 : "Service Unavailable"
+          }
+
+"""
+RenderCache(maxBytes)
+
+the renders of a service keyed by request, when the bodies come to more
+than maxBytes the least recently used are dropped. A body larger than
+maxBytes is never kept.
+"""
+class RenderCache:
+    def __init__(self, maxBytes = CACHE_BYTES):
+        self.maxBytes = maxBytes
+        self.bytes    = 0
+        self.entries  = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+
+        if entry is not None:
+            self.entries.move_to_end(key)
+
+        return entry
+
+    def put(self, key, entry):
+        size = len(entry["body"])
+
+        if size > self.maxBytes:
+            return
+
+        if key in self.entries:
+            self.bytes -= len(self.entries.pop(key)["body"])
+
+        self.entries[key] = entry
+        self.bytes       += size
+
+        while self.bytes > self.maxBytes:
+            _, dropped = self.entries.popitem(last = False)
+
+            self.bytes -= len(dropped["body"])
+
+#a strong ETag from the body, renders of the same key are always the same
+def entityTag(body):
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+#true when an If-None-Match header matches etag, weak tags compare equal
+#to strong ones for GET
+def tagMatches(header, etag):
+    if header is None:
+        return False
+
+    for tag in header.split(","):
+        tag = tag.strip()
+
+        if tag == "*" or tag == etag or tag[2:] == etag and tag.startswith("W/"):
+            return True
+
+    return False
+
+"""
+parseRequest(target)
+
+returns the render key of a request target and None, or None and the
+status and message of the error
+
+the key is (kind, seed, format, size, model, minify, params) with params
+a sorted tuple of (name, value) so equal requests make equal keys
+whatever the order of their query
+"""
+def parseRequest(target):
+    parts = urlsplit(target)
+    path  = unquote(parts.path).strip("/").split("/")
+
+    if len(path) != 2 or path[0] not in batch.RENDERERS:
+        return None, (404, "no such render, paths are /kind/seed.format with kind one of " + ", ".join(sorted(batch.RENDERERS)))
+
+    kind             = path[0]
+    seed, _, format  = path[1].partition(".")
+    format           = format or "svg"
+
+    try:
+        seed = int(seed)
+    except ValueError:
+        return None, (400, "the seed must be a whole number")
+
+    if not MIN_SEED <= seed <= MAX_SEED:
+        return None, (400, "the seed must be from " + str(MIN_SEED) + " to " + str(MAX_SEED))
+
+    if format not in batch.FORMATS:
+        return None, (404, "formats are " + ", ".join(batch.FORMATS))
+
+    params = dict(batch.PARAMETERS[kind])
+    size   = 256
+    model  = svg.NODE_MODEL
+    minify = False
+
+    for name, value in parse_qsl(parts.query, keep_blank_values = True):
+        try:
+            if name == "size":
+                size = int(value)
+            elif name == "model":
+                assert (value in (svg.ETREE_MODEL, svg.NODE_MODEL)), value
+                model = value
+            elif name == "minify":
+                minify = batch.parseValue(value, False)
+            elif name in params:
+                params[name] = batch.parseValue(value, params[name])
+            else:
+                return None, (400, kind + " has no parameter " + name + ", it has " + ", ".join(sorted(params)))
+        except (ValueError, AssertionError):
+            return None, (400, "bad value for " + name + ": " + value)
+
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        return None, (400, "size must be from " + str(MIN_SIZE) + " to " + str(MAX_SIZE))
+
+    for name, (least, most) in PARAMETER_RANGES.get(kind, {}).items():
+        if not least <= params[name] <= most:
+            return None, (400, kind + " " + name + " must be from " + str(least) + " to " + str(most))
+
+    #the size only matters to png
+    if format != "png":
+        size = 0
+
+    return (kind, seed, format, size, model, minify, tuple(sorted(params.items()))), None
+
+#the status line, headers and body of a response as bytes
+def responseBytes(status, headers, body = b"", head = False):
+    lines = ["HTTP/1.1 " + str(status) + " " + REASONS[status]]
+
+    for name, value in headers:
+        lines.append(name + ": " + str(value))
+
+    lines.append("Content-Length: " + str(len(body)))
+
+    data = ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+    return data if head else data + body
+
+#one line of a request read before deadline, a line longer than MAX_LINE
+#is an error
+async def readLine(reader, deadline):
+    try:
+        return await asyncio.wait_for(reader.readline(), deadline - asyncio.get_running_loop().time())
+    except ValueError:
+        raise ValueError(431)
+
+"""
+RenderService(jobs, cacheBytes, queue, timeout)
+
+jobs       - processes that draw, and the renders that can run at once
+cacheBytes - the most bytes of finished renders kept
+queue      - renders that may wait for a process, past jobs + queue
+             renders in hand new ones are refused with 503
+timeout    - seconds a connection has to send the whole of its next
+             request, its line, headers and body, before it is closed
+
+start(host, port) returns the asyncio server, close() stops it and the
+processes. stats holds counts of requests, cache hits, 304s, coalesced
+requests, renders, refusals and failures.
+"""
+class RenderService:
+    def __init__(self, jobs = None, cacheBytes = CACHE_BYTES, queue = QUEUE_SIZE, timeout = KEEP_ALIVE_TIMEOUT):
+        self.jobs       = jobs or os.cpu_count() or 1
+        self.maxPending = self.jobs + queue
+        self.timeout    = timeout
+        self.cache      = RenderCache(cacheBytes)
+        self.executor   = None
+        self.server     = None
+
+        #the running render of each key, every request for the key awaits it
+        self.pending = {}
+
+        self.slots = None
+
+        self.stats = {
+                      "requests"    : 0,
+                      "hits"        : 0,
+                      "notModified" : 0,
+                      "coalesced"   : 0,
+                      "renders"     : 0,
+                      "rejected"    : 0,
+                      "errors"      : 0,
+                      "renderTime"  : 0.0
+                     }
+
+    async def start(self, host = SERVER_HOST, port = SERVER_PORT):
+        self.executor = ProcessPoolExecutor(max_workers = self.jobs)
+        self.slots    = asyncio.Semaphore(self.jobs)
+
+        #the pool starts its processes on the first job, started here they
+        #are forked before any connection is open rather than holding a
+        #copy of a client's socket that keeps it from seeing the close
+        await asyncio.get_running_loop().run_in_executor(self.executor, os.getpid)
+
+        self.server = await asyncio.start_server(self.handle, host, port, limit = MAX_LINE)
+
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+        for task in list(self.pending.values()):
+            task.cancel()
+
+        if self.executor is not None:
+            self.executor.shutdown(wait = True, cancel_futures = True)
+
+    def report(self):
+        return dict(self.stats,
+                    pending      = len(self.pending),
+                    cacheEntries = len(self.cache),
+                    cacheBytes   = self.cache.bytes,
+                    jobs         = self.jobs,
+                    maxPending   = self.maxPending)
+
+    #draws one key in the pool, a semaphore keeps the renders handed to
+    #the pool to the number of processes so the rest wait here, where
+    #they can still be cancelled
+    async def render(self, key):
+        kind, seed, format, size, model, minify, params = key
+
+        async with self.slots:
+            loop  = asyncio.get_running_loop()
+            start = time.perf_counter()
+
+            body, timing = await loop.run_in_executor(self.executor, batch.renderBytes,
+                                                      kind, seed, dict(params), format, size or 256, model, minify)
+
+        self.stats["renders"]    += 1
+        self.stats["renderTime"] += time.perf_counter() - start
+
+        entry = {
+                 "body"    : body,
+                 "etag"    : entityTag(body),
+                 "type"    : batch.CONTENT_TYPES[format],
+                 "gzip"    : format == "svgz",
+                 "build"   : timing["build"],
+                 "encode"  : timing["encode"]
+                }
+
+        #cached before the key leaves pending so no request misses both
+        self.cache.put(key, entry)
+
+        return entry
+
+    def finished(self, key, task):
+        self.pending.pop(key, None)
+
+        #read the failure so it is not reported as never retrieved when
+        #every request for it has gone
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    #returns the cached or rendered entry for a key, None when the
+    #service has too many renders in hand to take another
+    async def entry(self, key):
+        entry = self.cache.get(key)
+
+        if entry is not None:
+            self.stats["hits"] += 1
+            return entry
+
+        task = self.pending.get(key)
+
+        if task is None:
+            if len(self.pending) >= self.maxPending:
+                self.stats["rejected"] += 1
+                return None
+
+            task = asyncio.ensure_future(self.render(key))
+
+            self.pending[key] = task
+            task.add_done_callback(lambda done: self.finished(key, done))
+        else:
+            self.stats["coalesced"] += 1
+
+        #shielded so a client that goes away does not cancel the render
+        #for the others waiting on it
+        return await asyncio.shield(task)
+
+    #the status, headers and body for one request
+    async def respond(self, method, target, headers):
+        self.stats["requests"] += 1
+
+        if method not in ("GET", "HEAD"):
+            return 405, [("Allow", "GET, HEAD")], b""
+
+        path = urlsplit(target).path
+
+        if path == "/stats":
+            return 200, [("Content-Type", "application/json"), ("Cache-Control", "no-store")], json.dumps(self.report(), indent = 1).encode('utf-8')
+
+        if path == "/":
+            index = {
+                     "paths"      : "/kind/seed.format?size=256&model=node&minify=0&parameter=value",
+                     "formats"    : batch.FORMATS,
+                     "parameters" : batch.PARAMETERS,
+                     "ranges"     : dict(PARAMETER_RANGES, seed = (MIN_SEED, MAX_SEED), size = (MIN_SIZE, MAX_SIZE))
+                    }
+
+            return 200, [("Content-Type", "application/json")], json.dumps(index, indent = 1).encode('utf-8')
+
+        key, error = parseRequest(target)
+
+        if error is not None:
+            return error[0], [("Content-Type", "text/plain; charset=utf-8")], (error[1] + "\n").encode('utf-8')
+
+        try:
+            entry = await self.entry(key)
+        except Exception as e:
+            print("render failed for " + target + ": " + repr(e))
+
+            return 500, [("Content-Type", "text/plain; charset=utf-8")], b"render failed\n"
+
+        if entry is None:
+            return 503, [("Retry-After", RETRY_AFTER), ("Content-Type", "text/plain; charset=utf-8")], b"busy, try again\n"
+
+        tags = [("ETag", entry["etag"]), ("Cache-Control", CACHE_CONTROL)]
+
+        if tagMatches(headers.get("if-none-match"), entry["etag"]):
+            self.stats["notModified"] += 1
+
+            return 304, tags, b""
+
+        tags.append(("Content-Type", entry["type"]))
+
+        if entry["gzip"]:
+            tags.append(("Content-Encoding", "gzip"))
+
+        return 200, tags, entry["body"]
+
+    #reads the request line and headers, None at the end of the stream,
+    #raises ValueError with the status to answer for a bad request. The
+    #whole request must arrive within timeout, so a client sending a line
+    #at a time can not hold the connection open
+    async def readRequest(self, reader):
+        deadline = asyncio.get_running_loop().time() + self.timeout
+
+        line = await readLine(reader, deadline)
+
+        #a blank line between requests is allowed
+        if line in (b"\r\n", b"\n"):
+            line = await readLine(reader, deadline)
+
+        if not line:
+            return None
+
+        parts = line.decode('latin-1').split()
+
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise ValueError(400)
+
+        headers = {}
+        count   = 0
+
+        #lines are counted, a repeated header is not free
+        while True:
+            line = await readLine(reader, deadline)
+
+            if line in (b"\r\n", b"\n", b""):
+                break
+
+            count += 1
+
+            if count > MAX_HEADERS:
+                raise ValueError(431)
+
+            name, _, value = line.decode('latin-1').partition(":")
+
+            headers[name.strip().lower()] = value.strip()
+
+        #GET and HEAD have no body, a small one sent is read past
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise ValueError(400)
+
+        if length < 0:
+            raise ValueError(400)
+
+        if length > MAX_BODY:
+            raise ValueError(413)
+
+        if length:
+            await asyncio.wait_for(reader.readexactly(length), deadline - asyncio.get_running_loop().time())
+
+        return parts[0], parts[1], parts[2], headers
+
+    #serves the requests of one connection until it closes or is idle
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.readRequest(reader)
+                except ValueError as e:
+                    status = e.args[0]
+
+                    writer.write(responseBytes(status, [("Connection", "close")]))
+                    await writer.drain()
+                    break
+
+                if request is None:
+                    break
+
+                method, target, version, headers = request
+
+                keepAlive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close" or
+                             headers.get("connection", "").lower() == "keep-alive")
+
+                status, tags, body = await self.respond(method, target, headers)
+
+                tags.append(("Connection", "keep-alive" if keepAlive else "close"))
+
+                writer.write(responseBytes(status, tags, body, head = method == "HEAD"))
+                await writer.drain()
+
+                if not keepAlive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+"""
+________________________________
+CLIENT
+"""
+#one request on its own connection, returns status, headers and body
+async def fetch(host, port, target, headers = None, method = "GET"):
+    reader, writer = await asyncio.open_connection(host, port)
+
+    lines = [method + " " + target + " HTTP/1.1", "Host: " + host + ":" + str(port), "Connection: close"]
+
+    for name, value in (headers or {}).items():
+        lines.append(name + ": " + value)
+
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+    await writer.drain()
+
+    data = await reader.read()
+
+    writer.close()
+    await writer.wait_closed()
+
+    head, _, body = data.partition(b"\r\n\r\n")
+    lines         = head.decode('latin-1').split("\r\n")
+
+    replyHeaders = {}
+
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        replyHeaders[name.strip().lower()] = value.strip()
+
+    return int(lines[0].split()[1]), replyHeaders, body
+
+"""
+________________________________
+TEST
+"""
+#starts a service with one process and no queue on a free port and checks
+#coalescing, the cache, ETags, refusals, bad requests and slow clients
+#against it
+async def serviceTest():
+    service = RenderService(jobs = 1, queue = 0, timeout = 1.0)
+    server  = await service.start(SERVER_HOST, 0)
+    port    = server.sockets[0].getsockname()[1]
+    loop    = asyncio.get_running_loop()
+
+    def get(target, headers = None, method = "GET"):
+        return fetch(SERVER_HOST, port, target, headers, method)
+
+    #sends lines with a pause after each and returns what the service
+    #answered, b"" when it closed the connection without an answer
+    async def send(lines, pause = 0.0):
+        reader, writer = await asyncio.open_connection(SERVER_HOST, port)
+
+        async def write():
+            try:
+                for line in lines:
+                    writer.write(line.encode('latin-1') + b"\r\n")
+                    await writer.drain()
+                    await asyncio.sleep(pause)
+            except ConnectionError:
+                pass
+
+        sender = asyncio.ensure_future(write())
+
+        try:
+            return await asyncio.wait_for(reader.read(), service.timeout * 4)
+        finally:
+            sender.cancel()
+            writer.close()
+
+    try:
+        replies = await asyncio.gather(*[get("/circles/1.svg") for _ in range(8)])
+
+        assert (all(status == 200 for status, _, _ in replies)), [status for status, _, _ in replies]
+        assert (len(set(body for _, _, body in replies)) == 1)
+        assert (service.stats["renders"] == 1 and service.stats["coalesced"] == 7), service.stats
+
+        print("8 requests for one seed, " + str(service.stats["renders"]) + " render, " +
+              str(len(replies[0][2])) + " bytes")
+
+        etag = replies[0][1]["etag"]
+
+        status, _, body = await get("/circles/1.svg", {"If-None-Match" : etag})
+
+        assert (status == 304 and body == b""), status
+
+        status, headers, body = await get("/circles/1.svg")
+
+        assert (status == 200 and headers["etag"] == etag and service.stats["hits"] == 2), service.stats
+
+        print("cached, ETag " + etag + " answered 304")
+
+        #query order does not change the key
+        first  = await get("/palette/2.svgz?rows=4&columns=5")
+        second = await get("/palette/2.svgz?columns=5&rows=4")
+
+        assert (first[0] == 200 and first[1]["content-encoding"] == "gzip" and first[2] == second[2])
+        assert (service.stats["renders"] == 2), service.stats
+
+        #one process and no queue, so while seed 3 draws other seeds are
+        #refused and seed 3 asked for again waits on the render
+        drawing = asyncio.ensure_future(get("/lotus/3.svg?rings=200"))
+
+        while not service.pending:
+            await asyncio.sleep(0.01)
+
+        replies  = await asyncio.gather(get("/lotus/4.svg?rings=200"), get("/lotus/5.svg?rings=200"),
+                                        get("/lotus/3.svg?rings=200"), drawing)
+        statuses = [status for status, _, _ in replies]
+
+        assert (statuses == [503, 503, 200, 200]), statuses
+        assert (replies[0][1]["retry-after"] == str(RETRY_AFTER))
+
+        print("busy, " + str(service.stats["rejected"]) + " requests refused with 503")
+
+        for target, method, expected in [
+                                         ("/nothing/1.svg", "GET", 404),
+                                         ("/circles/one.svg", "GET", 400),
+                                         ("/circles/1.gif", "GET", 404),
+                                         ("/circles/1.png?size=1", "GET", 400),
+                                         ("/circles/1.svg?rings=3", "GET", 400),
+                                         ("/circles/-1.svg", "GET", 400),
+                                         ("/lotus/1.svg?rings=100000", "GET", 400),
+                                         ("/lotus/1.svg?lobes=0", "GET", 400),
+                                         ("/lotus/1.svg?minDistance=0.001", "GET", 400),
+                                         ("/lotus/1.svg?minDistance=nan", "GET", 400),
+                                         ("/palette/1.svg?rows=100000", "GET", 400),
+                                         ("/circles/1.svg", "POST", 405),
+                                         ("/circles/1.svg", "HEAD", 200),
+                                         ("/stats", "GET", 200)
+                                        ]:
+            status, _, body = await get(target, method = method)
+
+            assert (status == expected), (target, method, status)
+
+        status, _, _ = await get("/circles/1.svg", {"Content-Length" : str(MAX_BODY + 1)})
+
+        assert (status == 413), status
+
+        #header lines are counted, not header names
+        reply = await send(["GET /circles/1.svg HTTP/1.1"] + ["X-Repeated: 1"] * (MAX_HEADERS + 1))
+
+        assert (reply.startswith(b"HTTP/1.1 431 ")), reply
+
+        #a line at a time, each well within the timeout, still runs out of
+        #time for the whole request
+        start = loop.time()
+        reply = await send(["GET /circles/1.svg HTTP/1.1"] + ["X-Slow: 1"] * 100, service.timeout / 4)
+
+        assert (reply == b"" and loop.time() - start < service.timeout * 2), (reply, loop.time() - start)
+
+        print("431 for " + str(MAX_HEADERS + 1) + " repeated headers, a slow request closed after " +
+              "{0:.2f}".format(loop.time() - start) + " s")
+
+        stats = json.loads(body.decode('utf-8'))
+
+        print(json.dumps(stats, indent = 1))
+
+        return stats
+    finally:
+        await service.close()
+
+def ServiceTest():
+    return asyncio.run(serviceTest())
+
+"""
+________________________________
+COMMAND LINE
+"""
+def buildParser():
+    parser = argparse.ArgumentParser(description = "Serve mandalas drawn on demand over HTTP.")
+
+    parser.add_argument("--host", default = SERVER_HOST, help = "address to listen on")
+    parser.add_argument("--port", type = int, default = SERVER_PORT)
+    parser.add_argument("-j", "--jobs", type = int, default = os.cpu_count() or 1, help = "processes that draw")
+    parser.add_argument("--cache-mb", type = float, default = CACHE_BYTES / float(1 << 20), help = "megabytes of renders kept")
+    parser.add_argument("--queue", type = int, default = QUEUE_SIZE, help = "renders that may wait for a process")
+    parser.add_argument("--test", action = "store_true", help = "run the service test on a free port and exit")
+
+    return parser
+
+async def serve(args):
+    service = RenderService(args.jobs, int(args.cache_mb * (1 << 20)), args.queue)
+    server  = await service.start(args.host, args.port)
+
+    for sock in server.sockets:
+        host, port = sock.getsockname()[:2]
+        print("serving on http://" + host + ":" + str(port) + "/")
+
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+def main(argv = None):
+    parser = buildParser()
+    args   = parser.parse_args(argv)
+
+    if args.jobs < 1 or args.queue < 0 or args.cache_mb < 0:
+        parser.error("jobs must be at least 1, queue and cache-mb at least 0")
+
+    if args.test:
+        ServiceTest()
+        return 0
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("stopped")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,615 @@
+"""
+File: PythonSVGTiles.py
+
+This file contains tiling for drawings too big for one file. A TilePyramid splits a drawing too big for one file into square tiles at
+a number of zoom levels, so a viewer loads only the tiles in view. Level 0
+is one tile showing the whole canvas and each level after has twice as
+many tiles across. Shapes are put in the tiles their bounding boxes touch,
+a grid of buckets that is the spatial index, and the groups above each
+shape are written around it so transforms and styles carry over. The defs
+of a document, with the classes from hoistStyles, are copied into every
+tile.
+
+Coarser levels draw less. Shapes smaller than TILE_MIN_FEATURE pixels are
+left out, numbers are rounded to what the level can show and polylines
+drop points closer together than half a pixel. An IFS added with addIFS is
+replaced only deep enough at each level for its lines to be about
+TILE_MIN_SEGMENT pixels long.
+
+write saves the tiles as svg, or as png with PythonSVGRaster, with a
+manifest listing the levels and the tiles that are not empty. Each file is
+written with atomicWrite, so a viewer never reads half a tile.
+"""
+import json
+import math
+import os
+import xml.etree.ElementTree as ET
+
+from PythonSVGWrapperXML import (PathData, ShapeBatch, SVGNode, Transform2D, IFS, Point, Line, SVGWrap, Mandala,
+                                 multi, parseTransform, parseNumber, localName, matrixScale, formatNumber,
+                                 roundNumbers, roundPathData, elementPieces, joinPieces, nodePieces, atomicWrite,
+                                 MINIFY_NUMBER, HREF_KEYS, PRESENTATION_ATTRIBUTES, IFS_CANVAS_SIZE)
+
+TILE_SIZE        = 256
+TILE_MIN_FEATURE = 0.25
+TILE_MIN_SEGMENT = 1.0
+TILE_MANIFEST    = "manifest.json"
+
+#tags of a document copied whole into each tile
+TILE_DEFINITION_TAGS = ('defs', 'style')
+
+#tags that draw nothing themselves
+TILE_SKIP_TAGS = ('defs', 'style', 'metadata', 'title', 'desc', 'symbol', 'clipPath', 'mask',
+                  'linearGradient', 'radialGradient', 'pattern', 'marker', 'text')
+
+TILE_GROUP_TAGS = ('g', 'a', 'switch', 'svg')
+
+#attributes in user units, rounded at coarser levels
+TILE_COORDINATES = ("x", "y", "cx", "cy", "r", "rx", "ry", "x1", "y1", "x2", "y2",
+                    "width", "height", "stroke-width")
+
+#the decimal places that keep a number within a tenth of a pixel
+def tilePrecision(scale):
+    return max(0, int(math.ceil(math.log10(scale * 10.0))))
+
+#returns the extent, (x0, y0, x1, y1), of a shape in its own coordinates,
+#None for shapes with no extent
+def shapeExtent(tag, get):
+    if tag in ('circle', 'ellipse'):
+        cx = parseNumber(get('cx'))
+        cy = parseNumber(get('cy'))
+        rx = parseNumber(get('r' if tag == 'circle' else 'rx'))
+        ry = parseNumber(get('r' if tag == 'circle' else 'ry'))
+
+        return (cx - rx, cy - ry, cx + rx, cy + ry)
+
+    if tag == 'rect':
+        x = parseNumber(get('x'))
+        y = parseNumber(get('y'))
+
+        return (x, y, x + parseNumber(get('width')), y + parseNumber(get('height')))
+
+    if tag == 'line':
+        x1, y1, x2, y2 = [parseNumber(get(key)) for key in ("x1", "y1", "x2", "y2")]
+
+        return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+    if tag in ('polyline', 'polygon', 'path'):
+        if tag == 'path':
+            coords = PathData(str(get('d') or "")).coords
+        else:
+            coords = [float(v) for v in MINIFY_NUMBER.findall(str(get('points') or ""))]
+
+        if len(coords) < 2:
+            return None
+
+        return (min(coords[0::2]), min(coords[1::2]), max(coords[0::2]), max(coords[1::2]))
+
+    return None
+
+#returns the bounding box of points in user units
+def transformBox(matrix, xs, ys):
+    tx = [matrix[0][0] * x + matrix[0][1] * y + matrix[0][2] for x, y in zip(xs, ys)]
+    ty = [matrix[1][0] * x + matrix[1][1] * y + matrix[1][2] for x, y in zip(xs, ys)]
+
+    return (min(tx), min(ty), max(tx), max(ty))
+
+def unionBoxes(boxes):
+    boxes = [box for box in boxes if box is not None]
+
+    if not boxes:
+        return None
+
+    return (min([b[0] for b in boxes]), min([b[1] for b in boxes]),
+            max([b[2] for b in boxes]), max([b[3] for b in boxes]))
+
+"""
+elementBox(element, matrix, ids, strokeWidth)
+
+returns the bounding box in user units of an element drawn with matrix,
+widened by half its stroke width. Groups are the union of their children
+and use tags the box of what they refer to, found in ids.
+"""
+def elementBox(element, matrix, ids, strokeWidth = 1, depth = 0):
+    if not isinstance(element.tag, str):
+        return None
+
+    tag = localName(element.tag)
+
+    if element.__class__ is ShapeBatch:
+        return unionBoxes([shapeBox(tag, row.get, matrix, strokeWidth) for row in element.rows()])
+
+    own = element.get('transform')
+
+    if own:
+        matrix = multi(matrix, parseTransform(own).matrix)
+
+    strokeWidth = element.get('stroke-width', strokeWidth)
+
+    if tag in TILE_GROUP_TAGS or tag == 'symbol':
+        return unionBoxes([elementBox(child, matrix, ids, strokeWidth, depth) for child in element])
+
+    if tag == 'use':
+        href = None
+
+        for key in HREF_KEYS:
+            href = href or element.get(key)
+
+        target = ids.get(str(href or "")[1:])
+
+        if target is None or depth > 16:
+            return None
+
+        offset = [[1, 0, parseNumber(element.get('x'))], [0, 1, parseNumber(element.get('y'))], [0, 0, 1]]
+
+        return elementBox(target, multi(matrix, offset), ids, strokeWidth, depth + 1)
+
+    return shapeBox(tag, element.get, matrix, strokeWidth, False)
+
+#the bounding box of a shape, its own transform is applied unless it
+#already has been
+def shapeBox(tag, get, matrix, strokeWidth, transform = True):
+    extent = shapeExtent(tag, get)
+
+    if extent is None:
+        return None
+
+    own = get('transform') if transform else None
+
+    if own:
+        matrix = multi(matrix, parseTransform(own).matrix)
+
+    pad = parseNumber(get('stroke-width', strokeWidth), 1.0) / 2.0
+
+    x0, y0, x1, y1 = extent[0] - pad, extent[1] - pad, extent[2] + pad, extent[3] + pad
+
+    return transformBox(matrix, (x0, x1, x1, x0), (y0, y0, y1, y1))
+
+#drops points of a points attribute closer than tolerance to the last kept
+#point, the last point is always kept
+def simplifyPoints(points, tolerance, precision):
+    numbers = [float(v) for v in MINIFY_NUMBER.findall(str(points))]
+
+    kept = numbers[0:2]
+
+    for i in range(2, len(numbers) - 3, 2):
+        if abs(numbers[i] - kept[-2]) >= tolerance or abs(numbers[i + 1] - kept[-1]) >= tolerance:
+            kept.extend(numbers[i : i + 2])
+
+    if len(numbers) > 3:
+        kept.extend(numbers[len(numbers) // 2 * 2 - 2 : len(numbers) // 2 * 2])
+
+    return " ".join([formatNumber(kept[i], precision) + "," + formatNumber(kept[i + 1], precision) for i in range(0, len(kept) - 1, 2)])
+
+#returns the attributes of a shape with its geometry simplified
+def simplifyAttributes(attrs, precision, tolerance):
+    out = {}
+
+    for key, value in attrs.items():
+        if key == 'd':
+            value = roundPathData(str(value), precision)
+        elif key == 'points':
+            value = simplifyPoints(value, tolerance, precision)
+        elif key in TILE_COORDINATES:
+            value = roundNumbers(value, precision)
+
+        out[key] = value
+
+    return out
+
+#the bytes of a shape with no children
+def shapeBytes(tag, attrs):
+    pieces = []
+
+    elementPieces(SVGNode(tag, attrs), pieces)
+
+    return joinPieces(pieces)
+
+#the start and end tags of a group, as bytes
+def groupTags(tag, attrs):
+    start = shapeBytes(tag, attrs)
+
+    return (start[:-3] + b">", ("</" + tag + ">").encode('ascii'))
+
+class TilePyramid:
+    """
+    def __init__(width, height, levels, tileSize)
+
+    width, height - size of the canvas in user units, from 0, 0
+    levels        - number of zoom levels, the finest has 2^(levels - 1)
+                    tiles across
+    tileSize      - width and height of each tile in pixels
+    """
+    def __init__(self, width, height, levels = 4, tileSize = TILE_SIZE):
+        self.width    = width
+        self.height   = height
+        self.levels   = levels
+        self.tileSize = tileSize
+
+        #the pieces of each tile keyed by (level, col, row), a piece is
+        #the groups above it and its bytes or the number of a line stream
+        self.buckets = {}
+
+        self.defs    = []
+        self.streams = []
+        self.paths   = {}
+        self.depths  = {}
+
+    #user units across a tile
+    def span(self, level):
+        return max(self.width, self.height) / float(1 << level)
+
+    #pixels per user unit
+    def scale(self, level):
+        return self.tileSize / self.span(level)
+
+    def grid(self, level):
+        span = self.span(level)
+
+        return (int(math.ceil(self.width / span)), int(math.ceil(self.height / span)))
+
+    #yields the keys of the tiles a box touches
+    def tilesOf(self, level, box):
+        span = self.span(level)
+
+        columns, rows = self.grid(level)
+
+        c0 = max(0, int(math.floor(box[0] / span)))
+        c1 = min(columns - 1, int(math.floor(box[2] / span)))
+        r0 = max(0, int(math.floor(box[1] / span)))
+        r1 = min(rows - 1, int(math.floor(box[3] / span)))
+
+        for col in range(c0, c1 + 1):
+            for row in range(r0, r1 + 1):
+                yield (level, col, row)
+
+    def addPiece(self, level, box, chain, piece):
+        for key in self.tilesOf(level, box):
+            bucket = self.buckets.get(key)
+
+            if bucket is None:
+                bucket = self.buckets[key] = []
+
+            bucket.append((chain, piece))
+
+    """
+    def addDocument(svgDoc, levels)
+
+    adds the shapes of an SVGWrap document, in either model, to the tiles
+    of levels, all of them when levels is None. Text is not tiled.
+    """
+    def addDocument(self, svgDoc, levels = None):
+        root = svgDoc.root
+        ids  = {}
+
+        for element in root.iter():
+            id = element.get('id')
+
+            if id is not None:
+                ids[id] = element
+
+        pieces = []
+
+        for child in root:
+            if isinstance(child.tag, str) and localName(child.tag) in TILE_DEFINITION_TAGS:
+                nodePieces(child, pieces)
+
+        self.defs.append(joinPieces(pieces))
+
+        #the presentation attributes of the root become a group
+        attrs = dict([(key, value) for key, value in root.items() if key in PRESENTATION_ATTRIBUTES + ('class', 'style')])
+        chain = (groupTags('g', attrs),) if attrs else ()
+
+        items = []
+
+        self.collect(root, Transform2D().matrix, chain, root.get('stroke-width', 1), ids, items)
+
+        for level in (range(self.levels) if levels is None else levels):
+            self.addItems(items, level)
+
+        return len(items)
+
+    #gathers (box, scale, chain, tag, attrs) for each shape below element
+    def collect(self, element, matrix, chain, strokeWidth, ids, items):
+        for child in element:
+            if not isinstance(child.tag, str):
+                continue
+
+            tag = localName(child.tag)
+
+            if tag in TILE_SKIP_TAGS:
+                continue
+
+            if child.__class__ is ShapeBatch:
+                for row in child.rows():
+                    box = shapeBox(tag, row.get, matrix, strokeWidth)
+
+                    if box is not None:
+                        items.append((box, matrixScale(matrix), chain, tag, row))
+                continue
+
+            if tag in TILE_GROUP_TAGS:
+                own = child.get('transform')
+
+                attrs = dict(child.items())
+                attrs.pop('id', None)
+
+                self.collect(child, multi(matrix, parseTransform(own).matrix) if own else matrix,
+                             chain + (groupTags(tag, attrs),), child.get('stroke-width', strokeWidth), ids, items)
+                continue
+
+            box = elementBox(child, matrix, ids, strokeWidth)
+
+            if box is not None:
+                own = child.get('transform')
+
+                scale = matrixScale(multi(matrix, parseTransform(own).matrix) if own else matrix)
+
+                items.append((box, scale, chain, tag, dict(child.items())))
+
+    def addItems(self, items, level):
+        scale = self.scale(level)
+
+        for box, itemScale, chain, tag, attrs in items:
+            if max(box[2] - box[0], box[3] - box[1]) * scale < TILE_MIN_FEATURE:
+                continue
+
+            pixels = scale * itemScale
+
+            attrs = simplifyAttributes(attrs, tilePrecision(pixels), 0.5 / pixels)
+
+            self.addPiece(level, box, chain, shapeBytes(tag, attrs))
+
+    """
+    def addLines(lines, attr, levels)
+
+    adds a stream of lines, any iterable of Line such as the output of
+    IFS.lineToLine, to the tiles of levels. The lines in each tile are
+    joined into one path drawn with attr, lines that follow on from the one
+    before are written as one polyline and its points closer than half a
+    pixel are dropped.
+    """
+    def addLines(self, lines, attr = {
+                                      "stroke"       : "black",
+                                      "stroke-width" : 0.5,
+                                      "fill"         : "none"
+                                     }, levels = None):
+        levels = list(range(self.levels) if levels is None else levels)
+        stream = len(self.streams)
+
+        self.streams.append(dict(attr))
+
+        #the path data of each tile with the pen position and the last
+        #point written
+        pens = {}
+
+        detail = dict([(level, (tilePrecision(self.scale(level)), 0.5 / self.scale(level))) for level in levels])
+
+        for line in lines:
+            x0, y0, x1, y1 = line.p1.x, line.p1.y, line.p2.x, line.p2.y
+
+            box = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+            for level in levels:
+                precision, tolerance = detail[level]
+
+                for key in self.tilesOf(level, box):
+                    pen = pens.get(key)
+
+                    if pen is None:
+                        pen = pens[key] = [[], None, None, None, None, precision]
+
+                        self.buckets.setdefault(key, []).append(((), stream))
+
+                    data = pen[0]
+
+                    if pen[1] == x0 and pen[2] == y0:
+                        if abs(x1 - pen[3]) < tolerance and abs(y1 - pen[4]) < tolerance:
+                            pen[1] = x1
+                            pen[2] = y1
+                            continue
+                    else:
+                        if pen[1] is not None and (pen[1], pen[2]) != (pen[3], pen[4]):
+                            data.append("L" + formatNumber(pen[1], precision) + " " + formatNumber(pen[2], precision))
+
+                        data.append("M" + formatNumber(x0, precision) + " " + formatNumber(y0, precision))
+
+                    data.append("L" + formatNumber(x1, precision) + " " + formatNumber(y1, precision))
+
+                    pen[1:5] = [x1, y1, x1, y1]
+
+        for key, pen in pens.items():
+            data = pen[0]
+
+            if (pen[1], pen[2]) != (pen[3], pen[4]):
+                data.append("L" + formatNumber(pen[1], pen[5]) + " " + formatNumber(pen[2], pen[5]))
+
+            self.paths[(key, stream)] = "".join(data)
+
+        return len(pens)
+
+    """
+    def addIFS(source, rule, depth, attr)
+
+    adds the lines of IFS.lineToLine(source, rule, depth) to every level,
+    each level replaces the lines only until they are TILE_MIN_SEGMENT
+    pixels long at that level, at most depth + 1 times as lineToLine does,
+    so coarse levels are drawn from a shallower IFS
+    """
+    def addIFS(self, source, rule, depth, attr = {
+                                                  "stroke"       : "black",
+                                                  "stroke-width" : 0.5,
+                                                  "fill"         : "none"
+                                                 }):
+        lines    = source
+        replaced = 0
+
+        for level in range(self.levels):
+            while replaced <= depth and max([l.length() for l in lines]) * self.scale(level) > TILE_MIN_SEGMENT:
+                lines     = IFS.lineToLine(lines, rule, 0)
+                replaced += 1
+
+            self.depths.setdefault(level, []).append(replaced)
+
+            self.addLines(lines, attr, [level])
+
+        return replaced
+
+    #the bytes of a tile, pieces with the same groups above them share the
+    #group tags
+    def tileBytes(self, key):
+        level, col, row = key
+
+        span = self.span(level)
+
+        out = [('<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" ' +
+                'width="' + str(self.tileSize) + '" height="' + str(self.tileSize) + '" ' +
+                'viewBox="' + " ".join([formatNumber(v) for v in (col * span, row * span, span, span)]) + '">').encode('ascii')]
+
+        out.extend(self.defs)
+
+        open = ()
+
+        for chain, piece in self.buckets[key]:
+            if chain is not open:
+                common = 0
+
+                while common < min(len(open), len(chain)) and open[common] is chain[common]:
+                    common += 1
+
+                out.extend([end for start, end in reversed(open[common:])])
+                out.extend([start for start, end in chain[common:]])
+
+                open = chain
+
+            if piece.__class__ is int:
+                attrs = dict(self.streams[piece])
+                attrs['d'] = self.paths[(key, piece)]
+
+                piece = shapeBytes('path', attrs)
+
+            out.append(piece)
+
+        out.extend([end for start, end in reversed(open)])
+        out.append(b"</svg>")
+
+        return b"".join(out)
+
+    """
+    def write(directory, format)
+
+    writes each tile that is not empty to directory/level/col_row.svg or
+    .png, and the manifest to directory/manifest.json. PNG tiles need
+    PythonSVGRaster and NumPy.
+
+    returns the manifest, None if png tiles can not be drawn
+    """
+    def write(self, directory, format = "svg"):
+        assert (format in ("svg", "png")), "tiles are svg or png"
+
+        if format == "png":
+            try:
+                import PythonSVGRaster
+            except ImportError:
+                print("PNG tiles need PythonSVGRaster and NumPy")
+
+                return None
+
+        tiles = []
+
+        for key in sorted(self.buckets):
+            level, col, row = key
+
+            name     = str(level) + "/" + str(col) + "_" + str(row) + "." + format
+            filename = os.path.join(directory, str(level), str(col) + "_" + str(row) + "." + format)
+
+            os.makedirs(os.path.dirname(filename), exist_ok = True)
+
+            data = self.tileBytes(key)
+
+            if format == "png":
+                image = PythonSVGRaster.render(ET.fromstring(data), self.tileSize, self.tileSize, background = None)
+                size  = atomicWrite(filename, lambda f: PythonSVGRaster.writePNG(f, image))
+            else:
+                size  = atomicWrite(filename, lambda f: f.write(data))
+
+            tiles.append({"level" : level, "col" : col, "row" : row, "file" : name, "bytes" : size})
+
+        levels = []
+
+        for level in range(self.levels):
+            columns, rows = self.grid(level)
+
+            entry = {
+                     "level"   : level,
+                     "span"    : self.span(level),
+                     "scale"   : self.scale(level),
+                     "columns" : columns,
+                     "rows"    : rows
+                    }
+
+            if level in self.depths:
+                entry["ifsDepth"] = self.depths[level]
+
+            levels.append(entry)
+
+        manifest = {
+                    "width"    : self.width,
+                    "height"   : self.height,
+                    "tileSize" : self.tileSize,
+                    "format"   : format,
+                    "template" : "{level}/{col}_{row}." + format,
+                    "levels"   : levels,
+                    "tiles"    : tiles
+                   }
+
+        #the manifest is written last, so a viewer never reads one that
+        #lists tiles not yet written
+        atomicWrite(os.path.join(directory, TILE_MANIFEST), lambda f: f.write(json.dumps(manifest, indent = 1).encode('utf-8')))
+
+        return manifest
+
+TILE_DIRECTORY = "tiles"
+
+TEST_TILE_PYRAMID = True
+
+#tiles a mandala under a Koch snowflake, the coarse levels draw the
+#snowflake from fewer replacements
+def TilePyramidTest():
+    a = Point(300.0, 846.41)
+    b = Point(300.0, 153.59)
+    c = Point(900.0, 500.0)
+
+    triangle = [Line(b, a), Line(a, c), Line(c, b)]
+
+    tent = [
+            Line(Point(0.0, 0.0), Point(0.3333, 0.0)),
+            Line(Point(0.3333, 0.0), Point(0.5, 0.2887)),
+            Line(Point(0.5, 0.2887), Point(0.6667, 0.0)),
+            Line(Point(0.6667, 0.0), Point(1.0, 0.0))
+           ]
+
+    svgOut = SVGWrap({
+                      "width"  : IFS_CANVAS_SIZE,
+                      "height" : IFS_CANVAS_SIZE,
+                     })
+
+    Mandala(seed = 1).circles(colourOn = True, svgDoc = svgOut, parent = svgOut.root)
+
+    pyramid = TilePyramid(IFS_CANVAS_SIZE, IFS_CANVAS_SIZE, levels = 4)
+
+    pyramid.addDocument(svgOut)
+    pyramid.addIFS(triangle, tent, 7)
+
+    manifest = pyramid.write(TILE_DIRECTORY)
+
+    for level in manifest["levels"]:
+        print("level " + str(level["level"]) + " IFS depth " + str(level["ifsDepth"]))
+
+    print(str(len(manifest["tiles"])) + " tiles written to " + TILE_DIRECTORY)
+
+    return manifest
+
+if __name__ == "__main__":
+    if TEST_TILE_PYRAMID:
+        TilePyramidTest()
@@ -9,6 +9,7 @@ import math
 import random
 from subprocess import check_output
 import xml.etree.ElementTree as ET
+from PythonSVGWrapperXML import unitCircle, HEX_BYTE
 
 ERROR = "error"
 
@@ -108,27 +109,11 @@ class SVGWrap:
     PAINT
     """
     def rgb(r = 0.0, g = 0.0, b = 0.0):
-        red   = int(clamp(0, r * 255, 255))
-        blue  = int(clamp(0, b * 255, 255))
-        green = int(clamp(0, g * 255, 255))
+        red   = HEX_BYTE[int(clamp(0, r * 255, 255))]
+        green = HEX_BYTE[int(clamp(0, g * 255, 255))]
+        blue  = HEX_BYTE[int(clamp(0, b * 255, 255))]
         
-        hRed = hex(red)[2:]
-        
-        if len(hRed) < 2:
-            hRed = "0" + hRed
-        
-        hGreen = hex(green)[2:]
-        
-        if len(hGreen) < 2:
-            hGreen = "0" + hGreen
-        
-        hBlue = hex(blue)[2:]
-        
-        if len(hBlue) < 2:
-            hBlue = "0" + hBlue
-        
-        hRGB = '#' + hRed + hGreen + hBlue
-        return hRGB
+        return '#' + red + green + blue
         
     """
     ________________________________
@@ -379,16 +364,16 @@ class SVGMandala:
         
         p = Point()
         
-        w = (2.0 * math.pi) / numWaves
+        cosTable, sinTable = unitCircle(numWaves)
         
         r = (radius1 + radius2) / 2.0
         
         a = (radius1 - radius2)
         
         for i in range(numWaves):
-            radius = (math.sin(i * w) * a) + r
-            p.x = math.sin(i * w) * radius
-            p.y = math.cos(i * w) * radius
+            radius = (sinTable[i] * a) + r
+            p.x = sinTable[i] * radius
+            p.y = cosTable[i] * radius
             
             if i == 0:
                 result.move(False, p.x, p.y)
@@ -396,6 +381,8 @@ class SVGMandala:
                 result.line(False, p.x, p.y)
                 
         result.close()
+        
+        return result
 """
 Testing
 """              
@@ -6,11 +6,26 @@ July 30 2015
 This file contains a wrapper for the SVG XML specification.
 """
 import math
+import os
 import random
+import re
 from subprocess import check_output
 import xml.etree.ElementTree as ET
 import colorsys
 import sys
+import functools
+import itertools
+import operator
+import copy
+import gzip
+import hashlib
+import io
+import marshal
+import mmap
+import struct
+import tempfile
+import weakref
+from array import array
 from enum import Enum
 
 ERROR = "error"
@@ -45,6 +60,28 @@ def atan2PI(x, y):
     
     return at
 
+"""
+unitCircle(n, phase, polygram)
+
+returns a tuple of (cos, sin) tables for the n + 1 angles
+k * (2PI / n) * polygram + phase, k = 0..n, the last angle closes the ring
+
+the tables are shared by all the generators placing points around a
+circle and held in a bounded LRU cache, so repeated rings only cost a lookup
+"""
+TRIG_CACHE_SIZE = 256
+
+@functools.lru_cache(maxsize = TRIG_CACHE_SIZE)
+def unitCircle(n, phase = 0.0, polygram = 1):
+    step = ((2.0 * math.pi) / n) * polygram
+
+    angles = [k * step + phase for k in range(n + 1)]
+
+    cosTable = tuple([math.cos(a) for a in angles])
+    sinTable = tuple([math.sin(a) for a in angles])
+
+    return (cosTable, sinTable)
+
 """
 multiply two matrices
 https://www.youtube.com/watch?v=JSZC2vfa47I
@@ -71,6 +108,15 @@ def multi(x, y):
         
     return d
 
+#the square root of the area scale of a matrix, a, b, c and d are its
+#linear part in the order of the svg matrix transform
+def areaScale(a, b, c, d):
+    return math.sqrt(abs(a * d - b * c)) or 1e-9
+
+#the scale of a Transform2D matrix, see areaScale
+def matrixScale(matrix):
+    return areaScale(matrix[0][0], matrix[1][0], matrix[0][1], matrix[1][1])
+
 """
 class transform2D
 
@@ -223,12 +269,473 @@ class Transform2D:
     
     def line(self, line):
         assert (isinstance(line, Line())), "line not a Line"
-        
+
         p1 = self.point(line.p1)
         p2 = self.point(line.p2)
-        
+
         return Line(p1, p2)
+
+"""
+symmetryMatrices(order, mirror)
+
+returns a list of (a, b, c, d) tuples, the linear part of an svg matrix,
+for each of the order rotations of a kaleidoscope. The rotations follow the
+same direction as Transform2D.rotate. When mirror is True each rotation is
+followed by its reflection across the x axis.
+
+the trig comes from the shared unitCircle tables so it is only
+calculated once for each order
+"""
+def symmetryMatrices(order, mirror = False):
+    cosTable, sinTable = unitCircle(order)
+
+    matrices = []
+
+    for k in range(order):
+        s = sinTable[k]
+        c = cosTable[k]
+
+        matrices.append((c, -s, s, c))
+
+        if mirror:
+            matrices.append((c, -s, -s, -c))
+
+    return matrices
+
+"""
+class PathData
+
+a compact, parsed form of svg path data. The commands are stored in a
+bytearray of absolute command letters, M, L, C, Q and Z, and the coordinates
+in a flat array('d') holding x, y for every point of every command, one
+point for M and L, three for C, two for Q and none for Z.
+
+relative commands are made absolute while parsing, H and V become L, S and T
+become C and Q with their reflected control point and A arcs are split into
+cubic beziers. Every coordinate is then a point, so a Transform2D can be
+baked into the whole array in one pass and written back out with str(),
+which keeps every coordinate exactly, or toString for a chosen precision.
+
+path data can also be fed in pieces with feed and finish, read uses this to
+parse files far larger than memory would hold as text.
+
+PathData("M 10 10 h 20 v 20 z").transform(t)
+"""
+PATH_TOKEN = re.compile(r"[MmZzLlHhVvCcSsQqTtAa]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+PATH_ARITY = {
+              "M" : 2, "L" : 2, "H" : 1, "V" : 1, "C" : 6,
+              "S" : 4, "Q" : 4, "T" : 2, "A" : 7, "Z" : 0
+             }
+
+PATH_POINTS = {"M" : 1, "L" : 1, "C" : 3, "Q" : 2, "Z" : 0}
+
+PATH_PRECISION = 3
+
+PATH_NUMBER_CHARS = "0123456789.eE+-"
+
+PATH_CHUNK_SIZE = 1 << 20
+
+class PathData:
+    def __init__(self, pathData = ""):
+        self.commands = bytearray()
+        self.coords   = array('d')
+        
+        #parser state, kept on the object so data can arrive in pieces
+        self.command  = None
+        self.operands = []
+        self.current  = (0.0, 0.0)
+        self.start    = (0.0, 0.0)
+        self.control  = None
+        self.pending  = ""
+        
+        if pathData:
+            self.parse(pathData)
+        
+    def __str__(self):
+        return self.toString()
+        
+    def __len__(self):
+        return len(self.commands)
+    
+    def parse(self, pathData):
+        self.feed(pathData)
+        self.finish()
+        
+        return self
+    
+    #feed parses a piece of path data, a number at the end of the piece may
+    #be cut short so it is held back until the next piece or finish
+    def feed(self, pathData):
+        pathData = self.pending + pathData
+        end      = len(pathData)
+        
+        while end and pathData[end - 1] in PATH_NUMBER_CHARS:
+            end -= 1
+            
+        self.pending = pathData[end:]
+        
+        self.parseTokens(PATH_TOKEN.findall(pathData, 0, end))
+    
+    #finish parses anything held back by feed
+    def finish(self):
+        self.parseTokens(PATH_TOKEN.findall(self.pending))
+        
+        self.pending = ""
+    
+    #read parses the path data in a file, the file is memory-mapped and
+    #decoded chunkSize bytes at a time
+    def read(self, filename, chunkSize = PATH_CHUNK_SIZE):
+        for chunk in readChunks(filename, chunkSize):
+            self.feed(chunk)
+            
+        self.finish()
+        
+        return self
+    
+    #drain returns the commands parsed so far as path data and empties the
+    #buffers, the parser state is kept so feeding can continue
+    def drain(self, precision = None):
+        out = self.toString(precision)
+        
+        del self.commands[:]
+        del self.coords[:]
+        
+        return out
+    
+    #parseTokens takes command letters and numbers as strings, operands are
+    #collected until the command has enough of them and then appended
+    def parseTokens(self, tokens):
+        command  = self.command
+        operands = self.operands
+        arity    = PATH_ARITY[command.upper()] if command else 0
+        
+        for token in tokens:
+            if token[0].isalpha():
+                command  = token
+                operands = []
+                arity    = PATH_ARITY[token.upper()]
+                
+                if arity == 0:
+                    self.segment(token, operands)
+                    
+                continue
+                
+            if arity == 0:
+                continue
+            
+            #arc flags may be written without separators, "a5 5 0 105 5"
+            if arity == 7:
+                while len(operands) in (3, 4) and len(token) > 1 and token[0] in "01":
+                    operands.append(float(token[0]))
+                    token = token[1:]
+            
+            operands.append(float(token))
+            
+            if len(operands) == arity:
+                self.segment(command, operands)
+                operands = []
+                
+                #pairs after a move are implicit lines
+                if command == "M":
+                    command = "L"
+                elif command == "m":
+                    command = "l"
+                    
+        self.command  = command
+        self.operands = operands
+        
+    def append(self, command, points):
+        self.commands.append(ord(command))
+        
+        for p in points:
+            self.coords.extend(p)
+    
+    #segment normalises one command to absolute M, L, C, Q or Z
+    def segment(self, command, n):
+        name = command.upper()
+        cx, cy = self.current
+        
+        if command.islower():
+            offset = [cx, cy] * 3
+            
+            if name == "H":
+                n = [n[0] + cx]
+            elif name == "V":
+                n = [n[0] + cy]
+            elif name == "A":
+                n = n[:5] + [n[5] + cx, n[6] + cy]
+            else:
+                n = [v + o for v, o in zip(n, offset)]
+        
+        control = None
+        
+        if name == "M":
+            self.append("M", [n])
+            self.start = (n[0], n[1])
+        elif name == "Z":
+            self.append("Z", [])
+            n = self.start
+        elif name in "LHV":
+            if name == "H":
+                n = [n[0], cy]
+            elif name == "V":
+                n = [cx, n[0]]
+                
+            self.append("L", [n])
+        elif name in "CS":
+            if name == "S":
+                first = self.reflect("C")
+                n = [first[0], first[1]] + n
+                
+            self.append("C", [n[0:2], n[2:4], n[4:6]])
+            control = ("C", n[2], n[3])
+        elif name in "QT":
+            if name == "T":
+                first = self.reflect("Q")
+                n = [first[0], first[1]] + n
+                
+            self.append("Q", [n[0:2], n[2:4]])
+            control = ("Q", n[0], n[1])
+        elif name == "A":
+            curves = arcToCubics(cx, cy, n[0], n[1], n[2], n[3], n[4], n[5], n[6])
+            
+            if curves is None:
+                self.append("L", [n[5:7]])
+            
+            for curve in curves or []:
+                self.append("C", curve)
+                
+            n = n[5:7]
+        
+        self.control  = control
+        self.current  = (n[-2], n[-1])
+    
+    #reflect returns the control point of the last curve of the same kind
+    #reflected about the current point, or the current point itself
+    def reflect(self, kind):
+        cx, cy = self.current
+        
+        if self.control is None or self.control[0] != kind:
+            return (cx, cy)
+        
+        return (2 * cx - self.control[1], 2 * cy - self.control[2])
+        
+    """
+    transform(transform)
+    
+    bakes a Transform2D, or a 3x3 matrix, into every coordinate, the x and
+    y columns are mapped with the same six numbers in a single pass
+    """
+    def transform(self, transform):
+        m = getattr(transform, "matrix", transform)
+        
+        a, c, e = m[0][0], m[0][1], m[0][2]
+        b, d, f = m[1][0], m[1][1], m[1][2]
+        
+        xs = self.coords[0::2]
+        ys = self.coords[1::2]
+        
+        self.coords[0::2] = array('d', [a * x + c * y + e for x, y in zip(xs, ys)])
+        self.coords[1::2] = array('d', [b * x + d * y + f for x, y in zip(xs, ys)])
+        
+        return self
+    
+    #toString writes the data back out as compact svg path data, repeated
+    #commands and the L after an M are left implicit. Numbers are rounded
+    #to precision decimals, None writes them exactly
+    def toString(self, precision = None):
+        out      = []
+        index    = 0
+        previous = None
+        
+        for code in self.commands:
+            command = chr(code)
+            
+            implicit = command == previous or (command == "L" and previous == "M")
+            
+            if command == "M" or not implicit:
+                out.append(command)
+                implicit = False
+                
+            count = PATH_POINTS[command] * 2
+            
+            numbers = [formatNumber(v, precision) for v in self.coords[index:index + count]]
+            
+            for i, number in enumerate(numbers):
+                if (i or implicit) and number[0] != "-":
+                    out.append(" ")
+                    
+                out.append(number)
+            
+            index   += count
+            previous = command
+            
+        return "".join(out)
+    
+"""
+readChunks(filename, chunkSize)
+
+yields the text of a file chunkSize bytes at a time from a memory map,
+so only one chunk is held as a string
+"""
+def readChunks(filename, chunkSize = PATH_CHUNK_SIZE):
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        
+        with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as data:
+            for start in range(0, len(data), chunkSize):
+                yield data[start : start + chunkSize].decode('latin-1')
+
+"""
+formatNumber(value, precision)
+
+returns the shortest string for value rounded to precision decimals,
+trailing zeros, the trailing point and a leading zero are dropped. When
+precision is None the value is not rounded, the string is the shortest one
+that reads back as the same float
+"""
+def formatNumber(value, precision = PATH_PRECISION):
+    if precision is None:
+        s = repr(float(value))
+    else:
+        s = "%.*f" % (precision, value)
+    
+    if "." in s and "e" not in s:
+        s = s.rstrip("0").rstrip(".")
+        
+    if s.startswith("0."):
+        s = s[1:]
+    elif s.startswith("-0."):
+        s = "-" + s[2:]
+    elif s == "-0":
+        s = "0"
+        
+    return s
+
+"""
+arcToCubics(x1, y1, rx, ry, rotation, largeArc, sweep, x2, y2)
+
+converts an svg elliptical arc from x1, y1 to x2, y2 into a list of cubic
+beziers, each a list of three points, using the endpoint to centre
+conversion of the svg implementation notes. Returns [] when the end points
+are the same and None when a radius is zero and the arc is a straight line.
+"""
+def arcToCubics(x1, y1, rx, ry, rotation, largeArc, sweep, x2, y2):
+    if x1 == x2 and y1 == y2:
+        return []
+    
+    if rx == 0 or ry == 0:
+        return None
+    
+    rx = abs(rx)
+    ry = abs(ry)
+    
+    cosR = math.cos(math.radians(rotation))
+    sinR = math.sin(math.radians(rotation))
+    
+    dx = (x1 - x2) / 2.0
+    dy = (y1 - y2) / 2.0
+    
+    x1p =  cosR * dx + sinR * dy
+    y1p = -sinR * dx + cosR * dy
+    
+    #scale up radii that are too small to reach the end point
+    scale = (x1p * x1p) / (rx * rx) + (y1p * y1p) / (ry * ry)
+    
+    if scale > 1:
+        rx *= math.sqrt(scale)
+        ry *= math.sqrt(scale)
+        
+    num = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+    den = rx * rx * y1p * y1p + ry * ry * x1p * x1p
+    
+    coef = math.sqrt(max(0.0, num / den))
+    
+    if bool(largeArc) == bool(sweep):
+        coef = -coef
+        
+    cxp =  coef * rx * y1p / ry
+    cyp = -coef * ry * x1p / rx
+    
+    cx = cosR * cxp - sinR * cyp + (x1 + x2) / 2.0
+    cy = sinR * cxp + cosR * cyp + (y1 + y2) / 2.0
+    
+    theta = math.atan2((y1p - cyp) / ry, (x1p - cxp) / rx)
+    end   = math.atan2((-y1p - cyp) / ry, (-x1p - cxp) / rx)
+    
+    delta = (end - theta) % (2.0 * math.pi)
+    
+    if not sweep:
+        delta -= 2.0 * math.pi
+        
+    segments = max(1, int(math.ceil(abs(delta) / (math.pi / 2.0) - 1e-9)))
+    step     = delta / segments
+    handle   = 4.0 / 3.0 * math.tan(step / 4.0)
     
+    def toPoint(ux, uy):
+        return (cx + rx * cosR * ux - ry * sinR * uy, cy + rx * sinR * ux + ry * cosR * uy)
+    
+    curves = []
+    
+    for i in range(segments):
+        a1 = theta + i * step
+        a2 = a1 + step
+        
+        cos1, sin1 = math.cos(a1), math.sin(a1)
+        cos2, sin2 = math.cos(a2), math.sin(a2)
+        
+        curves.append([
+                       toPoint(cos1 - handle * sin1, sin1 + handle * cos1),
+                       toPoint(cos2 + handle * sin2, sin2 - handle * cos2),
+                       toPoint(cos2, sin2)
+                      ])
+    
+    #finish exactly on the end point
+    curves[-1][2] = (x2, y2)
+    
+    return curves
+
+"""
+parseTransform(transform)
+
+returns a Transform2D holding the matrix of an svg transform attribute,
+the matrix, translate, scale, rotate, skewX and skewY functions are
+composed left to right as the svg specification describes
+"""
+TRANSFORM_FUNCTION = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+
+def parseTransform(transform):
+    result = Transform2D()
+    
+    for name, args in TRANSFORM_FUNCTION.findall(transform or ""):
+        n = [float(v) for v in PATH_TOKEN.findall(args)]
+        
+        if name == "matrix":
+            matrix = [[n[0], n[2], n[4]], [n[1], n[3], n[5]], [0, 0, 1]]
+        elif name == "translate":
+            ty = n[1] if len(n) > 1 else 0
+            matrix = [[1, 0, n[0]], [0, 1, ty], [0, 0, 1]]
+        elif name == "scale":
+            sy = n[1] if len(n) > 1 else n[0]
+            matrix = [[n[0], 0, 0], [0, sy, 0], [0, 0, 1]]
+        elif name == "rotate":
+            c = math.cos(math.radians(n[0]))
+            s = math.sin(math.radians(n[0]))
+            
+            x, y = (n[1], n[2]) if len(n) > 2 else (0, 0)
+            
+            matrix = [[c, -s, x - c * x + s * y], [s, c, y - s * x - c * y], [0, 0, 1]]
+        elif name == "skewX":
+            matrix = [[1, math.tan(math.radians(n[0])), 0], [0, 1, 0], [0, 0, 1]]
+        else:
+            matrix = [[1, 0, 0], [math.tan(math.radians(n[0])), 1, 0], [0, 0, 1]]
+            
+        result.matrix = multi(result.matrix, matrix)
+        
+    return result
+
 class Point:
     def __init__(self, x=0, y=0):
         self.x = x
@@ -396,42 +903,80 @@ This class represents 'genetic' data
 The DNA sequence length, the number of base pairs (AMINOS) and chromosome length are all
 analogous to the biological namesake.
 
--The DNA sequence is a list of numbers in the range 0 to numAminos - 1.
+-The DNA sequence is an array of numbers in the range 0 to numAminos - 1.
 -When data is read from the sequence the chromeLength determines how many base pairs are read
 -The base pairs together are read as a base n number, where n = numAmino, the number is normalized between 0-1
 
+Each DNA owns its own random number generator, so building a DNA does not
+reseed the global random module. The sequence for a seed is the same as the
+one produced by random.seed(seed), so existing seeds render identically.
+
+Very long sequences can be kept in a flat binary genome file, see
+DNA.createGenome, DNA.save and DNA.load. A loaded genome is memory-mapped
+read only, chromosome reads are zero-copy and every process that loads
+the same file shares the page cache.
 """
+#genome file header: magic, bytes per amino, numAmino, sequence length
+GENOME_MAGIC  = b'DNA1'
+GENOME_HEADER = struct.Struct('<4sBxxxIQ')
+
 class DNA:
     def __init__(self, length = 100, seed = 666, chromoLength = 5, numAmino = 256):
-        self.numAmino     = 256
+        self.numAmino     = numAmino
         self.seed         = seed
         self.index        = 0
         self.chromoLength = chromoLength
-        self.sequence     = []
+        self.weights      = {}
+        self.filename     = None
+        self.genome       = None
+        self.ownsGenome   = False
+        
+        self.rng = random.Random(self.seed)
         
-        random.seed(self.seed)
+        randrange = self.rng.randrange
+        
+        self.sequence = array(DNA.typecode(numAmino), [randrange(numAmino) for i in range(length)])
+    
+    #smallest array typecode that holds an amino
+    def typecode(numAmino):
+        if numAmino <= 256:
+            return 'B'
+        elif numAmino <= 65536:
+            return 'H'
+        
+        return 'I'
+    
+    #the base n place values of a chromosome and the value used to normalize it
+    #these are calculated once for each chromosome length
+    def getWeights(self, length):
+        if length not in self.weights:
+            places = tuple([pow(self.numAmino, i) for i in range(length)])
+            
+            self.weights[length] = (places, pow(self.numAmino, length))
         
-        for i in range(length):
-            amino = random.randrange(self.numAmino)
-            self.sequence.append(amino)
+        return self.weights[length]
     
     #reads a section (chromosome) of the sequence as a base n number and normalizes it to between 0-1
     #index is where in the sequence it is read, length is how many base pairs are in the chromosome
     def read(self, index = 0, length = 5):
-        result = 0
+        places, scale = self.getWeights(length)
         
         seqLength = len(self.sequence)
         
+        if index + length <= seqLength:
+            aminos = self.sequence[index : index + length]
+        else:
+            #the chromosome wraps around the end of the sequence
+            aminos = array(DNA.typecode(self.numAmino), [self.sequence[(index + i) % seqLength] for i in range(length)])
+        
         #calc base n number
-        for i in range(length):
-            amino = self.sequence[ (self.index + i) % seqLength ]
-            
-            result += amino * pow(self.numAmino, i)
+        if self.numAmino == 256:
+            result = int.from_bytes(aminos, 'little')
+        else:
+            result = sum(map(operator.mul, aminos, places))
         
         #normalize result to be in range 0-1
-        result = result / pow(self.numAmino, length)
-        
-        return result
+        return result / scale
     
     #reads the next section (chromosome) and shifts the index to point to the next chromosome
     def next(self):
@@ -441,12 +986,209 @@ class DNA:
         self.index = (self.index + self.chromoLength) % seqLength
         
         return result
+    
+    """
+    def take(n)
+    
+    reads the next n chromosomes in one pass and shifts the index past them,
+    the values are the same as n calls to next()
+    
+    returns an array of n floats in the range 0-1
+    """
+    def take(self, n):
+        length    = self.chromoLength
+        seqLength = len(self.sequence)
+        
+        places, scale = self.getWeights(length)
+        
+        positions = [(self.index + k * length) % seqLength for k in range(n)]
+        
+        self.index = (self.index + n * length) % seqLength
+        
+        seq  = memoryview(self.sequence)
+        read = self.read
+        
+        if self.numAmino == 256:
+            fromBytes = int.from_bytes
+            
+            values = [fromBytes(seq[p : p + length], 'little') / scale if p + length <= seqLength else read(p, length) for p in positions]
+        else:
+            mul = operator.mul
+            
+            values = [sum(map(mul, seq[p : p + length], places)) / scale if p + length <= seqLength else read(p, length) for p in positions]
+        
+        return array('d', values)
         
     def setIndex(self, newIndex = 0):
         self.index = newIndex
     
     def getIndex(self):
         return self.index
+    
+    """
+    ________________________________
+    STREAMS
+    
+    a step is one call to next(), n steps move the index n chromosomes along
+    """
+    #moves the index to the chromosome read after step calls to next()
+    #made from the index start
+    def seek(self, step, start = 0):
+        self.index = (start + step * self.chromoLength) % len(self.sequence)
+        
+        return self.index
+    
+    """
+    def fork(step)
+    
+    returns a new DNA that shares this sequence and reads exactly what this
+    DNA would read after step more calls to next(), neither stream changes
+    the other's index
+    """
+    def fork(self, step = 0):
+        dna = copy.copy(self)
+        
+        dna.seek(step, self.index)
+        
+        return dna
+    
+    """
+    def split(count, steps)
+    
+    splits the next count * steps reads into count forks, each fork starts
+    where a serial run would be after k * steps reads, so chunks generated in
+    parallel are identical to the serial run. The forks do not overlap as
+    long as count * steps chromosomes fit in the sequence, after that the
+    sequence wraps as it does for a serial run.
+    
+    returns a list of count DNA
+    """
+    def split(self, count, steps):
+        return [self.fork(k * steps) for k in range(count)]
+    
+    """
+    ________________________________
+    GENOME FILES
+    """
+    """
+    def save(filename)
+    
+    writes the sequence to a flat binary genome file, a small header
+    followed by the raw aminos
+    """
+    def save(self, filename):
+        typecode = DNA.typecode(self.numAmino)
+        
+        with open(filename, 'wb') as f:
+            f.write(GENOME_HEADER.pack(GENOME_MAGIC, array(typecode).itemsize, self.numAmino, len(self.sequence)))
+            f.write(memoryview(self.sequence).cast('B'))
+    
+    """
+    def load(filename, chromoLength)
+    
+    memory-maps a genome file written by save or createGenome
+    
+    returns a DNA reading from the mapped file
+    """
+    def load(filename, chromoLength = 5):
+        dna = DNA.__new__(DNA)
+        
+        dna.seed         = None
+        dna.index        = 0
+        dna.chromoLength = chromoLength
+        dna.weights      = {}
+        dna.rng          = None
+        
+        dna.mapGenome(filename)
+        
+        return dna
+    
+    """
+    def createGenome(filename, length, seed, numAmino, chunkSize)
+    
+    writes a genome file of length random aminos without holding the
+    sequence in memory, the aminos are generated chunkSize at a time.
+    The file is not the same sequence as DNA(length, seed), it is meant
+    for sequences far too long to build in memory.
+    """
+    def createGenome(filename, length, seed = 666, numAmino = 256, chunkSize = 1 << 20):
+        rng      = random.Random(seed)
+        typecode = DNA.typecode(numAmino)
+        
+        with open(filename, 'wb') as f:
+            f.write(GENOME_HEADER.pack(GENOME_MAGIC, array(typecode).itemsize, numAmino, length))
+            
+            remaining = length
+            
+            while remaining > 0:
+                count = min(chunkSize, remaining)
+                
+                if numAmino == 256:
+                    f.write(rng.randbytes(count))
+                else:
+                    f.write(array(typecode, [rng.randrange(numAmino) for i in range(count)]))
+                
+                remaining -= count
+    
+    def mapGenome(self, filename):
+        with open(filename, 'rb') as f:
+            genome = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        
+        magic, itemSize, numAmino, length = GENOME_HEADER.unpack_from(genome)
+        
+        assert (magic == GENOME_MAGIC), "not a genome file: " + filename
+        
+        typecode = DNA.typecode(numAmino)
+        
+        assert (array(typecode).itemsize == itemSize), "genome amino size does not match: " + filename
+        
+        start = GENOME_HEADER.size
+        
+        self.filename   = filename
+        self.genome     = genome
+        self.ownsGenome = True
+        self.numAmino   = numAmino
+        self.sequence   = memoryview(genome)[start : start + length * itemSize].cast(typecode)
+    
+    #releases a memory-mapped genome, the DNA can not be read afterwards.
+    #Forks read their parent's mapping, closing a fork only lets go of it
+    #and closing the parent ends the forks too
+    def close(self):
+        if self.genome is not None:
+            if self.ownsGenome:
+                self.sequence.release()
+                self.genome.close()
+            
+            self.genome = None
+    
+    #a copy shares the sequence, and for a mapped genome the mapping, so a
+    #fork does not map the file again the way unpickling does
+    def __copy__(self):
+        dna = DNA.__new__(DNA)
+        
+        dna.__dict__.update(self.__dict__)
+        
+        dna.ownsGenome = False
+        
+        return dna
+    
+    #a mapped genome is pickled as its filename and mapped again when
+    #unpickled, so a DNA can be handed to worker processes cheaply
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        
+        if self.genome is not None:
+            del state['sequence']
+            del state['genome']
+            del state['ownsGenome']
+        
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        
+        if 'sequence' not in state:
+            self.mapGenome(self.filename)
  
 """
 class Colour:
@@ -458,6 +1200,9 @@ The hex output is in format #000000
 
 hls, hsv, yiq calculations come from colorsys.py
 """ 
+#two digit hex string for every byte value, used to build #000000 colours
+HEX_BYTE = ['%02x' % i for i in range(256)]
+
 class Colour:
     def __init__(self, r = 0.0, b = 0.0, g = 0.0):
         self.r = r
@@ -465,27 +1210,11 @@ class Colour:
         self.b = b
         
     def hex(self):
-        red   = int(clamp(0, self.r * 255, 255))
-        blue  = int(clamp(0, self.b * 255, 255))
-        green = int(clamp(0, self.g * 255, 255))
-        
-        hRed = hex(red)[2:]
-        
-        if len(hRed) < 2:
-            hRed = "0" + hRed
-        
-        hGreen = hex(green)[2:]
+        red   = HEX_BYTE[int(clamp(0, self.r * 255, 255))]
+        green = HEX_BYTE[int(clamp(0, self.g * 255, 255))]
+        blue  = HEX_BYTE[int(clamp(0, self.b * 255, 255))]
         
-        if len(hGreen) < 2:
-            hGreen = "0" + hGreen
-        
-        hBlue = hex(blue)[2:]
-        
-        if len(hBlue) < 2:
-            hBlue = "0" + hBlue
-        
-        hRGB = '#' + hRed + hGreen + hBlue
-        return hRGB
+        return '#' + red + green + blue
     
     
     def setHLS(self, h = 0.0, l = 0.0, s = 0.0):
@@ -532,20 +1261,126 @@ class Colour:
     
     def getRGB(self):
         return (self.r, self.g, self.b)
+
 """
-class Palette
+class ColourArray:
 
-this class takes a DNA object and produces variation of a given colour
-    -the colours are based on a triad relationship, 
-    -the width of the triad is determined by the degree
-    -the colour variation is a list of three floats which
-determine the +/- ratio of [hue, lightness, saturation] 
-    -the DNA object gives the arbitrary values when the method
-getCol() is called
+a compact array of N colours, the red, green and blue channels are
+stored interleaved in a flat array of floats in the range (0.0 - 1.0)
 
+colours are converted and written out for the whole array at once,
+the set and get methods take and return one sequence per channel,
+indexing the array returns a Colour
+
+hls, hsv, yiq calculations come from colorsys.py
 """
-class Palette:
-    def __init__(self, dna = DNA(), col = Colour(), degree = (math.pi * (2/3)), variation = [0.05, 1.0, 1.0]):
+class ColourArray:
+    def __init__(self, rgb = None):
+        self.rgb = array('d', rgb if rgb is not None else [])
+
+    def __len__(self):
+        return len(self.rgb) // 3
+
+    #negative indices count from the end, a slice returns a ColourArray
+    def __getitem__(self, index):
+        count = len(self)
+
+        if isinstance(index, slice):
+            return ColourArray(itertools.chain.from_iterable([self.rgb[i * 3 : i * 3 + 3] for i in range(*index.indices(count))]))
+
+        if index < 0:
+            index += count
+
+        if not 0 <= index < count:
+            raise IndexError("colour index out of range")
+
+        r, g, b = self.rgb[index * 3 : index * 3 + 3]
+
+        return Colour(r = r, g = g, b = b)
+
+    def __iter__(self):
+        rgb = self.rgb
+
+        for r, g, b in zip(rgb[0::3], rgb[1::3], rgb[2::3]):
+            yield Colour(r = r, g = g, b = b)
+
+    #the hex string, in format #000000, of every colour
+    def hex(self):
+        byte = [HEX_BYTE[int(clamp(0, c * 255, 255))] for c in self.rgb]
+
+        return ['#' + r + g + b for r, g, b in zip(byte[0::3], byte[1::3], byte[2::3])]
+
+    #replaces the colours with the result of function applied to each
+    #triple of the channels a, b, c
+    def setConverted(self, function, a, b, c):
+        self.rgb = array('d', itertools.chain.from_iterable(map(function, a, b, c)))
+
+        return self
+
+    #returns the three channels of function applied to each colour
+    def getConverted(self, function):
+        rgb = self.rgb
+
+        converted = list(map(function, rgb[0::3], rgb[1::3], rgb[2::3]))
+
+        if not converted:
+            return (array('d'), array('d'), array('d'))
+
+        return tuple([array('d', channel) for channel in zip(*converted)])
+
+    def setRGB(self, r, g, b):
+        return self.setConverted(lambda *rgb : rgb, r, g, b)
+
+    def getRGB(self):
+        rgb = self.rgb
+
+        return (rgb[0::3], rgb[1::3], rgb[2::3])
+
+    def setHLS(self, h, l, s):
+        return self.setConverted(colorsys.hls_to_rgb, h, l, s)
+
+    def getHLS(self):
+        return self.getConverted(colorsys.rgb_to_hls)
+
+    def setHSV(self, h, s, v):
+        return self.setConverted(colorsys.hsv_to_rgb, h, s, v)
+
+    def getHSV(self):
+        return self.getConverted(colorsys.rgb_to_hsv)
+
+    def setYIQ(self, y, i, q):
+        return self.setConverted(colorsys.yiq_to_rgb, y, i, q)
+
+    def getYIQ(self):
+        return self.getConverted(colorsys.rgb_to_yiq)
+
+    #builds an array from a list of Colours
+    def fromColours(colours):
+        return ColourArray(itertools.chain.from_iterable([c.getRGB() for c in colours]))
+
+    def fromHLS(h, l, s):
+        return ColourArray().setHLS(h, l, s)
+
+    def fromHSV(h, s, v):
+        return ColourArray().setHSV(h, s, v)
+
+    def fromYIQ(y, i, q):
+        return ColourArray().setYIQ(y, i, q)
+
+"""
+class Palette
+
+this class takes a DNA object and produces variation of a given colour
+    -the colours are based on a triad relationship, 
+    -the width of the triad is determined by the degree
+    -the colour variation is a list of three floats which
+determine the +/- ratio of [hue, lightness, saturation] 
+    -the DNA object gives the arbitrary values when the method
+getCol() is called
+
+"""
+class Palette:
+    def __init__(self, dna = DNA(), col = Colour(), degree = (math.pi * (2/3)), variation = [0.05, 1.0, 1.0]):
         self.dna = dna
         
         self.prime = col
@@ -565,34 +1400,1035 @@ class Palette:
         
         self.variation = variation
     
-    #The DNA object given when creating the instance gives
-    #the values which selects an arbitrary colour
-    def getCol(self):
-        newCol = Colour()
-        
-        choice = self.dna.next() * 3000.0
-        
-        if choice < 1000:
-            newCol = Colour(self.prime.r, self.prime.g, self.prime.b)
-        elif choice > 2000:
-            newCol = Colour(self.left.r, self.left.g, self.left.b)
-        else:
-            newCol = Colour(self.right.r, self.right.g, self.right.b)
-            
-        hls = newCol.getHLS()
+    #The DNA object given when creating the instance gives
+    #the values which selects an arbitrary colour
+    def getCol(self):
+        newCol = Colour()
+        
+        choice = self.dna.next() * 3000.0
+        
+        if choice < 1000:
+            newCol = Colour(self.prime.r, self.prime.g, self.prime.b)
+        elif choice > 2000:
+            newCol = Colour(self.left.r, self.left.g, self.left.b)
+        else:
+            newCol = Colour(self.right.r, self.right.g, self.right.b)
+            
+        hls = newCol.getHLS()
+        
+        hVariant = (self.dna.next() * (self.variation[0] * 2.0)) - self.variation[0]
+        h = wrap(0.0, hls[0] + hVariant, 1.0)
+        
+        lVariant = (self.dna.next() * (self.variation[1] * 2.0)) - self.variation[1]            
+        l = wrap(0.0, hls[1] + lVariant, 1.0)
+        
+        sVariant = (self.dna.next() * (self.variation[2] * 2.0)) - self.variation[2]
+        s = wrap(0.0, hls[2] + sVariant, 1.0)
+        
+        newCol.setHLS(h = h, l = l, s = s)
+        
+        return newCol
+    
+    """
+    def getCols(n)
+    
+    returns a ColourArray of the next n colours, the colours are the same as
+    n calls to getCol() but the DNA values are read in one pass and the
+    triad choice and variation are applied to the whole batch
+    """
+    def getCols(self, n):
+        values = self.dna.take(4 * n)
+        
+        #hls of the triad, in the order getCol() chooses them, getCol() copies
+        #the triad with Colour(r, g, b) which swaps green and blue, the swap is
+        #kept so both methods give the same colours
+        triad = [colorsys.rgb_to_hls(c.r, c.b, c.g) for c in [self.prime, self.right, self.left]]
+        
+        choices = [0 if c < 1000 else (2 if c > 2000 else 1) for c in [v * 3000.0 for v in values[0::4]]]
+        
+        hVar, lVar, sVar = self.variation
+        
+        hRange = hVar * 2.0
+        lRange = lVar * 2.0
+        sRange = sVar * 2.0
+        
+        h = [wrap(0.0, triad[c][0] + ((v * hRange) - hVar), 1.0) for c, v in zip(choices, values[1::4])]
+        l = [wrap(0.0, triad[c][1] + ((v * lRange) - lVar), 1.0) for c, v in zip(choices, values[2::4])]
+        s = [wrap(0.0, triad[c][2] + ((v * sRange) - sVar), 1.0) for c, v in zip(choices, values[3::4])]
+        
+        return ColourArray.fromHLS(h, l, s)
+"""
+NODE MODEL
+
+SVGWrap(attr, model = NODE_MODEL) builds its document from SVGNode instead
+of ElementTree elements. A node has __slots__ rather than a dict per
+element and its attributes are packed into one flat tuple of key, value,
+key, value. Values are kept as they are given, numbers are only turned into
+text when the document is written, by writeNode, which writes just the svg
+we build, escaping only strings that need it.
+
+SVGNode has the part of the Element interface SVGWrap uses, get, set, keys,
+items, iter, append, extend, remove, len, indexing and iteration, so the
+builder methods, loadGroup and the optimisations work with either model.
+ElementTree elements, loaded groups and references, can be children of
+nodes, but nodes can not be added to an ElementTree.
+
+groups, the defs and the svg tag keep the bytes they were last written as
+in cache. Changing a node through its methods, or its text and tail, clears
+the cache of every group above it, so writing the document again only
+encodes the groups that changed. ElementTree children and the columns of a
+ShapeBatch can not report their changes, call touch on their parent after
+changing them.
+"""
+ETREE_MODEL = "etree"
+NODE_MODEL  = "node"
+
+NODE_CACHED_TAGS = ('svg', 'defs', 'g')
+
+class SVGNode:
+    __slots__ = ('tag', 'attrs', 'children', '_text', '_tail', 'parent', 'cache', '__weakref__')
+    
+    def __init__(self, tag, attr = {}):
+        self.tag      = tag
+        self.attrs    = tuple(itertools.chain.from_iterable(attr.items()))
+        self.children = []
+        self._text    = None
+        self._tail    = None
+        self.parent   = None
+        self.cache    = None
+    
+    def __len__(self):
+        return len(self.children)
+    
+    def __iter__(self):
+        return iter(self.children)
+    
+    def __getitem__(self, index):
+        return self.children[index]
+    
+    def __setitem__(self, index, child):
+        self.children[index] = child
+        
+        for c in (child if isinstance(index, slice) else [child]):
+            self.adopt(c)
+            
+        self.touch()
+        
+    def __deepcopy__(self, memo):
+        node = SVGNode(self.tag)
+        
+        node.attrs = self.attrs
+        node._text = self._text
+        node._tail = self._tail
+        node.cache = self.cache
+        
+        for child in self.children:
+            child = copy.deepcopy(child, memo)
+            
+            node.children.append(child)
+            node.adopt(child)
+        
+        return node
+    
+    @property
+    def text(self):
+        return self._text
+    
+    @text.setter
+    def text(self, text):
+        self._text = text
+        self.touch()
+    
+    @property
+    def tail(self):
+        return self._tail
+    
+    @tail.setter
+    def tail(self, tail):
+        self._tail = tail
+        self.touch()
+    
+    """
+    touch()
+    
+    clears the cached bytes of this node and the groups above it. A group
+    without a cache has no cache above it either, so the walk stops there.
+    """
+    def touch(self):
+        node = self
+        
+        while node is not None:
+            if node.cache is None and node.tag in NODE_CACHED_TAGS and node is not self:
+                return
+            
+            node.cache = None
+            node       = node.parent
+    
+    #makes this node the parent of child
+    def adopt(self, child):
+        if child.__class__ is SVGNode or child.__class__ is ShapeBatch:
+            child.parent = self
+    
+    def get(self, key, default = None):
+        attrs = self.attrs
+        
+        for i in range(0, len(attrs), 2):
+            if attrs[i] == key:
+                return attrs[i + 1]
+            
+        return default
+    
+    def set(self, key, value):
+        attrs = self.attrs
+        
+        self.touch()
+        
+        for i in range(0, len(attrs), 2):
+            if attrs[i] == key:
+                self.attrs = attrs[:i + 1] + (value,) + attrs[i + 2:]
+                return
+            
+        self.attrs = attrs + (key, value)
+    
+    #removes an attribute if it is set
+    def unset(self, key):
+        attrs = self.attrs
+        
+        for i in range(0, len(attrs), 2):
+            if attrs[i] == key:
+                self.attrs = attrs[:i] + attrs[i + 2:]
+                self.touch()
+                return
+    
+    def keys(self):
+        return list(self.attrs[0::2])
+    
+    def items(self):
+        return list(zip(self.attrs[0::2], self.attrs[1::2]))
+    
+    @property
+    def attrib(self):
+        return dict(self.items())
+    
+    def append(self, child):
+        self.children.append(child)
+        self.adopt(child)
+        self.touch()
+        
+    def extend(self, children):
+        children = list(children)
+        
+        self.children.extend(children)
+        
+        for child in children:
+            self.adopt(child)
+            
+        self.touch()
+        
+    def remove(self, child):
+        self.children.remove(child)
+        self.touch()
+        
+    def insert(self, index, child):
+        self.children.insert(index, child)
+        self.adopt(child)
+        self.touch()
+    
+    def iter(self, tag = None):
+        if tag is None or tag == self.tag:
+            yield self
+        
+        for child in self.children:
+            yield from child.iter(tag)
+
+"""
+class ShapeBatch
+
+many shapes with the same tag stored as columns. Each attribute is either
+a sequence with a value for every shape, a list, array or range, or a
+single value shared by all of them. SVGWrap.circles, rects and lines add
+batches to node documents and the shapes are only written out, in one
+loop, by writeNode.
+
+get, set and unset work on the shared values, so the optimisations can
+treat a batch as one element with no children
+"""
+def isColumn(value):
+    return hasattr(value, '__len__') and not isinstance(value, str)
+
+class ShapeBatch:
+    __slots__ = ('tag', 'columns', 'count', 'text', 'tail', 'parent')
+    
+    def __init__(self, tag, columns):
+        count = None
+        
+        for key in columns:
+            if isColumn(columns[key]):
+                assert (count is None or len(columns[key]) == count), "columns of " + tag + " are not the same length"
+                
+                count = len(columns[key])
+        
+        self.tag     = tag
+        self.columns = dict(columns)
+        self.count   = 1 if count is None else count
+        self.text    = None
+        self.tail    = None
+        self.parent  = None
+    
+    def __len__(self):
+        return 0
+    
+    def __deepcopy__(self, memo):
+        batch = ShapeBatch(self.tag, copy.deepcopy(self.columns, memo))
+        
+        batch.text = self.text
+        batch.tail = self.tail
+        
+        return batch
+    
+    def __iter__(self):
+        return iter(())
+    
+    #clears the cached bytes of the groups above the batch
+    def touch(self):
+        if self.parent is not None:
+            self.parent.touch()
+    
+    def get(self, key, default = None):
+        value = self.columns.get(key, default)
+        
+        return default if isColumn(value) else value
+    
+    def set(self, key, value):
+        self.columns[key] = value
+        self.touch()
+    
+    def unset(self, key):
+        if self.columns.pop(key, None) is not None:
+            self.touch()
+    
+    def keys(self):
+        return [key for key, value in self.items()]
+    
+    def items(self):
+        return [(key, value) for key, value in self.columns.items() if not isColumn(value)]
+    
+    def iter(self, tag = None):
+        if tag is None or tag == self.tag:
+            yield self
+    
+    #yields a dict of the attributes of each shape
+    def rows(self):
+        keys    = list(self.columns)
+        columns = [value if isColumn(value) else itertools.repeat(value, self.count) for value in self.columns.values()]
+        
+        for row in zip(*columns):
+            yield dict(zip(keys, row))
+    
+    #returns the text of all the shapes, the shared values are written into
+    #a template once and the columns are filled in for each shape
+    def toText(self):
+        template = ["<" + self.tag]
+        columns  = []
+        
+        for key, value in self.columns.items():
+            if isColumn(value):
+                template.append(" " + key + '="%s"')
+                
+                if len(value) and isinstance(value[0], str):
+                    value = [v.translate(NODE_ESCAPES) for v in value]
+                    
+                columns.append(value)
+            else:
+                template.append(" " + key + '="' + str(value).translate(NODE_ESCAPES).replace("%", "%%") + '"')
+                
+        template = "".join(template) + " />"
+        
+        if not columns:
+            return (template % ()) * self.count
+        
+        return "".join(map(template.__mod__, zip(*columns)))
+
+"""
+subElement(parent, tag, attr)
+
+adds a tag to parent with the attributes in attr and returns it, the new
+tag is an SVGNode when parent is one and an ElementTree element otherwise,
+so each builder method follows the model of the document it is given
+"""
+def subElement(parent, tag, attr = {}):
+    if isinstance(parent, SVGNode):
+        node = SVGNode(tag, attr)
+        
+        parent.append(node)
+        
+        return node
+    
+    element = ET.SubElement(parent, tag)
+    
+    for i in attr:
+        element.set(i, str(attr[i]))
+        
+    return element
+
+"""
+writeNode(node, write)
+
+serialises a node and everything below it and calls write with the bytes.
+The cached bytes of unchanged groups are reused, the groups that changed
+are encoded and cached again. Namespaced attributes of loaded ElementTree
+groups are written with the xlink and xml prefixes, others, editor
+metadata, are left out. Returns the number of bytes written.
+"""
+NODE_PREFIXES = {
+                 "{http://www.w3.org/1999/xlink}"          : "xlink:",
+                 "{http://www.w3.org/XML/1998/namespace}"  : "xml:"
+                }
+
+NODE_ESCAPES  = str.maketrans({"&" : "&amp;", "<" : "&lt;", ">" : "&gt;", '"' : "&quot;"})
+
+def writeNode(node, write):
+    out = []
+    
+    nodePieces(node, out)
+    
+    data = joinPieces(out)
+    
+    write(data)
+    
+    return len(data)
+
+#joins text and cached bytes into bytes, runs of text are encoded together
+def joinPieces(pieces):
+    out  = []
+    text = []
+    
+    for piece in pieces:
+        if piece.__class__ is bytes:
+            if text:
+                out.append("".join(text).encode('ascii', 'xmlcharrefreplace'))
+                text = []
+                
+            out.append(piece)
+        else:
+            text.append(piece)
+    
+    if text:
+        out.append("".join(text).encode('ascii', 'xmlcharrefreplace'))
+        
+    return b"".join(out)
+
+#appends the pieces of an element and its tail to out, text for elements
+#and the bytes of cached groups, numbers are converted here
+def nodePieces(element, out):
+    cls = element.__class__
+    
+    if cls is SVGNode and element.tag in NODE_CACHED_TAGS:
+        if element.cache is None:
+            pieces = []
+            
+            elementPieces(element, pieces)
+            
+            element.cache = joinPieces(pieces)
+            
+        out.append(element.cache)
+    elif cls is ShapeBatch:
+        out.append(element.toText())
+        
+        if element.tail:
+            out.append(element.tail.translate(NODE_ESCAPES))
+    else:
+        elementPieces(element, out)
+
+def elementPieces(element, out):
+    tag = element.tag
+    
+    if element.__class__ is SVGNode:
+        attrs = element.attrs
+        pairs = zip(attrs[0::2], attrs[1::2])
+    else:
+        pairs = element.attrib.items()
+    
+    parts = ["<", tag]
+    
+    for key, value in pairs:
+        if key[0] == "{":
+            uri, name = key[1:].split("}", 1)
+            prefix    = NODE_PREFIXES.get("{" + uri + "}")
+            
+            if prefix is None:
+                continue
+                
+            key = prefix + name
+            
+        if value.__class__ is str:
+            if "&" in value or "<" in value or '"' in value or ">" in value:
+                value = value.translate(NODE_ESCAPES)
+        else:
+            value = str(value)
+            
+        parts.append(" " + key + '="' + value + '"')
+    
+    text = element.text
+    
+    if len(element) == 0 and not text:
+        parts.append(" />")
+        
+        out.append("".join(parts))
+    else:
+        parts.append(">")
+        
+        if text:
+            parts.append(text.translate(NODE_ESCAPES))
+            
+        out.append("".join(parts))
+        
+        for child in element:
+            nodePieces(child, out)
+            
+        out.append("</" + tag + ">")
+    
+    if element.tail:
+        out.append(element.tail.translate(NODE_ESCAPES))
+
+"""
+class NodeTree
+
+stands in for ElementTree in a document of nodes, so svgOut.tree.write
+works with either model
+"""
+class NodeTree:
+    def __init__(self, root = None):
+        self.root = root
+        
+    def getroot(self):
+        return self.root
+    
+    def _setroot(self, root):
+        self.root = root
+        
+    def write(self, filename):
+        with open(filename, 'wb') as f:
+            writeNode(self.root, f.write)
+
+"""
+presentation attributes considered by SVGWrap.hoistStyles, the inherited
+attributes are the ones that can be lifted from children onto their group,
+opacity is not inherited
+"""
+INHERITED_ATTRIBUTES = (
+                        "fill",
+                        "fill-opacity",
+                        "fill-rule",
+                        "stroke",
+                        "stroke-width",
+                        "stroke-opacity",
+                        "stroke-linecap",
+                        "stroke-linejoin",
+                        "stroke-miterlimit",
+                        "stroke-dasharray",
+                        "stroke-dashoffset"
+                       )
+
+PRESENTATION_ATTRIBUTES = INHERITED_ATTRIBUTES + ("opacity",)
+
+#removes an attribute from an element if it is set
+def removeAttribute(element, key):
+    if isinstance(element, (SVGNode, ShapeBatch)):
+        element.unset(key)
+    else:
+        element.attrib.pop(key, None)
+
+"""
+cloneTree(tree, share)
+
+returns a copy of an element tree without serialising and parsing it,
+by default the whole tree is deep copied.
+
+When share is True the copy is copy-on-write, only the top element is
+copied, so its attributes can be changed, and the subtrees below it are
+shared with the original. The shared children keep the original as their
+parent, so its cached bytes are still cleared when they change. Both the
+copy and the original are recorded in SHARED_TREES until they own their
+children again, hoistStyles, minify and bakeTransform call ownSharedTrees
+before changing a document so neither sees the other's changes. To change
+a shared subtree another way call ownTree on the copy, or the original,
+first.
+"""
+SHARED_TREES = weakref.WeakSet()
+
+def cloneTree(tree, share = False):
+    if not share:
+        return copy.deepcopy(tree)
+
+    if isinstance(tree, SVGNode):
+        clone = SVGNode(tree.tag)
+        clone.attrs = tree.attrs
+
+        #not extend, that would make the clone the parent of the children
+        clone.children = list(tree.children)
+    else:
+        clone = ET.Element(tree.tag, tree.attrib)
+        clone.extend(tree)
+
+    clone.text = tree.text
+    clone.tail = tree.tail
+
+    SHARED_TREES.add(tree)
+    SHARED_TREES.add(clone)
+
+    return clone
+
+#replaces the shared children of a copy-on-write clone with private copies
+def ownTree(tree):
+    tree[:] = [copy.deepcopy(child) for child in tree]
+
+    SHARED_TREES.discard(tree)
+
+    return tree
+
+#gives every tree below root, and root, that shares its children private
+#copies of them, from the top down so the shared subtrees are only read.
+#returns the number of trees copied
+def ownSharedTrees(root):
+    count = 0
+    stack = [root]
+
+    while stack:
+        element = stack.pop()
+
+        if element in SHARED_TREES:
+            ownTree(element)
+            count += 1
+
+        stack.extend(element)
+
+    return count
+
+#true when element is below a tree in root that shares its children, so
+#changing it would change the other trees sharing them
+def insideSharedTree(root, element):
+    stack = [(root, False)]
+
+    while stack:
+        node, shared = stack.pop()
+
+        if node is element:
+            return shared
+
+        shared = shared or node in SHARED_TREES
+
+        stack.extend([(child, shared) for child in node])
+
+    return False
+
+"""
+parseAsset(filename, mtime)
+
+parses an svg file and builds an index of its elements by id, the
+namespaces are removed from the tags. If more than one element has
+the same id the last one is indexed.
+
+Parsed assets are kept in a process wide LRU cache keyed by the path and
+modification time, so loading many groups from the same file costs one
+parse and a file that changes is parsed again. The cached trees are
+shared, use copies of the elements.
+
+returns (root, index)
+"""
+ASSET_CACHE_SIZE = 32
+
+@functools.lru_cache(maxsize = ASSET_CACHE_SIZE)
+def parseAsset(filename, mtime):
+    root = ET.parse(filename).getroot()
+
+    index = {}
+
+    for element in root.iter():
+        #remove namespace entries on tags
+        checkNamespace = element.tag.split('}')
+
+        if len(checkNamespace) > 1:
+            element.tag = checkNamespace[1]
+
+        id = element.get('id')
+
+        if id is not None:
+            index[id] = element
+
+    return (root, index)
+
+"""
+________________________________
+ASSET BUNDLES
+
+an asset bundle is a precompiled file of groups from svg files. The groups
+are normalised, namespaces, metadata and editor attributes are removed, and
+stored as nested tuples written with marshal, so loading a bundle at
+startup costs no xml parsing.
+
+compileAssetBundle(bundleFile, assets) is the build step, assets is a
+list of (filename, groupName). loadAssetBundle(bundleFile) makes the
+groups available to SVGWrap.loadGroup under the same filename and
+groupName. Files are recorded relative to the bundle and looked up by
+their absolute path, like parseAsset, so any spelling of the path finds
+the group. The modification time of each file is kept with its groups
+and loadGroup reads the file instead of the bundle once it has changed.
+Bundles are written by the running version of Python and must be
+compiled again for a different version.
+"""
+BUNDLE_MAGIC = "PythonSVG asset bundle 2"
+
+#groups loaded from bundles keyed by (absolute path, groupName), each is
+#the modification time of its file when compiled and the packed group
+ASSET_BUNDLES = {}
+
+#namespaces of editor attributes and tags of metadata removed from bundled groups
+METADATA_NAMESPACES = (
+                       "{http://www.inkscape.org/namespaces/inkscape}",
+                       "{http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd}",
+                       "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}",
+                       "{http://creativecommons.org/ns#}",
+                       "{http://purl.org/dc/elements/1.1/}"
+                      )
+
+METADATA_TAGS = ("metadata", "namedview", "RDF", "title", "desc")
+
+#packs an element into nested tuples of (tag, attributes, text, tail, children)
+#leaving out metadata and whitespace only text
+def packTree(element):
+    items = tuple([(k, v) for k, v in element.items() if not k.startswith(METADATA_NAMESPACES)])
+
+    text = element.text if element.text and element.text.strip() else None
+    tail = element.tail if element.tail and element.tail.strip() else None
+
+    children = tuple([packTree(child) for child in element if child.tag not in METADATA_TAGS])
+
+    return (element.tag, items, text, tail, children)
+
+def unpackTree(packed):
+    tag, items, text, tail, children = packed
+
+    element = ET.Element(tag, dict(items))
+
+    element.text = text
+    element.tail = tail
+
+    element.extend([unpackTree(child) for child in children])
+
+    return element
+
+def compileAssetBundle(bundleFile, assets):
+    bundle = {}
+
+    directory = os.path.dirname(os.path.abspath(bundleFile))
+
+    for filename, groupName in assets:
+        path  = os.path.abspath(filename)
+        mtime = os.path.getmtime(path)
+
+        svgDoc, index = parseAsset(path, mtime)
+
+        assert (groupName in index), "group " + groupName + " not found in " + filename
+
+        packed = packTree(index[groupName])
+
+        #files on another drive than the bundle are kept absolute
+        try:
+            name = os.path.relpath(path, directory)
+        except ValueError:
+            name = path
+
+        #the group is loaded without its tail
+        bundle[(name, groupName)] = (mtime, packed[:3] + (None,) + packed[4:])
+
+    with open(bundleFile, 'wb') as f:
+        marshal.dump((BUNDLE_MAGIC, bundle), f)
+
+    return len(bundle)
+
+#returns the number of groups loaded
+def loadAssetBundle(bundleFile):
+    with open(bundleFile, 'rb') as f:
+        magic, bundle = marshal.load(f)
+
+    assert (magic == BUNDLE_MAGIC), "not an asset bundle: " + bundleFile
+
+    directory = os.path.dirname(os.path.abspath(bundleFile))
+
+    for (filename, groupName), entry in bundle.items():
+        ASSET_BUNDLES[(os.path.normpath(os.path.join(directory, filename)), groupName)] = entry
+
+    return len(bundle)
+
+#the packed group of a bundle, None when no bundle has it or its file has
+#changed since the bundle was compiled. A bundled file that is missing is
+#still served from the bundle
+def bundledGroup(path, groupName):
+    entry = ASSET_BUNDLES.get((path, groupName))
+
+    if entry is None:
+        return None
+
+    mtime, packed = entry
+
+    try:
+        if os.path.getmtime(path) != mtime:
+            return None
+    except OSError:
+        pass
+
+    return packed
+
+"""
+contentKey(element)
+
+returns a digest of the canonical serialisation of an element, attributes
+are sorted so their order does not matter, whitespace only text is ignored
+and the element's own id is left out, so identical definitions with
+different ids have the same key
+"""
+def contentKey(element):
+    def canonical(e, skipId = False):
+        items = sorted([(k, v) for k, v in e.items() if not (skipId and k == 'id')])
+
+        text = e.text if e.text and e.text.strip() else None
+        tail = e.tail if e.tail and e.tail.strip() else None
+
+        return (e.tag, items, text, tail, [canonical(c) for c in e])
+
+    top = canonical(element, True)
+
+    #the tail is outside the definition
+    return hashlib.sha1(repr(top[:3] + top[4:]).encode()).hexdigest()
+
+"""
+MINIFY
+
+helpers for SVGWrap.minify, the attributes whose numbers are rounded, the
+default values of shape attributes that can be left out and the short ids
+given to referenced elements. Only attributes that are not inherited have
+their defaults dropped, leaving out an inherited one would let the value
+of a parent show through.
+"""
+MINIFY_NUMERIC = (
+                  "x", "y", "cx", "cy", "r", "rx", "ry", "fx", "fy",
+                  "x1", "y1", "x2", "y2", "width", "height", "viewBox",
+                  "d", "points", "transform", "stroke-width", "stroke-dasharray",
+                  "stroke-dashoffset", "opacity", "fill-opacity", "stroke-opacity",
+                  "stop-opacity", "font-size"
+                 )
+
+MINIFY_DEFAULTS = {
+                   "x"       : 0,
+                   "y"       : 0,
+                   "cx"      : 0,
+                   "cy"      : 0,
+                   "x1"      : 0,
+                   "y1"      : 0,
+                   "x2"      : 0,
+                   "y2"      : 0,
+                   "opacity" : 1
+                  }
+
+MINIFY_SHAPES = ('rect', 'circle', 'ellipse', 'line', 'polyline', 'polygon', 'path', 'use', 'g')
+
+MINIFY_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+URL_REFERENCE = re.compile(r"url\(\s*#([^)\s]+)\s*\)")
+
+HREF_KEYS = ('href', 'xlink:href', '{http://www.w3.org/1999/xlink}href')
+
+ID_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def isNumber(value):
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+
+    return True
+
+#returns the ids an attribute refers to
+def referencedIds(key, value):
+    if not isinstance(value, str):
+        return []
+
+    ids = URL_REFERENCE.findall(value)
+
+    if key in HREF_KEYS and value.startswith("#"):
+        ids.append(value[1:])
+
+    return ids
+
+def renameReferences(key, value, renamed):
+    if key in HREF_KEYS and value.startswith("#"):
+        return "#" + renamed.get(value[1:], value[1:])
+
+    return URL_REFERENCE.sub(lambda m: "url(#" + renamed.get(m.group(1), m.group(1)) + ")", value)
+
+#returns the nth short id, a - Z then aa, ab and so on
+def shortId(n):
+    id = ID_CHARS[n % len(ID_CHARS)]
+    n //= len(ID_CHARS)
+
+    while n:
+        n -= 1
+        id = ID_CHARS[n % len(ID_CHARS)] + id
+        n //= len(ID_CHARS)
+
+    return id
+
+#rounds every number in a value, numbers that are not strings are formatted
+#directly. Numbers that lose the sign or point separating them from their
+#neighbours are kept apart, 1.0.5 becomes 1 .5 not 1.5
+def roundNumbers(value, precision = PATH_PRECISION):
+    if not isinstance(value, str):
+        return formatNumber(value, precision)
+
+    def rounded(m):
+        number = formatNumber(float(m.group()), precision)
+
+        if m.start() and value[m.start() - 1] in "0123456789." and number[0] != "-":
+            number = " " + number
+
+        return number
+
+    return MINIFY_NUMBER.sub(rounded, value)
+
+#rounds the numbers of path data and writes it compactly, the flags of
+#arcs are left as they are
+def roundPathData(pathData, precision = PATH_PRECISION):
+    out      = []
+    command  = None
+    count    = 0
+    previous = ""
+
+    for token in PATH_TOKEN.findall(pathData):
+        if token[0].isalpha():
+            out.append(token)
+
+            command  = token.upper()
+            count    = 0
+            previous = token
+
+            continue
+
+        numbers = []
+
+        if command == "A":
+            while count % 7 in (3, 4) and len(token) > 1 and token[0] in "01":
+                numbers.append(token[0])
+                token  = token[1:]
+                count += 1
+
+            count -= len(numbers)
+
+        numbers.append(token)
+
+        for number in numbers:
+            if command == "A" and count % 7 in (3, 4):
+                text = number
+            else:
+                text = formatNumber(float(number), precision)
+
+            if not previous[-1:].isalpha() and text[0] != "-":
+                out.append(" ")
+
+            out.append(text)
+
+            count   += 1
+            previous = text
+
+    return "".join(out)
+
+"""
+atomicWrite(filename, write)
+
+calls write with a binary file object for a temporary file in the same
+directory as filename, which then replaces it, so a file that exists is
+always complete. The temporary file is removed if write fails and the
+error is raised. A file that is replaced keeps its permissions, a new file
+gets the usual ones for the process.
+
+returns what write returned
+"""
+#reading the umask means setting it, which other threads would see, so it
+#is read once at import
+FILE_UMASK = os.umask(0)
+os.umask(FILE_UMASK)
+
+def atomicWrite(filename, write):
+    handle, temp = tempfile.mkstemp(prefix = ".", suffix = ".tmp", dir = os.path.dirname(os.path.abspath(filename)))
+    
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            result = write(f)
         
-        hVariant = (self.dna.next() * (self.variation[0] * 2.0)) - self.variation[0]
-        h = wrap(0.0, hls[0] + hVariant, 1.0)
+        #mkstemp files are private
+        try:
+            mode = os.stat(filename).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~FILE_UMASK
         
-        lVariant = (self.dna.next() * (self.variation[1] * 2.0)) - self.variation[1]            
-        l = wrap(0.0, hls[1] + lVariant, 1.0)
+        os.chmod(temp, mode)
         
-        sVariant = (self.dna.next() * (self.variation[2] * 2.0)) - self.variation[2]
-        s = wrap(0.0, hls[2] + sVariant, 1.0)
+        os.replace(temp, filename)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+            
+        raise
+    
+    return result
+
+"""
+class CountingWriter
+
+passes bytes on to a file object and counts them, used by SVGWrap.writeDoc
+to report the size of a document before and after compression
+"""
+GZIP_LEVEL = 9
+
+class CountingWriter:
+    def __init__(self, file):
+        self.file  = file
+        self.count = 0
         
-        newCol.setHLS(h = h, l = l, s = s)
+    def write(self, data):
+        self.count += len(data)
         
-        return newCol
+        return self.file.write(data)
+
+"""
+preview(filename)
+
+opens an svg file with the windows start command, elsewhere the file is
+drawn to a png beside it by PythonSVGRaster, which needs NumPy
+
+returns the file opened or written, None if there is no preview
+"""
+def preview(filename):
+    if sys.platform.startswith("win"):
+        check_output("start " + filename, shell=True)
+
+        return filename
+
+    try:
+        import PythonSVGRaster
+    except ImportError:
+        print("No preview of " + filename + ", PythonSVGRaster needs NumPy")
+
+        return None
+
+    pngFile = os.path.splitext(filename)[0] + ".png"
+
+    PythonSVGRaster.renderFile(filename, pngFile)
+
+    print("Preview of " + filename + " written to " + pngFile)
+
+    return pngFile
+
 """
 class SVGWrap
 this class builds an ElementTree of an SVG XML document
@@ -600,6 +2436,9 @@ this class builds an ElementTree of an SVG XML document
 svg tags are added to the tree by passing the parent node and a dict of attributes
 
 the main body of the svg document, the <svg> tag, is the root of the ElementTree
+
+with model = NODE_MODEL the document is built from SVGNode instead, see
+NODE MODEL
 """
 class SVGWrap:       
     def body(self, attr = {
@@ -607,7 +2446,11 @@ class SVGWrap:
                            "height" : 100
                            }):
                            
-        self.root = ET.Element('svg')
+        if self.model == NODE_MODEL:
+            self.root = SVGNode('svg')
+        else:
+            self.root = ET.Element('svg')
+            
         self.tree._setroot(self.root)
         
         self.root.set("xmlns", r'http://www.w3.org/2000/svg')
@@ -622,10 +2465,27 @@ class SVGWrap:
                                "width" : 100,
                                "height" : 100,
                                "version" : "1.1"
-                               }):
-        self.tree = ET.ElementTree()
+                               }, model = ETREE_MODEL):
+        self.model = model
+        
+        if model == NODE_MODEL:
+            self.tree = NodeTree()
+        else:
+            self.tree = ET.ElementTree()
+            
         self.body(attr)
-        self.defs = ET.SubElement(self.root, 'defs')
+        self.defs = subElement(self.root, 'defs')
+        
+        #classes generated by hoistStyles and the style tag holding them
+        self.styleClasses = {}
+        self.style        = None
+        
+        #ids of the references defined in this document, the id of each
+        #definition keyed by its content and the id each reference added
+        #is defined with
+        self.referenceIds     = set()
+        self.defsContent      = {}
+        self.referenceAliases = {}
     """
     ________________________________
     SVG REFERENCE BUILDER
@@ -637,17 +2497,54 @@ class SVGWrap:
     document. SVG references are used to reuse objects, and create
     patterns and gradients.
     
+    a definition with the same content as one already in the defs, ignoring
+    the id, is not added again. The reference itself is not changed, its id
+    is recorded as an alias of the existing definition so use tags made by
+    this document refer to the one copy, see referenceUrl.
+    
+    ids are registered with the document, so the same id can be used in
+    other documents but a different definition can not reuse an id in this one
+    
     parameter:
         reference - reference is an instance of one of the below classes
         inheriting from the class Reference
+    
+    returns the id the reference is defined with in this document
     """
     def addToDefs(self, reference):
+        key = contentKey(reference.root)
+        
+        if key in self.defsContent:
+            id = self.defsContent[key]
+            
+            assert (self.referenceAliases.get(reference.id, id) == id), "Reference already defined :" + str(reference.id)
+            
+            self.referenceAliases[reference.id] = id
+            
+            return id
+        
+        assert (reference.id not in self.referenceIds and reference.id not in self.referenceAliases), "Reference already defined :" + str(reference.id)
+        
         #clone the instance
-        tempRef = ET.fromstring(ET.tostring(reference.tree))
+        tempRef = cloneTree(reference.root)
+        
+        self.attachDefs().append(tempRef)
         
-        self.defs.append(tempRef)
+        self.referenceIds.add(reference.id)
+        self.defsContent[key] = reference.id
+        
+        self.referenceAliases[reference.id] = reference.id
+        
+        return reference.id
     
+    #the url of a reference in this document, which is the url of the
+    #definition it was merged with or renamed to
+    def referenceUrl(self, reference):
+        return "#" + str(self.referenceAliases.get(reference.id, reference.id))
     
+    #a fill or stroke value painting with a gradient or pattern reference
+    def paint(self, reference):
+        return "url(" + self.referenceUrl(reference) + ")"
             
     """
     ________________________________
@@ -666,10 +2563,7 @@ class SVGWrap:
     def group(self, parent, attr = {
                                     "id"     : "main"                             
                                  }):
-        g = ET.SubElement(parent, 'g')
-        
-        for i in attr:
-            g.set(i, str(attr[i]))
+        g = subElement(parent, 'g', attr)
         
         return g
    
@@ -680,14 +2574,80 @@ class SVGWrap:
     def use(self, parent, reference, attr = {}):
         assert (isinstance(reference, Reference)), "Not an instance of Reference"
         
-        u = ET.SubElement(parent, 'use')
+        useAttr = {'xlink:href' : self.referenceUrl(reference)}
+        useAttr.update(attr)
         
-        u.set('xlink:href', reference.url())
-        
-        for i in attr:
-            u.set(i, str(attr[i]))
-            
+        u = subElement(parent, 'use', useAttr)
+
         return u
+
+    """
+    ________________________________
+    SYMMETRY
+    """
+    """
+    def symmetry(parent, reference, order, mirror, origin, attr={})
+
+    this method builds a kaleidoscope from a reference, the reference is
+    added once to the defs section and a use tag is added to the parent
+    for each rotation of 2PI/order about the origin. If mirror is True
+    every rotation is paired with a reflected copy, giving 2 * order use tags
+
+    the rotation matrices are calculated once for each order and cached
+
+    Attributes:
+        parent    - this is the parent node of the use tags
+        reference - an instance of Reference, or a group tree which is
+                    wrapped in a GroupRef using the group's id
+        order     - number of rotations
+        mirror    - adds a copy reflected across the x axis to each rotation
+        origin    - Point the rotations are about, if None the centre
+                    of the document is used, see centre
+        attr      - this is a dict of attributes each use tag will hold
+
+    returns a list of the use tags
+    """
+    def symmetry(self, parent, reference, order = 6, mirror = False, origin = None, attr = {}):
+        assert (isinstance(order, int) and order > 0), "order is not a positive int"
+
+        if not isinstance(reference, Reference):
+            id = reference.get('id') or "symmetry"
+
+            #find a free id for the wrapped group
+            newId = id
+            count = 0
+            while newId in self.referenceIds:
+                count += 1
+                newId = id + str(count)
+
+            reference = GroupRef(newId, reference)
+
+        self.addToDefs(reference)
+
+        if origin is None:
+            origin = self.centre()
+
+        userTransform = attr.get('transform')
+
+        uses = []
+
+        for (a, b, c, d) in symmetryMatrices(order, mirror):
+            #rotate about the origin instead of 0,0
+            e = origin.x - (a * origin.x + c * origin.y)
+            f = origin.y - (b * origin.x + d * origin.y)
+
+            matrix = "matrix(" + str(a) + "," + str(b) + "," + str(c) + "," + str(d) + "," + str(e) + "," + str(f) + ")"
+
+            if userTransform:
+                matrix += " " + str(userTransform)
+
+            u = self.use(parent, reference, attr)
+            u.set('transform', matrix)
+
+            uses.append(u)
+
+        return uses
+
     """
     ________________________________
     BASIC SHAPES
@@ -712,10 +2672,7 @@ class SVGWrap:
                                    "ry"     : 0
                                 }):
         
-        rect = ET.SubElement(parent, 'rect')
-        
-        for i in attr:
-            rect.set(i, str(attr[i]))
+        rect = subElement(parent, 'rect', attr)
         
         return rect
     
@@ -735,10 +2692,7 @@ class SVGWrap:
                                     "r"  : 0
                                   }):
                                   
-        circle = ET.SubElement(parent, 'circle')
-        
-        for i in attr:
-            circle.set(i, str(attr[i]))
+        circle = subElement(parent, 'circle', attr)
         
         return circle
     
@@ -759,11 +2713,8 @@ class SVGWrap:
                                      "ry" : 0
                                    }):
         
-        ellipse = ET.SubElement(parent, 'ellipse')
+        ellipse = subElement(parent, 'ellipse', attr)
         
-        for i in attr:
-            ellipse.set(i, str(attr[i]))
-            
         return ellipse
     
     """
@@ -783,10 +2734,7 @@ class SVGWrap:
                                   "y2" : 0
                                 }):
         
-        line = ET.SubElement(parent, 'line')
-        
-        for i in attr:
-            line.set(i, str(attr[i]))
+        line = subElement(parent, 'line', attr)
         
         return line
     
@@ -805,10 +2753,7 @@ class SVGWrap:
                                                   Point()
                                                  ]):
                 
-        polyline = ET.SubElement(parent, 'polyline')
-        
-        for i in attr:
-            polyline.set(i, str(attr[i]))
+        polyline = subElement(parent, 'polyline', attr)
         
         pointStr = ""
         
@@ -819,15 +2764,68 @@ class SVGWrap:
         
         return polyline
     
+    """
+    ________________________________
+    BULK SHAPES
+    """
+    """
+    def shapes(parent, tag, columns, attrArrays)
+    
+    adds many shapes with the same tag in one call, each attribute is a
+    sequence with a value for each shape or a single value shared by all
+    of them. In a NODE_MODEL document the shapes are kept as columns in a
+    ShapeBatch until the document is written, in an ElementTree document
+    an element is added for each shape.
+    
+    Attributes:
+        parent     - this is the parent node of the shapes
+        tag        - the tag of every shape
+        columns    - a dict of attributes to sequences or values
+        attrArrays - more attributes, an underscore in the name is written
+                     as a hyphen, stroke_width for stroke-width
+    
+    returns the ShapeBatch, or a list of the elements added
+    """
+    def shapes(self, parent, tag, columns, attrArrays = {}):
+        columns = dict(columns)
+        
+        for key in attrArrays:
+            columns[key.replace("_", "-")] = attrArrays[key]
+            
+        batch = ShapeBatch(tag, columns)
+        
+        if isinstance(parent, SVGNode):
+            parent.append(batch)
+            
+            return batch
+        
+        return [subElement(parent, tag, attr) for attr in batch.rows()]
+    
+    #adds a circle for each cx, cy and r
+    def circles(self, parent, cx, cy, r, **attrArrays):
+        return self.shapes(parent, 'circle', {"cx" : cx, "cy" : cy, "r" : r}, attrArrays)
+    
+    #adds a rect for each x, y, width and height
+    def rects(self, parent, x, y, width, height, **attrArrays):
+        return self.shapes(parent, 'rect', {"x" : x, "y" : y, "width" : width, "height" : height}, attrArrays)
+    
+    #adds a line for each x1, y1, x2 and y2
+    def lines(self, parent, x1, y1, x2, y2, **attrArrays):
+        return self.shapes(parent, 'line', {"x1" : x1, "y1" : y1, "x2" : x2, "y2" : y2}, attrArrays)
+    
     """
     class Path
     the path class contains methods for building up path data that is later
     added to the 'd' attribute of the path tag using the method tag
+
+    path data loaded from a file is held parsed in data, a PathData, and
+    comes before the path data built afterwards
     """
     class Path:
         def __init__(self, pathData = ""):
                                   
             self.pathData = pathData
+            self.data     = None
             
             self.commands = {
                             "moveRel"       : "m",
@@ -852,7 +2850,10 @@ class SVGWrap:
                            }
         
         def __str__(self):
-            return self.pathData
+            if self.data is None:
+                return self.pathData
+            
+            return self.data.toString() + self.pathData
             
         """
         def tag(parent, attr={})
@@ -869,35 +2870,96 @@ class SVGWrap:
                                         "id" : "main"
                                     }):
             
-            path = ET.SubElement(parent, 'path')
-            
-            for i in attr:
-                path.set(i, str(attr[i]))
+            path = subElement(parent, 'path', attr)
                 
             path.set('d', str(self))
 
             return path
                 
-        def load(self, filename):
-            f = ""
-            result = ""
-         
+        """
+        def load(filename, parent, attr, chunkSize)
+        
+        appends the path data in a file to the path. The file is memory-mapped
+        and tokenized chunkSize bytes at a time straight into data, so the
+        whole file is never held as text.
+        
+        Attributes:
+            filename  - the file of path data
+            parent    - if given a path tag is added to parent, see tag
+            attr      - attributes of the path tag, the id is the filename
+                        when attr is empty
+            chunkSize - bytes read from the file at a time
+        
+        returns the path tag, or data when there is no parent, ERROR if the
+        file could not be read
+        """
+        def load(self, filename, parent = None, attr = {}, chunkSize = PATH_CHUNK_SIZE):
+            if self.data is None:
+                self.data = PathData()
+            
+            #path data built so far comes before the file
+            self.data.parse(self.pathData)
+            self.pathData = ""
+            
             try:
-                f = open(filename, 'r')
-                self.pathData += f.read()
-                f.close()
-                result = self.tag({"id" : filename})
-            except:
+                self.data.read(filename, chunkSize)
+            except OSError:
                 print("Could not find file: " + filename)
-                result = ERROR
+                return ERROR
+            
+            if parent is None:
+                return self.data
+                
+            return self.tag(parent, attr or {"id" : filename})
+        
+        """
+        def stream(filename, writer, precision, chunkSize)
+        
+        copies the path data in a file to writer, anything with a write
+        method taking a string. Each chunk is parsed, written out compactly
+        and dropped, so neither the text nor the parsed data of the whole
+        file is held in memory. The path itself is not changed. Numbers are
+        written exactly unless a precision is given.
+        
+        returns the number of characters written
+        """
+        def stream(self, filename, writer, precision = None, chunkSize = PATH_CHUNK_SIZE):
+            data    = PathData()
+            written = 0
+            
+            for chunk in readChunks(filename, chunkSize):
+                data.feed(chunk)
                 
-            return result
+                out = data.drain(precision)
+                
+                writer.write(out)
+                written += len(out)
+            
+            data.finish()
+            
+            out = data.drain(precision)
+            
+            writer.write(out)
+            written += len(out)
+            
+            return written
+        
+        #parse returns the path data as a PathData of absolute commands
+        def parse(self):
+            return PathData(str(self))
         
+        #bake applies a Transform2D to the coordinates of the path data, the
+        #coordinates are kept exactly unless a precision is given
+        def bake(self, transform, precision = None):
+            self.set(PathData(str(self)).transform(transform).toString(precision))
+            
         def reset(self):
             self.pathData = ""
+            self.data     = None
             
         def set(self, newPathData):
             self.pathData = newPathData
+            self.data     = None
         
         """
         methods below for adding path data as represent in the SVG specification
@@ -1037,61 +3099,596 @@ class SVGWrap:
     #including the subelements of that group
     #If the group is not found or the file is not found this will
     #return None
-    def loadGroup(self, filename, groupName):
+    #The file is parsed once and cached, see parseAsset, the group
+    #returned is a copy, if share is True it is a copy-on-write clone
+    #whose children are copied before hoistStyles, minify or bakeTransform
+    #change them, so the cached asset is never changed
+    #If stream is True the group is extracted with streamGroup instead
+    #Groups in a loaded asset bundle are built from the bundle without
+    #parsing the file, unless the file has changed, see loadAssetBundle
+    def loadGroup(self, filename, groupName, share = False, stream = False):
+        if stream:
+            return self.streamGroup(filename, groupName)
+        
+        path = os.path.abspath(filename)
+        
+        packed = bundledGroup(path, groupName)
+        
+        if packed is not None:
+            group = unpackTree(packed)
+            group.set('transform', "")
+            
+            return group
+        
         try:
-            file = open(filename, 'r')
-        except:
+            svgDoc, index = parseAsset(path, os.path.getmtime(path))
+        except OSError:
             print("Unable to open file " + filename)
             return None
         
-        content = file.read()
-        file.close()
-            
-        svgDoc = ET.fromstring(content)
+        foundGroup = index.get(groupName)
+        
+        if foundGroup is None:
+            return None
+        
+        #copy so the cached asset is not changed
+        group = cloneTree(foundGroup, share)
+        
+        #remove any transforms on the group
+        group.set('transform', "")
+        
+        #the text after the group belongs to the file it was loaded from
+        group.tail = None
+        
+        return group
+    
+    #streamGroup extracts a group like loadGroup for large files, the file
+    #is parsed incrementally and reading stops as soon as the end tag of the
+    #group is found. Elements outside the group are cleared as soon as they
+    #end, so memory is proportional to the group rather than the file.
+    #The first element with the id is returned and nothing is cached.
+    def streamGroup(self, filename, groupName):
+        try:
+            file = open(filename, 'rb')
+        except OSError:
+            print("Unable to open file " + filename)
+            return None
         
         foundGroup = None
+        stack      = []
+        
+        with file:
+            for event, element in ET.iterparse(file, events = ('start', 'end')):
+                if event == 'start':
+                    stack.append(element)
+                    
+                    if foundGroup is None and element.get('id') == groupName:
+                        foundGroup = element
+                    
+                    continue
+                
+                stack.pop()
+                
+                if element is foundGroup:
+                    break
+                
+                if foundGroup is None:
+                    #drop the element, it ends before the group starts
+                    element.clear()
+                    
+                    if stack and len(stack[-1]) and stack[-1][-1] is element:
+                        del stack[-1][-1]
         
-        for group in svgDoc.findall(".//*"):
-             
+        if foundGroup is None:
+            return None
+        
+        for element in foundGroup.iter():
             #remove namespace entries on tags
-            checkNamespace = group.tag.split('}')
+            checkNamespace = element.tag.split('}')
             
             if len(checkNamespace) > 1:
-                group.tag = checkNamespace[1]
-
-            id = group.get('id')
-            
-            if id == groupName:
-                #remove any transforms on the group
-                group.set('transform', "")
-                foundGroup = group
-
-        groupTree = ET.fromstring(ET.tostring(foundGroup)) 
-        return groupTree
+                element.tag = checkNamespace[1]
+        
+        #remove any transforms on the group
+        foundGroup.set('transform', "")
+        
+        foundGroup.tail = None
+        
+        return foundGroup
     
-    def writeDoc(self, filename):
-        try:
-            self.tree.write(filename)
-        except:
-            print("Unable to write file: " + filename)
+    """
+    def writeDoc(output, compress, level)
+    
+    writes the document to a file or a file object. A file is written with
+    atomicWrite, so it is never left half written.
+    
+    Attributes:
+        output   - a filename, or a binary file object which is written to
+                   and left open
+        compress - gzip the document, if None files ending in .svgz are
+                   compressed and file objects are not
+        level    - gzip compression level 1 - 9
+    
+    returns a dict with the bytes of the document, the bytes written to
+    output and their ratio
+    """
+    def writeDoc(self, output, compress = None, level = GZIP_LEVEL):
+        if hasattr(output, 'write'):
+            return self.writeStream(output, bool(compress), level)
+        
+        if compress is None:
+            compress = str(output).endswith(".svgz")
+        
+        return atomicWrite(output, lambda f: self.writeStream(f, compress, level))
+    
+    #writes the document to a binary file object, see writeDoc
+    def writeStream(self, f, compress = False, level = GZIP_LEVEL):
+        written = CountingWriter(f)
+        
+        if compress:
+            zipped   = gzip.GzipFile(filename = "", mode = 'wb', fileobj = written, compresslevel = level, mtime = 0)
+            document = CountingWriter(zipped)
+        else:
+            document = written
+        
+        if self.model == NODE_MODEL:
+            writeNode(self.root, document.write)
+        else:
+            self.tree.write(document)
+            
+        if compress:
+            zipped.close()
+        
+        return {
+                "bytes"   : document.count,
+                "written" : written.count,
+                "ratio"   : written.count / float(max(document.count, 1))
+               }
             
     def display(self):
         TEMP_FILE = r'temp.html'
         
-        self.writeDoc(TEMP_FILE)
+        self.writeDoc(TEMP_FILE)
+        
+        preview(TEMP_FILE)
+    
+    #appendGroup takes a group tree applies attributes (attr) to it and
+    #appends it to the given parent element
+    #if share is True the children of the group are shared with groupTree
+    #instead of copied until either is changed, see cloneTree
+    def appendGroup(self, parent, groupTree, attr = {}, share = False):
+        
+        tempGroup = cloneTree(groupTree, share)
+        
+        for i in attr:
+            tempGroup.set(i, str(attr[i]))
+            
+        parent.append(tempGroup)
+        
+        return tempGroup
+
+    """
+    def bakeTransform(element, transform)
+    
+    this method moves transforms into the geometry of element and its
+    children. The transform of each element is composed with the one given
+    and the result is written into the coordinates of path, line, polyline
+    and polygon elements, so a rotated copy of a loaded group is plain
+    geometry rather than nested transform groups. Other shapes, rect, circle,
+    use and so on, keep a single composed matrix transform. The shapes of a
+    ShapeBatch are baked one by one in the same way. Stroke widths
+    are not scaled, so transforms with a scale will draw thinner strokes.
+    
+    The element is changed in place. A group appended with share = True is
+    given private copies of its children first, an element below such a
+    group can not be baked until ownTree is called on the group. In a node
+    document the cached bytes of the groups above the element are cleared,
+    ElementTree elements do not do that themselves.
+    
+    Attributes:
+        element   - the element to bake, usually a group from loadGroup
+        transform - a Transform2D applied on top of the element's own
+                    transform, None for just its own transform
+    
+    returns the element
+    """
+    def bakeTransform(self, element, transform = None):
+        assert (not insideSharedTree(self.root, element)), "element is in a shared group, call ownTree on the group first"
+        
+        ownSharedTrees(element)
+        
+        self.bakeElement(element, transform)
+        
+        self.touchElement(element)
+        
+        return element
+    
+    #bakes one element and its children, see bakeTransform
+    def bakeElement(self, element, transform = None):
+        matrix = transform.matrix if transform else Transform2D().matrix
+        
+        if element.__class__ is ShapeBatch:
+            return self.bakeBatch(element, matrix)
+        
+        own = element.get('transform')
         
-        check_output("start " + TEMP_FILE, shell=True)
-    
-    #appendGroup takes a group tree applies attributes (attr) to it and
-    #appends it to the given parent element
-    def appendGroup(self, parent, groupTree, attr = {}):
+        if own:
+            matrix = multi(matrix, parseTransform(own).matrix)
+            
+        removeAttribute(element, 'transform')
         
-        tempGroup = ET.fromstring(ET.tostring(groupTree))
+        tag = element.tag
         
-        for i in attr:
-            tempGroup.set(i, str(attr[i]))
+        #baked numbers are kept exactly, minify rounds them
+        if tag == 'path':
+            element.set('d', PathData(element.get('d', "")).transform(matrix).toString(None))
+        elif tag == 'line':
+            line = PathData("M" + " ".join([element.get(k, "0") for k in ("x1", "y1", "x2", "y2")]))
+            x1, y1, x2, y2 = line.transform(matrix).coords
             
-        parent.append(tempGroup)
+            for key, value in zip(("x1", "y1", "x2", "y2"), (x1, y1, x2, y2)):
+                element.set(key, formatNumber(value, None))
+        elif tag in ('polyline', 'polygon'):
+            points = PathData("M" + element.get('points', "")).transform(matrix).coords
+            
+            element.set('points', " ".join([formatNumber(points[i], None) + "," + formatNumber(points[i + 1], None) for i in range(0, len(points), 2)]))
+        elif tag in ('g', 'a', 'switch'):
+            baked = Transform2D()
+            baked.matrix = matrix
+            
+            for child in element:
+                self.bakeElement(child, baked)
+        elif matrix != Transform2D().matrix:
+            baked = Transform2D()
+            baked.matrix = matrix
+            
+            element.set('transform', baked.svgOut())
+            
+        return element
+    
+    #bakes a ShapeBatch, each shape is baked with its own transform composed
+    #with matrix, the coordinates of lines are moved and other shapes keep
+    #a composed transform as a single line or circle would
+    def bakeBatch(self, batch, matrix):
+        own      = batch.columns.pop('transform', None)
+        owns     = own if isColumn(own) else itertools.repeat(own, batch.count)
+        matrices = [multi(matrix, parseTransform(t).matrix) if t else matrix for t in owns]
+        
+        if batch.tag == 'line':
+            keys    = ("x1", "y1", "x2", "y2")
+            columns = [batch.columns.get(key, 0) for key in keys]
+            rows    = zip(*[column if isColumn(column) else itertools.repeat(column, batch.count) for column in columns])
+            baked   = ([], [], [], [])
+            
+            for m, row in zip(matrices, rows):
+                x1, y1, x2, y2 = [float(value) for value in row]
+                
+                baked[0].append(formatNumber(m[0][0] * x1 + m[0][1] * y1 + m[0][2], None))
+                baked[1].append(formatNumber(m[1][0] * x1 + m[1][1] * y1 + m[1][2], None))
+                baked[2].append(formatNumber(m[0][0] * x2 + m[0][1] * y2 + m[0][2], None))
+                baked[3].append(formatNumber(m[1][0] * x2 + m[1][1] * y2 + m[1][2], None))
+            
+            #shared coordinates stay shared when every shape has the same transform
+            shared = not isColumn(own)
+            
+            for key, column, values in zip(keys, columns, baked):
+                if not shared or isColumn(column):
+                    batch.columns[key] = values
+                elif values:
+                    batch.columns[key] = values[0]
+        elif any([m != Transform2D().matrix for m in matrices]):
+            transforms = []
+            
+            for m in matrices:
+                baked = Transform2D()
+                baked.matrix = m
+                
+                transforms.append(baked.svgOut())
+            
+            batch.columns['transform'] = transforms if isColumn(own) else transforms[0]
+            
+        return batch
+    
+    #clears the cached bytes above an element that does not report its own
+    #changes, the nearest node above an ElementTree element is touched
+    def touchElement(self, element):
+        if isinstance(element, (SVGNode, ShapeBatch)):
+            element.touch()
+            return
+        
+        for node in self.root.iter():
+            if not isinstance(node, SVGNode):
+                continue
+            
+            for child in node:
+                if not isinstance(child, (SVGNode, ShapeBatch)) and any([e is element for e in child.iter()]):
+                    node.touch()
+                    return
+
+    """
+    ________________________________
+    OPTIMISATION
+    """
+    """
+    def hoistStyles(minCount, prefix)
+
+    this method moves repeated presentation attributes into css classes.
+    First attributes that every child of a group shares and that are
+    inherited are lifted onto the group, then each combination of
+    presentation attributes used by at least minCount elements is replaced
+    with a class held in a style tag in the defs section. A combination is
+    only hoisted when it makes the document smaller.
+
+    Attributes:
+        minCount - number of elements that must share a combination
+        prefix   - prefix of the generated class names
+
+    returns a dict with the number of attributes lifted onto groups and
+    the number of classes generated
+    """
+    def hoistStyles(self, minCount = 2, prefix = "s"):
+        ownSharedTrees(self.root)
+
+        lifted = self.liftGroupStyles(self.root)
+
+        #elements using each combination of presentation attributes
+        combos = {}
+
+        for element in self.root.iter():
+            if element is self.root or element is self.style:
+                continue
+
+            combo = tuple([(key, element.get(key)) for key in PRESENTATION_ATTRIBUTES if element.get(key) is not None])
+
+            if combo:
+                combos.setdefault(combo, []).append(element)
+
+        classCount = len(self.styleClasses)
+
+        for combo, elements in combos.items():
+            #a ShapeBatch writes its shared attributes on each of its shapes
+            uses = sum([getattr(element, 'count', 1) for element in elements])
+
+            if uses < minCount:
+                continue
+
+            name = self.styleClasses.get(combo)
+
+            if name is None:
+                name = prefix + str(len(self.styleClasses))
+
+                #bytes saved on each element against the size of the css rule
+                attrBytes = sum([len(key) + len(str(value)) + 4 for key, value in combo])
+                ruleBytes = len(name) + 3 + sum([len(key) + len(str(value)) + 2 for key, value in combo])
+
+                if uses * (attrBytes - len(name) - 9) <= ruleBytes:
+                    continue
+
+                self.styleClasses[combo] = name
+
+            for element in elements:
+                for key, value in combo:
+                    removeAttribute(element, key)
+
+                classes = element.get('class')
+
+                element.set('class', name if not classes else classes + " " + name)
+
+        if self.styleClasses:
+            if self.style is None:
+                self.style = subElement(self.attachDefs(), 'style', {'type' : "text/css"})
+
+            rules = []
+
+            for combo, name in self.styleClasses.items():
+                rules.append("." + name + "{" + ";".join([key + ":" + str(value) for key, value in combo]) + "}")
+
+            self.style.text = "".join(rules)
+
+        return {
+                "lifted"  : lifted,
+                "classes" : len(self.styleClasses) - classCount
+               }
+
+    #lifts inherited attributes shared by all the children of each group
+    #onto the group, returns the number of attributes lifted
+    def liftGroupStyles(self, element):
+        lifted = 0
+
+        for child in element:
+            lifted += self.liftGroupStyles(child)
+
+        if element.tag != 'g' or len(element) == 0:
+            return lifted
+
+        for key in INHERITED_ATTRIBUTES:
+            values = set([child.get(key) for child in element])
+
+            if len(values) == 1 and None not in values:
+                element.set(key, values.pop())
+
+                for child in element:
+                    removeAttribute(child, key)
+
+                lifted += 1
+
+        return lifted
+
+    """
+    def minify(precision, shortenIds)
+
+    this method makes the document smaller before it is written. Empty
+    attributes, like the transform="" set by loadGroup, and attributes of
+    shapes set to their default value are dropped, numbers in geometry,
+    path data, points and transforms are rounded to precision decimals and
+    groups and defs left with no children are removed. When shortenIds is
+    True ids nothing refers to, like the default id="main" of group, are
+    dropped and the rest are renamed to short ids, use tags and url()
+    references are rewritten to match.
+
+    minify is meant as the last step before writing, references added
+    afterwards should be new ones rather than ones added before.
+
+    Attributes:
+        precision  - number of decimals numbers are rounded to
+        shortenIds - drop unused ids and shorten the others
+
+    returns a dict with the bytes of the document before and after and the
+    bytes saved
+    """
+    def minify(self, precision = PATH_PRECISION, shortenIds = True):
+        ownSharedTrees(self.root)
+
+        before = self.writeDoc(io.BytesIO())["bytes"]
+
+        referenced = set()
+
+        for element in self.root.iter():
+            for key, value in element.items():
+                referenced.update(referencedIds(key, value))
+
+            if element.text:
+                referenced.update(URL_REFERENCE.findall(element.text))
+
+        self.pruneEmpty(self.root, referenced)
+
+        #short ids are given in document order
+        renamed = {}
+
+        if shortenIds:
+            for element in self.root.iter():
+                id = element.get('id')
+
+                if id in referenced and id not in renamed:
+                    renamed[id] = shortId(len(renamed))
+
+        for element in self.root.iter():
+            for key, value in element.items():
+                if key == 'id' and shortenIds:
+                    if value in renamed:
+                        element.set(key, renamed[value])
+                    else:
+                        removeAttribute(element, key)
+
+                    continue
+
+                if value is None or value == "":
+                    removeAttribute(element, key)
+                elif element.tag in MINIFY_SHAPES and key in MINIFY_DEFAULTS and isNumber(value) and float(value) == MINIFY_DEFAULTS[key]:
+                    removeAttribute(element, key)
+                elif key == 'd' and isinstance(value, str):
+                    element.set(key, roundPathData(value, precision))
+                elif key in MINIFY_NUMERIC:
+                    element.set(key, roundNumbers(value, precision))
+                elif renamed and isinstance(value, str) and "#" in value:
+                    element.set(key, renameReferences(key, value, renamed))
+
+            #columns of shape batches
+            for key, value in getattr(element, 'columns', {}).items():
+                if key in MINIFY_NUMERIC and isColumn(value):
+                    element.set(key, [roundNumbers(v, precision) for v in value])
+
+            if renamed and element.text and "url(" in element.text:
+                element.text = URL_REFERENCE.sub(lambda m: "url(#" + renamed.get(m.group(1), m.group(1)) + ")", element.text)
+
+        #changes to ElementTree children are not tracked by node caches
+        for element in self.root.iter():
+            if isinstance(element, SVGNode):
+                element.cache = None
+
+        self.referenceIds = set([renamed.get(id, id) for id in self.referenceIds])
+        self.defsContent  = dict([(key, renamed.get(id, id)) for key, id in self.defsContent.items()])
+
+        self.referenceAliases = dict([(alias, renamed.get(id, id)) for alias, id in self.referenceAliases.items()])
+
+        after = self.writeDoc(io.BytesIO())["bytes"]
+
+        return {
+                "before" : before,
+                "after"  : after,
+                "saved"  : before - after
+               }
+
+    #removes groups and defs with no children, unless they are referenced,
+    #returns the number of elements removed
+    def pruneEmpty(self, element, referenced):
+        removed = 0
+
+        for child in list(element):
+            removed += self.pruneEmpty(child, referenced)
+
+            if child.tag in ('g', 'defs') and len(child) == 0 and not child.text and child.get('id') not in referenced:
+                element.remove(child)
+
+                removed += 1
+
+        return removed
+
+    #puts the defs back in the document if minify removed it
+    def attachDefs(self):
+        if not any([child is self.defs for child in self.root]):
+            self.root.insert(0, self.defs)
+
+        return self.defs
+
+    #the centre of the document in user units, from the viewBox or else
+    #the width and height, which must then be absolute lengths
+    def centre(self):
+        viewBox = [float(v) for v in MINIFY_NUMBER.findall(str(self.root.get('viewBox') or ""))]
+
+        if len(viewBox) == 4:
+            return Point(viewBox[0] + viewBox[2] / 2.0, viewBox[1] + viewBox[3] / 2.0)
+
+        width  = parseLength(self.root.get('width', 0))
+        height = parseLength(self.root.get('height', 0))
+
+        assert (width is not None and height is not None), "the document size is not an absolute length, give an origin"
+
+        return Point(width / 2.0, height / 2.0)
+
+"""
+LENGTHS
+
+user units in each absolute svg length unit, a document without a viewBox
+has one user unit to the pixel
+"""
+SVG_UNITS = {
+             ""   : 1.0,
+             "px" : 1.0,
+             "pt" : 96.0 / 72.0,
+             "pc" : 16.0,
+             "mm" : 96.0 / 25.4,
+             "cm" : 96.0 / 2.54,
+             "in" : 96.0
+            }
+
+SVG_LENGTH = re.compile(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([a-z%]*)\s*$")
+
+#a length in user units, None for percentages, em and other lengths that
+#depend on what the document is drawn into
+def parseLength(value):
+    match = SVG_LENGTH.match(str(value))
+
+    if match is None or match.group(2) not in SVG_UNITS:
+        return None
+
+    return float(match.group(1)) * SVG_UNITS[match.group(2)]
+
+#returns the first number in a value, svg lengths like 10px included
+def parseNumber(value, default = 0.0):
+    if value is None:
+        return default
+
+    if not isinstance(value, str):
+        return float(value)
+
+    match = MINIFY_NUMBER.search(value)
+
+    return float(match.group()) if match else default
+
+#returns a tag without its namespace
+def localName(tag):
+    return tag.rsplit('}', 1)[-1]
 
 """
 class Reference
@@ -1099,16 +3696,14 @@ class Reference
 all tags in the defs group of an svg document are references
 this is a base class to define those references
 
-the id is used as the url reference and should be unique 
+the id is used as the url reference and should be unique in the
+document, the id is registered with the document by SVGWrap.addToDefs.
+A reference merged with an identical definition keeps its id, so urls for
+a document should be made with url(svgDoc) or SVGWrap.paint, which give
+the id of the definition the document holds
 """
 class Reference:
-    referenceList = []
-    
     def __init__(self, id, tag):
-        assert (id not in Reference.referenceList), "Reference already defined :" + id
-        
-        Reference.referenceList.append(id)
-        
         self.id = id
         self.root = ET.Element(tag)
         
@@ -1117,16 +3712,23 @@ class Reference:
         
         self.id = id
         
-    def url(self):
+    #the url of the reference, in svgDoc when given, see SVGWrap.referenceUrl
+    def url(self, svgDoc = None):
+        if svgDoc is not None:
+            return svgDoc.referenceUrl(self)
+        
         return "#" + str(self.id)
         
 class GroupRef(Reference):
-    def __init__(self, id, groupTree):
+    def __init__(self, id, groupTree, share = False):
         Reference.__init__(self, id, 'g')
         
+        self.root = cloneTree(groupTree, share)
+        
+        #the url of the reference must point at the cloned group
         self.root.set('id', id)
         
-        self.tree = ET.fromstring(ET.tostring(groupTree))
+        self.tree._setroot(self.root)
 
 class LinearGradient(Reference):
     def __init__(self, id, attr = {
@@ -1140,7 +3742,7 @@ class LinearGradient(Reference):
         self.root.set('id', id)
         
         for i in attr:
-            self.root.set(i, attr[i])
+            self.root.set(i, str(attr[i]))
     
     def stop(self, attr = {
                            "offset"       : "0%",
@@ -1151,7 +3753,7 @@ class LinearGradient(Reference):
         stop = ET.SubElement(self.root, 'stop')
         
         for i in attr:
-            stop.set(i, attr[i])
+            stop.set(i, str(attr[i]))
     
 class RadialGradient(Reference):
     def __init__(self, id, attr = {
@@ -1166,7 +3768,7 @@ class RadialGradient(Reference):
         self.root.set('id', id)
         
         for i in attr:
-            self.root.set(i, attr[i])
+            self.root.set(i, str(attr[i]))
     
     def stop(self, attr = {
                            "offset"       : "0%",
@@ -1177,7 +3779,7 @@ class RadialGradient(Reference):
         stop = ET.SubElement(self.root, 'stop')
         
         for i in attr:
-            stop.set(i, attr[i])
+            stop.set(i, str(attr[i]))
 
 """
 FOLIAGE
@@ -1571,11 +4173,11 @@ class IFS:
         lines  = []
         points = []
         
-        step = ((2.0 * math.pi) / sides) * polygram
+        cosTable, sinTable = unitCircle(sides, phase, polygram)
         
         for s in range(sides + 1):
-            x = math.cos(s * step + phase) * circle.radius + circle.origin.x
-            y = math.sin(s * step + phase) * circle.radius + circle.origin.y
+            x = cosTable[s] * circle.radius + circle.origin.x
+            y = sinTable[s] * circle.radius + circle.origin.y
             
             points.append(Point(x, y))
             
@@ -1646,19 +4248,18 @@ class Mandala:
                 
                 #colour
                 colour = palette.getCol()
+                fill   = colour.hex()
                 
                 #calc placement for circles
-                for c in range(numCircs):
-                    cx = math.sin(angleCirc * c) * ringRadii + (MANDALA_CANVAS_SIZE / 2.0)
-                    cy = math.cos(angleCirc * c) * ringRadii + (MANDALA_CANVAS_SIZE / 2.0)
-                    
-                    svgDoc.circle(parent = mainGroup, attr = {"cx" : cx,
-                                                           "cy" : cy,
-                                                           "r"  : circRadii,
-                                                           "fill" : colour.hex(),
-                                                           "stroke-width" : strokeW,
-                                                           "opacity" : 0.5
-                                                          })
+                cosTable, sinTable = unitCircle(numCircs)
+                
+                cx = [s * ringRadii + (MANDALA_CANVAS_SIZE / 2.0) for s in sinTable[:numCircs]]
+                cy = [c * ringRadii + (MANDALA_CANVAS_SIZE / 2.0) for c in cosTable[:numCircs]]
+                
+                svgDoc.circles(mainGroup, cx, cy, circRadii,
+                               fill         = fill,
+                               stroke_width = strokeW,
+                               opacity      = 0.5)
             
         #outlines
         self.dna.setIndex(dnaIndex)
@@ -1685,18 +4286,16 @@ class Mandala:
             
             
             #calc placement for circles
-            for c in range(numCircs):
-                cx = math.sin(angleCirc * c) * ringRadii + (MANDALA_CANVAS_SIZE / 2.0)
-                cy = math.cos(angleCirc * c) * ringRadii + (MANDALA_CANVAS_SIZE / 2.0)
-                
-                svgDoc.circle(parent = mainGroup, attr = {"cx" : cx,
-                                                       "cy" : cy,
-                                                       "r"  : circRadii,
-                                                       "fill" : "none",
-                                                       "stroke-width" : strokeW,
-                                                       "stroke" : "black",
-                                                       "opacity" : 0.5
-                                                      })
+            cosTable, sinTable = unitCircle(numCircs)
+            
+            cx = [s * ringRadii + (MANDALA_CANVAS_SIZE / 2.0) for s in sinTable[:numCircs]]
+            cy = [c * ringRadii + (MANDALA_CANVAS_SIZE / 2.0) for c in cosTable[:numCircs]]
+            
+            svgDoc.circles(mainGroup, cx, cy, circRadii,
+                           fill         = "none",
+                           stroke_width = strokeW,
+                           stroke       = "black",
+                           opacity      = 0.5)
 
     def lotus(self, colourOn, svgDoc, parent, radius, numLobes, numRings, maxSize, minDistance, attr = {
                                                                                               "stroke" : "black",
@@ -1720,15 +4319,18 @@ class Mandala:
             
             numSteps = int(circum / minDistance)
 
-            step = (2.0 * math.pi) / numSteps
-
             origin = Point(MANDALA_CANVAS_SIZE / 2.0, MANDALA_CANVAS_SIZE / 2.0)
             
+            phase = 0.0 if (j % 2) == 0 else math.pi
+            
+            #ring positions and the lobes around the ring
+            cosTable, sinTable = unitCircle(numSteps)
+            lobeCos, lobeSin   = unitCircle(numSteps, phase, numLobes)
+            
             for i in range(numSteps):
-                phase = 0.0 if (j % 2) == 0 else math.pi
-                deltaRadius = math.sin(i * step * numLobes + phase) * amplitude
-                x = math.sin(i * step) * (radius + deltaRadius + ringRadius) + origin.x
-                y = math.cos(i * step) * (radius + deltaRadius + ringRadius) + origin.y
+                deltaRadius = lobeSin[i] * amplitude
+                x = sinTable[i] * (radius + deltaRadius + ringRadius) + origin.x
+                y = cosTable[i] * (radius + deltaRadius + ringRadius) + origin.y
                 
                 if i == 0:
                     path.move(x = x, y = y)
@@ -1756,14 +4358,14 @@ class Mandala:
             if ringRadius > maxSize:
                 break
 
-            for p in reversed(paths):
+            #colour, one for each path
+            colours = self.palette.getCols(len(paths)).hex()
+            
+            for p, colour in zip(reversed(paths), colours):
                 path.set(p)
                 
-                #colour
-                colour = self.palette.getCol()
-                
                 if colourOn:
-                    attr["fill"] = colour.hex()
+                    attr["fill"] = colour
                 
                 path.tag(mainGroup, attr)
 
@@ -1790,9 +4392,16 @@ TEST_IFS_LINE2LINE_LEVY_DRAGON  = True
 TEST_LINE_POLAR                 = False
 TEST_ARCTAN                     = False
 TEST_IFS_CIRCLE2LINES           = False
+TEST_ASSET_BUNDLE               = False
+TEST_BAKE_TRANSFORM             = False
+TEST_PATH_LOAD                  = False
+TEST_NODE_MODEL                 = False
+TEST_GROUP_CACHE                = False
+TEST_REFERENCE_DEDUP            = False
+TEST_BAKE_BATCH                 = False
 
 def openTestFile():
-    check_output("start " + TEST_FILE, shell=True)
+    preview(TEST_FILE)
 
 class SVGWrapTesting:
     
@@ -1819,6 +4428,11 @@ class SVGWrapTesting:
 
         svgOut = SVGWrap({"width" : width, "height" : height})
 
+        circles = []
+        h = []
+        s = []
+        v = []
+
         #build a matrix of circles with random size and colour
         for crx in range(UNITS_WIDE):
             for cry in range(UNITS_TALL):
@@ -1829,27 +4443,29 @@ class SVGWrapTesting:
                 #redder from left to right
                 #bluer from top to bottom
                                 
-                h = crx / UNITS_WIDE + 0.1
-                s = random.random() + 0.5
-                v = cry / UNITS_TALL + 0.1
+                h.append(crx / UNITS_WIDE + 0.1)
+                s.append(random.random() + 0.5)
+                v.append(cry / UNITS_TALL + 0.1)
                 
                 opacity = random.random()
                 
-                col = Colour()
-                
-                col.setHSV(h, s, v)
-                
                 #calculate circle origin
                 cx = crx * UNITX + (UNITX / 2.0)
                 cy = cry * UNITY + (UNITY / 2.0)
                 
+                circles.append((cx, cy, radius, opacity))
+        
+        #all the colours are converted at once
+        colours = ColourArray.fromHSV(h, s, v).hex()
+        
+        for (cx, cy, radius, opacity), col in zip(circles, colours):
                 #build circle tag, add it to svg output string
                 svgOut.circle( svgOut.root, {
                                           "cx"     : str(cx),
                                           "cy"     : str(cy),
                                           "r"      : radius,
-                                          "fill"   : col.hex(),
-                                          "stroke" : col.hex(),
+                                          "fill"   : col,
+                                          "stroke" : col,
                                           "opacity" : opacity
                                          })
         print(ET.dump(svgOut.root))
@@ -2009,6 +4625,10 @@ def MandalaCirclesTest():
     """
     mandala.circles(colourOn = True, svgDoc = svgOut, parent = svgOut.root)
     
+    print(svgOut.hoistStyles())
+    
+    print(svgOut.minify())
+    
     print(ET.dump(svgOut.root))
     
     svgOut.tree.write(TEST_FILE)
@@ -2106,25 +4726,29 @@ def PaletteTest():
     var = [0.02, 0.5, 0.0]
     p = Palette(dna, colour, deg, var)
     
+    #each row skips one colour then takes a colour for each column
+    colours = p.getCols(ROWS * (COLUMNS + 1)).hex()
+    stroke  = colour.hex()
+    
     for row in range(ROWS):
         x = row * rowHeight
-        newCol = p.getCol()      
-        for col in range(COLUMNS):
         
-            newCol = p.getCol()
-
-            
+        rowColours = colours[row * (COLUMNS + 1) + 1 : (row + 1) * (COLUMNS + 1)]
+        
+        for col in range(COLUMNS):
             y = col * colWidth
             svgOut.rect(group, {
                                 "x"      : x,
                                 "y"      : y,
                                 "width"  : colWidth,
                                 "height" : rowHeight,
-                                "fill"   : newCol.hex(),
-                                "stroke" : colour.hex(),
+                                "fill"   : rowColours[col],
+                                "stroke" : stroke,
                                 "stroke-width" : 8
                                })
-                               
+    
+    print(svgOut.hoistStyles())
+    
     svgOut.tree.write(TEST_FILE)
     
     openTestFile()
@@ -2150,6 +4774,33 @@ def LoadGroupTest():
     
     return svgOut
 
+ASSET_BUNDLE_FILE = "assets.bundle"
+
+def AssetBundleTest():
+    assets = [
+              (GROUP_FILE, GROUP_NAME),
+              ("./Art/oakleaves.svg", "oakLeaf_001")
+             ]
+    
+    print("Compiled " + str(compileAssetBundle(ASSET_BUNDLE_FILE, assets)) + " groups")
+    
+    print("Loaded " + str(loadAssetBundle(ASSET_BUNDLE_FILE)) + " groups")
+    
+    svgOut = SVGWrap({ "width"  : GROUP_WIDTH,
+                       "height" : GROUP_WIDTH 
+                     })
+    
+    for filename, groupName in assets:
+        g = svgOut.loadGroup(filename, groupName)
+        
+        svgOut.appendGroup(svgOut.root, g)
+    
+    svgOut.tree.write(TEST_FILE)
+    
+    openTestFile()
+    
+    return svgOut
+
 TRANS_WIDTH = 1000
 
 def Transform2DTest():
@@ -2169,30 +4820,241 @@ def Transform2DTest():
     
     grid = GroupRef('grid', g)
     
-    svgOut.addToDefs(grid)
+    #adds grid to the defs and a use tag for each rotation about the centre
+    svgOut.symmetry(svgOut.root, grid, order = ROTATIONS, attr = {
+                                                                  "x" : 0.0,
+                                                                  "y" : 0.0
+                                                                 })
     
-    trans = transform2D()
+    svgOut.display()
+    print(ET.tostring(svgOut.root))
+    return svgOut
+
+def BakeTransformTest():
+    ROTATIONS = 8
     
-    trans.push()
+    svgOut = SVGWrap({ "width"  : TRANS_WIDTH,
+                       "height" : TRANS_WIDTH 
+                     })
     
-    rot = (2.0 * math.pi) / ROTATIONS
+    leaf = svgOut.loadGroup("./Art/oakleaves.svg", "oakLeaf_001")
     
-    for r in range(ROTATIONS):
-        #trans.scale(0.5, 0.5) #
-        svgOut.use(svgOut.root, grid, {
-                                       "transform" : trans.svgOut(),
-                                       "x" : 0.0,
-                                       "y" : 0.0
-                                      })
-        #trans.scale(2.0, 2.0)
-        trans.translate((TRANS_WIDTH / 2.0), (TRANS_WIDTH / 2.0))
-        trans.rotate(rot)    
-        trans.translate(-(TRANS_WIDTH / 2.0), -(TRANS_WIDTH / 2.0))    
+    for i in range(ROTATIONS):
+        t = Transform2D()
+        t.translate(TRANS_WIDTH / 2, TRANS_WIDTH / 2)
+        t.rotate(2.0 * math.pi * i / ROTATIONS)
+        
+        g = svgOut.appendGroup(svgOut.root, leaf)
+        
+        svgOut.bakeTransform(g, t)
+    
+    svgOut.tree.write(TEST_FILE)
+    
+    openTestFile()
+    
+    return svgOut
+
+PATH_LOAD_FILE = "spiral.path"
+
+def PathLoadTest():
+    TURNS  = 200
+    POINTS = 5000
+    
+    #write a long spiral a turn at a time
+    with open(PATH_LOAD_FILE, 'w') as f:
+        cosTable, sinTable = unitCircle(POINTS)
+        
+        f.write("M " + str(TRANS_WIDTH / 2) + " " + str(TRANS_WIDTH / 2))
+        
+        for turn in range(TURNS):
+            p = SVGWrap.Path()
+            
+            for k in range(POINTS):
+                r = (turn * POINTS + k) * (TRANS_WIDTH / 2) / (TURNS * POINTS)
+                
+                p.line(False, TRANS_WIDTH / 2 + r * cosTable[k], TRANS_WIDTH / 2 + r * sinTable[k])
+                
+            f.write(str(p))
+    
+    svgOut = SVGWrap({ "width"  : TRANS_WIDTH,
+                       "height" : TRANS_WIDTH 
+                     })
+    
+    p = SVGWrap.Path()
+    
+    p.load(PATH_LOAD_FILE, svgOut.root, {"fill" : "none", "stroke" : "black", "stroke-width" : 0.1})
+    
+    print(str(len(p.data)) + " commands loaded")
+    
+    with open("spiral_compact.path", 'w') as f:
+        print(str(p.stream(PATH_LOAD_FILE, f)) + " characters streamed of " + str(os.path.getsize(PATH_LOAD_FILE)))
+    
+    svgOut.tree.write(TEST_FILE)
+    
+    openTestFile()
+    
+    return svgOut
+
+#builds a mandala of rings of circles with numElements circles, with bulk
+#each ring is added in one call to SVGWrap.circles
+def benchmarkMandala(model, numElements, bulk = False):
+    RINGS = 500
+    
+    svgOut = SVGWrap({ "width"  : TRANS_WIDTH,
+                       "height" : TRANS_WIDTH 
+                     }, model)
+    
+    perRing = numElements // RINGS
+    centre  = TRANS_WIDTH / 2
+    
+    cosTable, sinTable = unitCircle(perRing)
+    
+    for ring in range(RINGS):
+        g = svgOut.group(svgOut.root, {"id" : "ring" + str(ring), "fill" : "none", "stroke" : "black"})
+        
+        radius = centre * (ring + 1) / RINGS
+        
+        if bulk:
+            svgOut.circles(g,
+                           [centre + radius * c for c in cosTable[:perRing]],
+                           [centre + radius * s for s in sinTable[:perRing]],
+                           radius / 10)
+            continue
+        
+        for k in range(perRing):
+            svgOut.circle(g, {
+                              "cx" : centre + radius * cosTable[k],
+                              "cy" : centre + radius * sinTable[k],
+                              "r"  : radius / 10
+                             })
+    
+    return svgOut
+
+#compares the memory and write time of the ElementTree and node models,
+#and of the node model with bulk shapes
+def NodeModelBenchmark(numElements = 500000):
+    import time
+    import tracemalloc
+    
+    for model, bulk in ((ETREE_MODEL, False), (NODE_MODEL, False), (NODE_MODEL, True)):
+        tracemalloc.start()
+        
+        start  = time.perf_counter()
+        svgOut = benchmarkMandala(model, numElements, bulk)
+        built  = time.perf_counter() - start
+        
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        
+        start = time.perf_counter()
+        svgOut.writeDoc(TEST_FILE)
+        written = time.perf_counter() - start
+        
+        print(model + (" bulk" if bulk else "") + ": " + str(numElements) + " elements " + 
+              "{0:.1f}".format(memory / 1e6) + " MB, build " + 
+              "{0:.2f}".format(built) + " s, write " + 
+              "{0:.2f}".format(written) + " s, " +
+              str(os.path.getsize(TEST_FILE)) + " bytes")
+
+#writes a lotus over a loaded grid, then changes only the lotus and writes
+#it again, the grid is not encoded a second time
+def GroupCacheTest():
+    import time
+    
+    svgOut = SVGWrap({ "width"  : TRANS_WIDTH,
+                       "height" : TRANS_WIDTH 
+                     }, NODE_MODEL)
+    
+    grid = svgOut.group(svgOut.root, {"id" : "grid"})
+    
+    svgOut.appendGroup(grid, svgOut.loadGroup(GROUP_FILE, GROUP_NAME))
+    
+    lotus = svgOut.group(svgOut.root, {"id" : "lotus"})
+    
+    Mandala(seed = 13).lotus(True, svgOut, lotus, 1, 21, 500, 500, 0.5, {"stroke"       : "black",
+                                                                        "stroke-width" : 1.0,
+                                                                        "fill"         : "None"
+                                                                       })
+    
+    for rotation in range(0, 30, 10):
+        lotus.set("transform", "rotate(" + str(rotation) + ", 500, 500)")
+        
+        start = time.perf_counter()
+        svgOut.writeDoc(TEST_FILE)
+        
+        print("rotation " + str(rotation) + " written in " + "{0:.3f}".format(time.perf_counter() - start) + " s")
     
-    svgOut.display()
-    print(ET.tostring(svgOut.root))
     return svgOut
 
+#two identical gradients are defined once, the fills of both, and of the
+#second in another document, must name a gradient in the defs written
+def ReferenceDedupTest():
+    def gradient(id):
+        g = LinearGradient(id, {"x1" : 0, "y1" : 0, "x2" : 1, "y2" : 0})
+        
+        g.stop({"offset" : "0%", "stop-color" : "red"})
+        g.stop({"offset" : "100%", "stop-color" : "blue"})
+        
+        return g
+    
+    first  = gradient("g1")
+    second = gradient("g2")
+    
+    for model in (ETREE_MODEL, NODE_MODEL):
+        svgOut = SVGWrap({"width" : 100, "height" : 100}, model)
+        other  = SVGWrap({"width" : 100, "height" : 100}, model)
+        
+        assert (svgOut.addToDefs(first) == "g1")
+        assert (svgOut.addToDefs(second) == "g1")
+        assert (other.addToDefs(second) == "g2")
+        
+        svgOut.rect(svgOut.root, {"x" : 0, "y" : 0, "width" : 50, "height" : 50, "fill" : svgOut.paint(first)})
+        svgOut.rect(svgOut.root, {"x" : 50, "y" : 0, "width" : 50, "height" : 50, "fill" : svgOut.paint(second)})
+        other.rect(other.root, {"x" : 0, "y" : 0, "width" : 50, "height" : 50, "fill" : other.paint(second)})
+        
+        for doc, expected in ((svgOut, ["g1"]), (other, ["g2"])):
+            out = io.BytesIO()
+            doc.writeDoc(out)
+            
+            written = ET.fromstring(out.getvalue())
+            
+            ids   = [e.get('id') for e in written.iter() if e.tag.endswith('linearGradient')]
+            fills = [e.get('fill') for e in written.iter() if e.tag.endswith('rect')]
+            
+            assert (ids == expected), ids
+            assert (all([fill == "url(#" + ids[0] + ")" for fill in fills])), fills
+        
+        assert (second.id == "g2" and second.url() == "#g2" and second.url(svgOut) == "#g1")
+        
+        print(model + " fills " + ", ".join(fills) + " name the gradient defined")
+
+#a group holding batches of lines and circles is baked, the lines must be
+#moved one by one and the circles keep the transform of the group
+def BakeBatchTest():
+    svgOut = SVGWrap({"width" : 100, "height" : 100}, NODE_MODEL)
+    
+    group = svgOut.group(svgOut.root, {"transform" : "translate(10,20) scale(2)"})
+    
+    svgOut.lines(group, [0, 1, 2], [0, 1, 2], [3, 4, 5], 0, stroke = "black")
+    svgOut.lines(group, 1, 1, 2, 2, stroke = "red", transform = ["translate(1,0)", "translate(0,1)"])
+    svgOut.circles(group, [5, 6], [7, 8], 1)
+    
+    svgOut.bakeTransform(group)
+    
+    out = io.BytesIO()
+    svgOut.writeDoc(out)
+    
+    written = ET.fromstring(out.getvalue())
+    
+    lines   = [[float(e.get(k)) for k in ("x1", "y1", "x2", "y2")] for e in written.iter() if e.tag.endswith('line')]
+    circles = [parseTransform(e.get('transform')).matrix for e in written.iter() if e.tag.endswith('circle')]
+    
+    assert (lines == [[10, 20, 16, 20], [12, 22, 18, 20], [14, 24, 20, 20], [14, 22, 16, 24], [12, 24, 14, 26]]), lines
+    assert (all([e.get('transform') is None for e in written.iter() if e.tag.endswith('line')]))
+    assert (circles == [[[2, 0, 10], [0, 2, 20], [0, 0, 1]]] * 2), circles
+    
+    print("baked " + str(len(lines)) + " lines and " + str(len(circles)) + " circles of batches")
+
 def Transform2DPointTest():
     svgOut = SVGWrap({ "width"  : TRANS_WIDTH,
                        "height" : TRANS_WIDTH 
@@ -2330,52 +5192,19 @@ def BezierCurveTest():
         
         spline = s.calcSpline(25)
         
-        svgOut.circle(svgOut.root, {
-                                    "cx" : p1.x,
-                                    "cy" : p1.y,
-                                    "r"  : 10.0,
-                                    "stroke" : "black",
-                                    "fill" : "blue",
-                                    "opacity" : 0.5
-                                   })
-        svgOut.circle(svgOut.root, {
-                                    "cx" : c1.x,
-                                    "cy" : c1.y,
-                                    "r"  : 10.0,
-                                    "stroke" : "black",
-                                    "fill" : "red",
-                                    "opacity" : 0.5
-                                   })
-        svgOut.circle(svgOut.root, {
-                                    "cx" : p2.x,
-                                    "cy" : p2.y,
-                                    "r"  : 10.0,
-                                    "stroke" : "black",
-                                    "fill" : "red",
-                                    "opacity" : 0.5
-                                   })
-        svgOut.circle(svgOut.root, {
-                                    "cx" : c2.x,
-                                    "cy" : c2.y,
-                                    "r"  : 10.0,
-                                    "stroke" : "black",
-                                    "fill" : "blue",
-                                    "opacity" : 0.5
-                                   })
-        svgOut.line(svgOut.root, {
-                                  "x1" : p1.x,
-                                  "y1" : p1.y,
-                                  "x2" : c1.x,
-                                  "y2" : c1.y,
-                                  "stroke" : "grey"
-                                 })
-        svgOut.line(svgOut.root, {
-                                  "x1" : p2.x,
-                                  "y1" : p2.y,
-                                  "x2" : c2.x,
-                                  "y2" : c2.y,
-                                  "stroke" : "grey"
-                                 })
+        svgOut.circles(svgOut.root,
+                       [p1.x, c1.x, p2.x, c2.x],
+                       [p1.y, c1.y, p2.y, c2.y],
+                       10.0,
+                       stroke  = "black",
+                       fill    = ["blue", "red", "red", "blue"],
+                       opacity = 0.5)
+        svgOut.lines(svgOut.root,
+                     [p1.x, p2.x],
+                     [p1.y, p2.y],
+                     [c1.x, c2.x],
+                     [c1.y, c2.y],
+                     stroke = "grey")
         svgOut.polyline(svgOut.root, {
                                       "stroke" : "black", 
                                       "stroke-width" : 2.0,
@@ -2613,38 +5442,53 @@ def arctanTest():
 
 
 
-if TEST_CIRCLE:
-    SVGWrapTesting.testCircle()
-elif TEST_PATH:
-    SVGWrapTesting.testPath()
-elif TEST_DNA:
-    DNATesting()
-elif TEST_MANDALA_CIRCLES:
-    MandalaCirclesTest()
-elif TEST_COLOUR:
-    ColourTest()
-elif TEST_PALETTE:
-    PaletteTest()
-elif TEST_LOAD_GROUP:
-    LoadGroupTest()
-elif TEST_TRANSFORM2D:
-    Transform2DTest()
-elif TEST_TRANSFORM2D_POINT:
-    Transform2DPointTest()
-elif TEST_MANDALA_LOTUS:
-    MandalaLotusTest()
-elif TEST_BEZIER_CURVE:
-    BezierCurveTest()
-elif TEST_IFS_LINE2LINE_SNOWFLAKE:
-    IFSLine2LineTest_Koch_SnowFlake()
-elif TEST_IFS_LINE2LINE_LEVY_DRAGON:
-    IFSLine2LineTest_LevyDragon()
-elif TEST_IFS_LINE2LINE_DRAGON:
-    IFSLine2LineTest_Dragon()
-elif TEST_LINE_POLAR:
-    LinePolarTest()
-elif TEST_ARCTAN:
-    arctanTest()
-elif TEST_IFS_CIRCLE2LINES:
-    IFSCircle2LinesTest()
+if __name__ == "__main__":
+    if TEST_CIRCLE:
+        SVGWrapTesting.testCircle()
+    elif TEST_PATH:
+        SVGWrapTesting.testPath()
+    elif TEST_DNA:
+        DNATesting()
+    elif TEST_MANDALA_CIRCLES:
+        MandalaCirclesTest()
+    elif TEST_COLOUR:
+        ColourTest()
+    elif TEST_PALETTE:
+        PaletteTest()
+    elif TEST_LOAD_GROUP:
+        LoadGroupTest()
+    elif TEST_TRANSFORM2D:
+        Transform2DTest()
+    elif TEST_TRANSFORM2D_POINT:
+        Transform2DPointTest()
+    elif TEST_MANDALA_LOTUS:
+        MandalaLotusTest()
+    elif TEST_BEZIER_CURVE:
+        BezierCurveTest()
+    elif TEST_IFS_LINE2LINE_SNOWFLAKE:
+        IFSLine2LineTest_Koch_SnowFlake()
+    elif TEST_IFS_LINE2LINE_LEVY_DRAGON:
+        IFSLine2LineTest_LevyDragon()
+    elif TEST_IFS_LINE2LINE_DRAGON:
+        IFSLine2LineTest_Dragon()
+    elif TEST_LINE_POLAR:
+        LinePolarTest()
+    elif TEST_ARCTAN:
+        arctanTest()
+    elif TEST_IFS_CIRCLE2LINES:
+        IFSCircle2LinesTest()
+    elif TEST_ASSET_BUNDLE:
+        AssetBundleTest()
+    elif TEST_BAKE_TRANSFORM:
+        BakeTransformTest()
+    elif TEST_PATH_LOAD:
+        PathLoadTest()
+    elif TEST_NODE_MODEL:
+        NodeModelBenchmark()
+    elif TEST_GROUP_CACHE:
+        GroupCacheTest()
+    elif TEST_REFERENCE_DEDUP:
+        ReferenceDedupTest()
+    elif TEST_BAKE_BATCH:
+        BakeBatchTest()
     
\ No newline at end of file